@@ -0,0 +1,5 @@
+"""Текстовая игра «Стипендия в опасности!».
+
+Модули импортируются по отдельности: игре нужны game и его хранилища,
+а сервер, замеры, нагрузка, симуляция и решатель грузятся только в своих командах.
+"""
@@ -0,0 +1,227 @@
+"""Фоновое автосохранение несохраненного прогресса"""
+
+import atexit
+import json
+import os
+import threading
+from contextlib import nullcontext
+
+from gamekk.files import FileLock, file_stamp, temp_path
+
+
+class Autosave:
+    """Фоновое автосохранение прогресса, который еще не записан в хранилище.
+
+    Каждое изменение игрока идет через Player.record(), поэтому грязные
+    данные - это его events после последнего сохранения. Фоновый поток раз
+    в window секунд собирает новые события всех отслеживаемых игроков и
+    дописывает их в журнал одной записью с одним fsync, заодно сбрасывая
+    журналы их копилок. Игра только отмечает игроков в памяти и диска не ждет.
+
+    Строка журнала: ["events", логин, event_seq основы, номер первого события,
+    [событие...]] или ["drop", логин]. При входе события, чья основа совпадает
+    с event_seq загруженного игрока, повторяются поверх него и уходят в
+    хранилище со следующим сохранением. Отказ от сохранения и обычный конец
+    игры (forget) выбрасывают прогресс и отсюда, так что при входе
+    восстанавливается только остаток оборванной сессии (release). Потерять
+    можно не больше window секунд игры.
+
+    Журнал может быть общим для нескольких процессов: запись идет под
+    блокировкой файла, уплотнение переписывает то, что лежит в файле, а
+    restore() перечитывает журнал, если его дописал кто-то еще.
+    """
+
+    def __init__(self, filename="players.autosave", window=1.0, fsync=True, compact_lines=4096):
+        self.filename = filename
+        self.window = window  # секунд между сбросами
+        self.fsync = fsync
+        self.compact_lines = compact_lines  # строк журнала, после которых он переписывается
+        self.tracked = {}  # логин -> (игрок, [основа, записано событий, отпущен ли], блокировка сохранения)
+        self.vaults = set()  # копилки отслеживаемых игроков
+        self.pending = {}  # логин -> (основа, [событие]) - что лежит в журнале
+        self.queue = []  # строки, которые игра попросила записать
+        self.lines = 0  # строк в журнале
+        self.lock = threading.Lock()  # состояние в памяти; игра ждет только его
+        self.io_lock = threading.Lock()  # один сброс за раз
+        self.file_lock = FileLock(filename + ".lock")  # запись в журнал между процессами
+        self.stamp = None  # file_stamp журнала, когда pending ему соответствовал
+        self.stopped = threading.Event()
+        self.thread = None
+        self.open()
+        atexit.register(self.close)
+
+    def open(self):
+        """Чтение журнала автосохранений"""
+        with self.file_lock:
+            self.pending, self.lines = self._read()
+            self.stamp = file_stamp(self.filename)
+
+    def _read(self):
+        """Состояние по журналу на диске: (логин -> (основа, [событие]), число строк)"""
+        pending, lines = {}, 0
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line), pending)
+                    except ValueError:
+                        break  # оборванная строка в конце журнала
+                    lines += 1
+        return pending, lines
+
+    def _apply(self, line, pending=None):
+        pending = self.pending if pending is None else pending
+        if line[0] == "drop":
+            pending.pop(line[1], None)
+            return
+        _, username, base, start, events = line
+        entry = pending.get(username)
+        if start == 0:
+            pending[username] = (base, list(events))
+        elif entry is not None and entry[0] == base and len(entry[1]) == start:
+            entry[1].extend(events)
+
+    def _queue(self, line):
+        self._apply(line)
+        self.queue.append(line)
+
+    def _sync(self):
+        """Перечитать журнал, если его дописал другой процесс; под io_lock и lock"""
+        if file_stamp(self.filename) == self.stamp:
+            return
+        self.open()
+        for line in self.queue:  # еще не записанное остается в силе
+            self._apply(line)
+
+    def track(self, player, vault=None, lock=None):
+        """Следить за игроком на время игры.
+
+        lock - блокировка, под которой хранилище сохраняет игрока
+        (Player.events_saved); под ней сброс читает основу и события.
+        """
+        with self.lock:
+            self.tracked[player.username] = (player, [player.event_seq, 0, False],
+                                             lock if lock is not None else nullcontext())
+            if vault is not None:
+                self.vaults.add(vault)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True, name="autosave")
+                self.thread.start()
+
+    def release(self, player):
+        """Сессия оборвалась: дописать остаток игрока при следующем сбросе и забыть.
+
+        Остаток восстановится при следующем входе (restore).
+        """
+        with self.lock:
+            entry = self.tracked.get(player.username)
+            if entry is not None and entry[0] is player:
+                entry[1][2] = True
+
+    def saved(self, player):
+        """Игрок сохранен в хранилище: автосохранение до этого момента больше не нужно"""
+        with self.lock:
+            entry = self.tracked.get(player.username)
+            if entry is not None and entry[0] is player:
+                entry[1][:2] = [player.event_seq, 0]
+            if player.username in self.pending:
+                self._queue(["drop", player.username])
+
+    def forget(self, player):
+        """Игрок отказался сохраняться: выбросить его прогресс и перестать следить"""
+        with self.lock:
+            entry = self.tracked.get(player.username)
+            if entry is not None and entry[0] is player:
+                del self.tracked[player.username]
+            if player.username in self.pending:
+                self._queue(["drop", player.username])
+
+    def restore(self, player):
+        """Повторить автосохраненные события поверх загруженного игрока; True, если было что"""
+        with self.io_lock, self.lock:
+            self._sync()
+            entry = self.pending.get(player.username)
+            if entry is not None and entry[0] != player.event_seq:
+                self._queue(["drop", player.username])  # основу уже перезаписали
+                entry = None
+            events = list(entry[1]) if entry is not None else ()
+        for code, text, value in events:
+            player.record(code, text, value)
+        return bool(events)
+
+    def flush(self):
+        """Дописать новые события отслеживаемых игроков: одна запись и один fsync"""
+        with self.io_lock:
+            with self.lock:
+                lines, self.queue = self.queue, []
+                for username, (player, cursor, lock) in list(self.tracked.items()):
+                    with lock:  # основа и события одного состояния, не посреди сохранения
+                        seq = player.event_seq
+                        events = list(player.events or ())
+                    if seq != cursor[0]:
+                        cursor[:2] = [seq, 0]
+                    fresh = events[cursor[1]:]
+                    if fresh:
+                        line = ["events", username, seq, cursor[1], fresh]
+                        self._apply(line)
+                        lines.append(line)
+                        cursor[1] += len(fresh)
+                    if cursor[2]:
+                        del self.tracked[username]
+                vaults = list(self.vaults)
+            for vault in vaults:
+                vault.flush()
+            if not lines:
+                return
+            try:
+                with self.file_lock:
+                    current = file_stamp(self.filename) == self.stamp
+                    with open(self.filename, 'a', encoding='utf-8') as f:
+                        f.write("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines))
+                        f.flush()
+                        if self.fsync:
+                            os.fsync(f.fileno())
+                    if current:  # иначе чужие строки прочитает следующий _sync
+                        self.stamp = file_stamp(self.filename)
+            except OSError:
+                with self.lock:
+                    self.queue[:0] = lines  # повторим при следующем сбросе
+                raise
+            self.lines += len(lines)
+            if self.lines > self.compact_lines and self.lines > 2 * len(self.pending):
+                self.compact()
+
+    def compact(self):
+        """Переписать журнал по одной строке на игрока через временный файл.
+
+        Пишется то, что лежит в файле, а не в памяти: строки других
+        процессов не теряются.
+        """
+        with self.file_lock:
+            current = file_stamp(self.filename) == self.stamp
+            pending, _ = self._read()
+            lines = [["events", username, base, 0, events] for username, (base, events) in pending.items()]
+            tmp = temp_path(self.filename)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.filename)
+            self.lines = len(lines)
+            if current:
+                self.stamp = file_stamp(self.filename)
+
+    def _run(self):
+        while not self.stopped.wait(self.window):
+            try:
+                self.flush()
+            except OSError:
+                pass  # диск недоступен: строки остались в очереди
+
+    def close(self):
+        """Остановить поток и сбросить остаток"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
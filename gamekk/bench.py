@@ -0,0 +1,214 @@
+"""Замеры горячих путей и памяти на синтетических данных"""
+
+import json
+import os
+import random
+import sys
+import time
+
+from gamekk.autosave import Autosave
+from gamekk.console import ScriptedIO
+from gamekk.credentials import CredentialStore
+from gamekk.game import Game
+from gamekk.player import Player
+from gamekk.storage import PlayerStore
+from gamekk.texts import CATALOG
+from gamekk.vault import ArtifactVault
+
+# Скрипт запуска игры рядом с пакетом
+LAUNCHER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "game katya2.py")
+
+
+class Benchmark:
+    """Замеры горячих путей на синтетических данных заданного размера.
+
+    make_fixtures() пишет players.json, users.txt и artifacts.json в старом
+    формате, run() поднимает над ними хранилища и замеряет операции.
+    Пароли в фикстурах хешируются с kdf_iterations итераций, чтобы импорт
+    миллиона учетных записей занимал минуты, а не часы; стоимость
+    настоящего хеша замеряется отдельно как "kdf". "first_prompt" - время
+    от запуска нового процесса игры над этими данными до первого вопроса.
+    """
+
+    SESSION = ["1", None, "pw", "1", "матан", "1", "да", "нет", "нет"]  # None - логин
+    FIRST_PROMPT_TARGET_MS = 300  # цель: меню нового процесса не ждет чтения данных
+
+    def __init__(self, size, workdir, repeat=200, kdf_iterations=1, seed=0):
+        self.size = size
+        self.workdir = workdir
+        self.repeat = repeat
+        self.kdf_iterations = kdf_iterations
+        self.rng = random.Random(seed)
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def make_fixtures(self):
+        """Синтетические файлы старого формата, без загрузки всего в память"""
+        os.makedirs(self.workdir, exist_ok=True)
+        with open(self.path("players.json"), 'w', encoding='utf-8') as f:
+            f.write("{")
+            for i in range(self.size):
+                player = Player(f"player{i}")
+                player.reputation = self.rng.randint(0, 30)
+                player.add_story_progress("Выбрал класс")
+                f.write(("," if i else "") + "\n  " + json.dumps(player.username, ensure_ascii=False)
+                        + ": " + json.dumps(player.to_dict(), ensure_ascii=False))
+            f.write("\n}")
+        with open(self.path("users.txt"), 'w', encoding='utf-8') as f:
+            for i in range(self.size):
+                f.write(f"player{i}:pw{i}\n")
+        with open(self.path("artifacts.json"), 'w', encoding='utf-8') as f:
+            json.dump([f"Артефакт {i}" for i in range(self.size)], f, ensure_ascii=False)
+
+    def _timed(self, name, operation, repeat=None):
+        """Замер операции: operation(i) вызывается repeat раз"""
+        samples = []
+        for i in range(repeat or self.repeat):
+            started = time.perf_counter()
+            operation(i)
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        return {
+            "name": name,
+            "size": self.size,
+            "n": len(samples),
+            "mean_us": round(sum(samples) / len(samples) * 1e6, 2),
+            "median_us": round(samples[len(samples) // 2] * 1e6, 2),
+            "p95_us": round(samples[int(len(samples) * 0.95)] * 1e6, 2),
+        }
+
+    def run(self):
+        """Все замеры для одного размера данных"""
+        results = []
+        quiet = ScriptedIO([])
+        users = lambda: f"player{self.rng.randrange(self.size)}"
+
+        stores = {}
+        results.append(self._timed("import_players", lambda i: stores.setdefault("players", PlayerStore(
+            self.path("players.dat"), self.path("players.idx"), self.path("players.json"), legacy_log=None,
+            stats_filename=self.path("players.stats"), words_filename=self.path("players.words"))), 1))
+        stores["users"] = CredentialStore(self.path("users.db"), None, iterations=self.kdf_iterations)
+        results.append(self._timed("import_users", lambda i: stores["users"].import_plaintext(
+            self.path("users.txt")), 1))
+        results.append(self._timed("load_vault", lambda i: stores.setdefault("vault", ArtifactVault(
+            self.path("artifacts.json"), self.path("artifacts.journal"))), 1))
+        game = Game(io=quiet, vault=stores["vault"], store=stores["players"], credentials=stores["users"],
+                    autosave=Autosave(self.path("players.autosave")))
+
+        results.append(self._timed("load_game", lambda i: game.load_game(users())))
+        def turn(i):
+            player = game.load_game(users())
+            player.record(Player.EVENT_REPUTATION, None, 1)
+            game.save_game(player)
+
+        results.append(self._timed("save_game", turn))
+        # После сохранений у игроков есть дельты: поле читается из последней из них
+        results.append(self._timed("view_field", lambda i: game.store.view(users()).passed("матан")))
+        results.append(self._timed("leaderboard", lambda i: game.store.stats.summary(10)))
+        results.append(self._timed("check_credentials", lambda i: game.check_credentials(*(
+            lambda n: (f"player{n}", f"pw{n}"))(self.rng.randrange(self.size)))))
+        results.append(self._timed("username_taken", lambda i: game.credentials.exists(users())))
+        results.append(self._timed("kdf", lambda i: game.credentials._hash("pw", iterations=CredentialStore.ITERATIONS), 5))
+
+        holder = Player("holder")
+        results.append(self._timed("vault_take", lambda i: game.vault.take_artifact(holder, quiet.say)))
+        holder.artifacts.clear()
+
+        def give_back(i):
+            holder.add_artifact(f"Возврат {i}")
+            game.vault.return_artifacts(holder)
+
+        results.append(self._timed("vault_return", give_back))
+        results.append(self._timed("vault_generate", lambda i: game.vault.generate_new_artifacts(quiet.say)))
+        game.vault.flush()
+
+        def session(i):
+            answers = [f"bench{i}" if answer is None else answer for answer in self.SESSION]
+            Game(io=ScriptedIO(answers), vault=game.vault, store=game.store,
+                 credentials=game.credentials, autosave=game.autosave).main_menu()
+
+        results.append(self._timed("game_session", session, max(1, self.repeat // 10)))
+        game.credentials.pool.shutdown(wait=True)
+        game.store.wait()
+        game.store.flush_stats()  # до выхода: временная папка к тому времени уже удалена
+        game.autosave.close()
+
+        started = []
+        first_prompt = self._timed("first_prompt", lambda i: started.append(self._start_game()),
+                                   max(3, self.repeat // 40))
+        for process in started:
+            process.communicate(b"3\n")
+        first_prompt["target_us"] = self.FIRST_PROMPT_TARGET_MS * 1000
+        results.append(first_prompt)
+        return results
+
+    def _start_game(self):
+        """Запустить игру отдельным процессом в папке с данными и дождаться меню"""
+        import subprocess
+        process = subprocess.Popen([sys.executable, LAUNCHER], cwd=self.workdir,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        prompt = CATALOG.render("menu.choice").strip().encode('utf-8')
+        output = b""
+        while prompt not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                break
+            output += chunk
+        return process
+
+
+def run_benchmarks(sizes, workdir, repeat=200, kdf_iterations=1, baseline=None):
+    """Прогон замеров для всех размеров; сравнение с прошлым прогоном, если он задан"""
+    import subprocess
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(LAUNCHER)).stdout.strip()
+    except OSError:
+        commit = ""
+    report = {"commit": commit, "python": sys.version.split()[0], "repeat": repeat,
+              "kdf_iterations": kdf_iterations, "results": []}
+    for size in sizes:
+        bench = Benchmark(size, os.path.join(workdir, str(size)), repeat, kdf_iterations)
+        bench.make_fixtures()
+        report["results"].extend(bench.run())
+
+    if baseline:
+        old = {(item["name"], item["size"]): item for item in baseline["results"]}
+        for item in report["results"]:
+            before = old.get((item["name"], item["size"]))
+            if before and before["median_us"]:
+                item["vs_baseline"] = round(item["median_us"] / before["median_us"], 3)
+    return report
+
+
+def memory_report(count):
+    """Замер памяти на игрока: компактный Player против записи Player.to_dict()"""
+    import tracemalloc
+
+    def measure(make):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        items = [make(i) for i in range(count)]
+        used = tracemalloc.get_traced_memory()[0] - before - sys.getsizeof(items)
+        tracemalloc.stop()
+        del items
+        return used / count
+
+    def make_player(i):
+        # Типичный игрок после одной сессии
+        player = Player(f"player{i}")
+        player.exams["матан"] = "4"
+        player.add_artifact("Диплом технаря")
+        for branch in ("Выбрал класс", "Начало матана", "Списал у одногруппников"):
+            player.add_story_progress(branch)
+        return player
+
+    compact = measure(make_player)
+    plain = measure(lambda i: make_player(i).to_dict())
+    return {
+        "players": count,
+        "bytes_per_player": round(compact, 1),
+        "bytes_per_dict_record": round(plain, 1),
+        "total_mb": round(compact * count / 2 ** 20, 1),
+    }
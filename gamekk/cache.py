@@ -0,0 +1,72 @@
+"""Кэш недавно загруженных и сохраненных игроков"""
+
+import sys
+from collections import OrderedDict
+
+
+class PlayerCache:
+    """Последние загруженные и сохраненные игроки в порядке LRU.
+
+    Ограничен и числом игроков, и примерным размером в байтах (footprint).
+    Хранит свои копии и отдает копии, поэтому игра может менять игрока,
+    не задевая кэш. Актуальность обеспечивает PlayerStore: сохранения
+    пишутся в кэш, а перечитывание хранилища (reload) его очищает.
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # логин -> (игрок, размер), самые старые первыми
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def footprint(player):
+        """Примерный размер игрока в памяти"""
+        return (sys.getsizeof(player) + sys.getsizeof(player.username) + sys.getsizeof(player.grades)
+                + sys.getsizeof(player.artifact_ids) + sys.getsizeof(player.progress_ids)
+                + sys.getsizeof(player.progress_flags) + sys.getsizeof(player.other_grades))
+
+    def get(self, username):
+        """Копия игрока или None"""
+        entry = self.entries.get(username)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(username)
+        return entry[0].copy()
+
+    def put(self, player):
+        """Запомнить копию игрока и вытеснить самых давних сверх лимитов"""
+        self.discard(player.username)
+        player = player.copy()
+        size = self.footprint(player)
+        if size > self.max_bytes or not self.max_entries:
+            return
+        self.entries[player.username] = (player, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def discard(self, username):
+        entry = self.entries.pop(username, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def clear(self):
+        """Сбросить все записи: файлы хранилища изменились"""
+        if self.entries:
+            self.invalidations += 1
+        self.entries.clear()
+        self.bytes = 0
+
+    def counters(self):
+        """Счетчики попаданий, промахов и вытеснений для замеров"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "invalidations": self.invalidations, "entries": len(self.entries), "bytes": self.bytes}
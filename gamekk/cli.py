@@ -0,0 +1,199 @@
+"""Разбор командной строки и запуск игры или служебных команд"""
+
+import atexit
+import json
+import sys
+import time
+from collections import Counter
+
+from gamekk.game import Game
+from gamekk.player import Player
+from gamekk.storage import PlayerStore
+from gamekk.stream import PlayerStream
+from gamekk.vault import ArtifactVault, SQLiteArtifactVault
+
+# Сервер, замеры, нагрузка, симуляция и решатель импортируются в своих командах
+# вместе с asyncio, sqlite3, subprocess, tempfile и tracemalloc: игре до первого вопроса они не нужны
+
+
+def play(game, instrumentation=None):
+    """Игра в консоли"""
+    if instrumentation is not None:
+        instrumentation.instrument(game)
+    try:
+        game.main_menu()
+    finally:
+        game.io.flush()
+
+
+def main(argv=None):
+    """Запуск игры"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        play(Game())  # обычный запуск: без разбора аргументов, он стоит заметного времени до меню
+        return
+
+    import argparse
+    from gamekk.credentials import CredentialStore
+    parser = argparse.ArgumentParser(description="Стипендия в опасности!")
+    parser.add_argument("--vault", choices=("json", "sqlite"), default="json",
+                        help="sqlite - копилка, общая для нескольких процессов")
+    parser.add_argument("--metrics", help="включить замеры и записать их при выходе (.json или Prometheus)")
+    parser.add_argument("--autosave-window", type=float, default=1.0,
+                        help="раз во сколько секунд автосохранять прогресс (столько игры можно потерять при сбое)")
+    commands = parser.add_subparsers(dest="command")
+
+    simulate = commands.add_parser("simulate", help="безголовый прогон сессий методом Монте-Карло")
+    simulate.add_argument("--runs", type=int, default=1_000_000, help="число игр")
+    simulate.add_argument("--policy", help='JSON: {"решение": {"вариант": вес}}')
+    simulate.add_argument("--seed", type=int)
+
+    serve = commands.add_parser("serve", help="TCP-сервер на много игроков")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+
+    stats = commands.add_parser("stats", help="рейтинг и сводная статистика по игрокам")
+    stats.add_argument("--top", type=int, default=10, help="сколько игроков показать в рейтинге")
+
+    history = commands.add_parser("history", help="события сохраненных игр в JSON Lines")
+    history.add_argument("--user", help="только этот игрок")
+
+    load = commands.add_parser("load", help="нагрузочный прогон полных сессий в нескольких процессах")
+    load.add_argument("--sessions", type=int, default=200, help="всего сессий")
+    load.add_argument("--concurrency", type=int, default=4, help="процессов одновременно")
+    load.add_argument("--kdf-iterations", type=int, default=CredentialStore.ITERATIONS,
+                      help="итерации PBKDF2 для новых паролей")
+    load.add_argument("--workdir", help="общая папка с данными (по умолчанию временная)")
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--out", help="куда записать JSON с отчетом")
+
+    convert = commands.add_parser("convert", help="потоковый перенос игроков между форматами или паролей из users.txt")
+    convert.add_argument("source", help="players.json, .jsonl, .dat или users.txt (после переноса - users.txt.bak)")
+    convert.add_argument("target", help=".json, .jsonl или .dat; для users.txt - журнал учетных записей")
+    convert.add_argument("--batch", type=int, default=PlayerStream.BATCH, help="записей в пачке")
+    convert.add_argument("--delete-source", action="store_true",
+                         help="удалить users.txt после переноса вместо переименования в .bak")
+
+    solve = commands.add_parser("solve", help="точная оптимальная стратегия и вероятность сохранить стипендию")
+    solve.add_argument("--user", help="начать с сохраненного игрока (по умолчанию новая игра)")
+    solve.add_argument("--sessions", type=int, default=1, help="сколько раз можно сохраниться и сыграть снова")
+    solve.add_argument("--reputation", type=int, help="заменить репутацию в начальном состоянии")
+    solve.add_argument("--lives", type=int, help="заменить число попыток в начальном состоянии")
+    solve.add_argument("--cache", default="solver.cache", help="файл кэша решений")
+
+    memory = commands.add_parser("memory", help="замер памяти на одного игрока")
+    memory.add_argument("--players", type=int, default=1_000_000)
+
+    bench = commands.add_parser("bench", help="замеры горячих путей на синтетических данных")
+    bench.add_argument("--sizes", default="1000,100000,1000000", help="размеры данных через запятую")
+    bench.add_argument("--repeat", type=int, default=200, help="повторов каждой операции")
+    bench.add_argument("--kdf-iterations", type=int, default=1, help="итерации PBKDF2 в фикстурах")
+    bench.add_argument("--workdir", help="папка для фикстур (по умолчанию временная)")
+    bench.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    bench.add_argument("--out", help="куда записать JSON с результатами")
+
+    args = parser.parse_args(argv)
+    vault_class = SQLiteArtifactVault if args.vault == "sqlite" else ArtifactVault
+    instrumentation = None
+    if args.metrics:
+        from gamekk.instrumentation import Instrumentation
+        instrumentation = Instrumentation()
+        instrumentation.enable()
+        atexit.register(instrumentation.export, args.metrics)
+
+    if args.command == "serve":
+        import asyncio
+        from gamekk.server import GameServer
+        server = GameServer(args.host, args.port, vault=vault_class(), instrumentation=instrumentation)
+        try:
+            asyncio.run(server.serve())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.command == "bench":
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        import tempfile
+        from gamekk.bench import run_benchmarks
+        sizes = [int(size) for size in args.sizes.split(",")]
+        with tempfile.TemporaryDirectory() as tmp:
+            report = run_benchmarks(sizes, args.workdir or tmp, args.repeat, args.kdf_iterations, baseline)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return
+
+    if args.command == "load":
+        import tempfile
+        from gamekk.load import LoadGenerator
+        with tempfile.TemporaryDirectory() as tmp:
+            report = LoadGenerator(args.workdir or tmp, args.sessions, args.concurrency, vault_class,
+                                   args.kdf_iterations, args.seed).run()
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return
+
+    if args.command == "convert":
+        started = time.perf_counter()
+        rejected = Counter()
+        if args.source.endswith(".txt"):
+            credentials = CredentialStore(args.target, legacy_filename=None)
+            written = credentials.import_plaintext(args.source, args.batch, args.delete_source)
+            credentials.pool.shutdown()
+        else:
+            records = PlayerStream.validate(PlayerStream.read(args.source), rejected)
+            written = PlayerStream.write(records, args.target, args.batch)
+        print(json.dumps({"read": written + sum(rejected.values()), "written": written, "rejected": rejected,
+                          "seconds": round(time.perf_counter() - started, 3)}, ensure_ascii=False, indent=2))
+        return
+
+    if args.command == "stats":
+        print(json.dumps(PlayerStore().stats.summary(args.top), ensure_ascii=False, indent=2))
+        return
+
+    if args.command == "history":
+        for username, seq, (code, text, value) in PlayerStore().history(args.user):
+            print(json.dumps({"user": username, "seq": seq, "event": Player.EVENT_NAMES[code],
+                              "text": text, "value": value}, ensure_ascii=False))
+        return
+
+    if args.command == "memory":
+        from gamekk.bench import memory_report
+        print(json.dumps(memory_report(args.players), ensure_ascii=False, indent=2))
+        return
+
+    if args.command == "solve":
+        from gamekk.solver import Solver
+        player = Player("")
+        if args.user:
+            player = PlayerStore().load_player(args.user)
+            if player is None:
+                parser.error(f"игрок {args.user} не найден")
+        if args.reputation is not None:
+            player.reputation = args.reputation
+        if args.lives is not None:
+            player.lives = args.lives
+        print(json.dumps(Solver(cache_filename=args.cache).query(player, args.sessions), ensure_ascii=False, indent=2))
+        return
+
+    if args.command == "simulate":
+        from gamekk.simulator import Simulator
+        try:
+            simulator = Simulator(json.loads(args.policy) if args.policy else None, seed=args.seed)
+        except ValueError as error:  # и испорченный JSON: JSONDecodeError - подкласс ValueError
+            parser.error(f"--policy: {error}")
+        result = simulator.run(args.runs)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    play(Game(vault_class=vault_class, autosave_window=args.autosave_window), instrumentation)
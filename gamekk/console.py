@@ -0,0 +1,88 @@
+"""Ввод-вывод игры: буферизованный вывод, консоль и ответы по сценарию"""
+
+import sys
+
+
+class BufferedIO:
+    """Буферизованный ввод-вывод: текст хода копится и уходит одной записью перед вопросом.
+
+    Наследники задают write() и read_line(). writes и chars_written
+    показывают, сколько записей и символов стоил вывод.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.writes = 0
+        self.chars_written = 0
+
+    def say(self, *args):
+        self.buffer.append(" ".join(str(arg) for arg in args) + "\n")
+
+    def flush(self, tail=""):
+        """Отправить накопленный текст (и вопрос) одной записью"""
+        text = "".join(self.buffer) + tail
+        self.buffer.clear()
+        if text:
+            self.writes += 1
+            self.chars_written += len(text)
+            self.write(text)
+
+    def ask(self, prompt=""):
+        self.flush(prompt)
+        return self.read_line()
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def read_line(self):
+        raise NotImplementedError
+
+
+class ConsoleIO(BufferedIO):
+    """Ввод-вывод через консоль"""
+
+    def write(self, text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def read_line(self):
+        return input()
+
+
+class ScriptedIO(BufferedIO):
+    """Ввод-вывод по заранее заданным ответам: для замеров, нагрузки и записи стенограммы.
+
+    answers - последовательность ответов по порядку или функция, которая
+    получает текст вопроса и возвращает ответ (SessionScript).
+    """
+
+    def __init__(self, answers, keep_output=False):
+        super().__init__()
+        self.answer = answers if callable(answers) else None
+        self.answers = iter(()) if callable(answers) else iter(answers)
+        self.output = [] if keep_output else None
+
+    def say(self, *args):
+        if self.output is not None:  # без стенограммы вывод сразу отбрасывается
+            super().say(*args)
+
+    def write(self, text):
+        if self.output is not None:
+            self.output.append(text)
+
+    def ask(self, prompt=""):
+        if self.answer is None:
+            return super().ask(prompt)
+        self.flush(prompt)
+        return self.answer(prompt)
+
+    def read_line(self):
+        try:
+            return next(self.answers)
+        except StopIteration:
+            raise EOFError("ответы закончились") from None
+
+    def transcript(self):
+        """Весь выведенный текст"""
+        self.flush()
+        return "".join(self.output or ())
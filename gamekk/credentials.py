@@ -0,0 +1,207 @@
+"""Учетные записи игроков: хеши паролей в журнале на дозапись"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from gamekk.files import FileLock, file_stamp
+from gamekk.stream import PlayerStream, batches
+
+
+class CredentialStore:
+    """Учетные записи: хеш-индекс логин -> соль и хеш пароля.
+
+    На диске это журнал на дозапись, в памяти - словарь, поэтому проверка
+    логина не зависит от числа игроков. Пароли хешируются PBKDF2
+    в пуле потоков, чтобы не задерживать игровой цикл. Старый users.txt
+    переносится в фоновом потоке; пока он не перенесен, логины, которых
+    еще нет в журнале, проверяются по самому файлу.
+    """
+
+    ITERATIONS = 100_000  # итерации PBKDF2 для новых паролей
+
+    def __init__(self, filename="users.db", legacy_filename="users.txt", iterations=ITERATIONS, workers=2):
+        self.filename = filename
+        self.legacy_filename = legacy_filename
+        self.iterations = iterations
+        self.users = {}  # логин -> (соль, хеш, итерации), Future, пока хеш считается, или None - бронь
+        self.lock = FileLock(filename + ".lock")  # и между процессами с той же папкой данных
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kdf")
+        self.stamp = None  # file_stamp журнала после нашей последней записи
+        self.legacy = None  # users.txt, пока его переносит фоновый поток
+        self.importer = None  # поток переноса users.txt
+        self.open()
+
+    def open(self):
+        """Чтение журнала учетных записей; перенос users.txt уходит в фон"""
+        with self.lock:
+            self.users = self._read()
+        if self.legacy_filename and os.path.exists(self.legacy_filename):
+            self.legacy = self.legacy_filename
+            self.importer = threading.Thread(target=self._import_legacy, name="users-import", daemon=True)
+            self.importer.start()
+
+    def _read(self):
+        users = {}
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        username, salt, digest, iterations = json.loads(line)
+                    except ValueError:
+                        break  # оборванная строка в конце журнала
+                    if salt is None:
+                        users.setdefault(username, None)  # бронь логина, хеш допишется следом
+                    elif users.get(username) is None:
+                        # Считается первая запись логина: более поздние - проигравшие гонку регистрации
+                        users[username] = (bytes.fromhex(salt), bytes.fromhex(digest), iterations)
+        self.stamp = file_stamp(self.filename)
+        return users
+
+    def changed_outside(self):
+        """Изменили ли журнал в обход этого объекта (другой процесс)"""
+        return file_stamp(self.filename) != self.stamp
+
+    def reload(self):
+        """Перечитать журнал; регистрации, которые еще хешируются, сохраняются"""
+        with self.lock:
+            users = self._read()
+            users.update((username, record) for username, record in self.users.items() if isinstance(record, Future))
+            self.users = users
+
+    def _import_legacy(self):
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kdf-import")  # вход не ждет очереди переноса
+        try:
+            # Копию с открытыми паролями оставляет только явная команда convert
+            self.import_plaintext(self.legacy, delete_source=True, pool=pool)
+        except FileNotFoundError:
+            pass  # users.txt уже перенес другой процесс
+        finally:
+            pool.shutdown()
+        self.legacy = None
+
+    def import_plaintext(self, path, batch_size=1024, delete_source=False, pool=None):
+        """Перенос паролей из старого users.txt с хешированием пачками.
+
+        В пуле одновременно не больше batch_size хешей, так что память
+        переноса не зависит от размера файла. Логины, уже записанные в
+        журнал, пропускаются. Открытый файл после переноса удаляется с
+        delete_source, а иначе переименовывается в path + ".bak" (так делает
+        команда convert). Возвращает число прочитанных учетных записей.
+        """
+        pool = pool or self.pool
+        imported = 0
+        for batch in batches(PlayerStream.read_users(path), batch_size):
+            pending = [(username, pool.submit(self._hash, password))
+                       for username, password in batch if username not in self.users]
+            records = [(username, future.result()) for username, future in pending]
+            with self.lock:
+                if self.changed_outside():
+                    self.reload()
+                with open(self.filename, 'a', encoding='utf-8') as f:
+                    for username, record in records:
+                        if username not in self.users:
+                            self._append(f, username, record)
+                            self.users[username] = record
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.stamp = file_stamp(self.filename)
+            imported += len(batch)
+        if delete_source:
+            os.remove(path)
+        else:
+            os.replace(path, path + ".bak")
+        return imported
+
+    def _legacy_password(self, username):
+        """Пароль из users.txt, пока фоновый перенос не закончен"""
+        legacy = self.legacy
+        if legacy is None:
+            return None
+        try:
+            for name, password in PlayerStream.read_users(legacy):
+                if name == username:
+                    return password
+        except FileNotFoundError:
+            pass  # перенос только что закончился
+        return None
+
+    def _hash(self, password, salt=None, iterations=None):
+        salt = salt if salt is not None else os.urandom(16)
+        iterations = iterations or self.iterations
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode('utf-8'), salt, iterations)
+        return salt, digest, iterations
+
+    @staticmethod
+    def _append(f, username, record):
+        if record is None:
+            f.write(json.dumps([username, None, None, None], ensure_ascii=False) + "\n")
+            return
+        salt, digest, iterations = record
+        f.write(json.dumps([username, salt.hex(), digest.hex(), iterations], ensure_ascii=False) + "\n")
+
+    def exists(self, username):
+        """Занят ли логин"""
+        return (username in self.users or self._legacy_password(username) is not None
+                or username in self.users)  # перенос мог дойти до логина, пока читали users.txt
+
+    def add(self, username, password):
+        """Регистрация: логин занимается сразу, хеш считается и пишется в фоне.
+
+        Под одной блокировкой логин проверяется и бронируется строкой в
+        журнале, поэтому из одновременных регистраций одного логина, в том
+        числе из разных процессов, проходит одна; остальные получают False.
+        """
+        with self.lock:
+            if self.changed_outside():
+                self.reload()  # логин могли занять в другом процессе
+            if self.exists(username):
+                return False
+            with open(self.filename, 'a', encoding='utf-8') as f:
+                self._append(f, username, None)
+            self.stamp = file_stamp(self.filename)
+            future = self.users[username] = self.pool.submit(self._hash, password)
+        future.add_done_callback(lambda done: self._store(username, done))
+        return future
+
+    def _store(self, username, future):
+        record = future.result()
+        with self.lock:
+            if self.changed_outside():
+                self.reload()  # иначе новая отметка скроет чужие записи
+            with open(self.filename, 'a', encoding='utf-8') as f:
+                self._append(f, username, record)
+            self.stamp = file_stamp(self.filename)
+            if self.users.get(username) is future:
+                self.users[username] = record
+
+    def verify_async(self, username, password):
+        """Проверка пароля в пуле потоков"""
+        record = self.users.get(username)
+        if record is None and self.legacy is not None:
+            legacy_password = self._legacy_password(username)
+            if legacy_password is not None:
+                return self._done(hmac.compare_digest(legacy_password.encode('utf-8'), password.encode('utf-8')))
+            record = self.users.get(username)  # перенос мог дойти до логина, пока читали users.txt
+        if record is None:
+            return self._done(False)
+        return self.pool.submit(self._verify, record, password)
+
+    @staticmethod
+    def _done(value):
+        result = Future()
+        result.set_result(value)
+        return result
+
+    def _verify(self, record, password):
+        if isinstance(record, Future):
+            record = record.result()
+        salt, digest, iterations = record
+        return hmac.compare_digest(self._hash(password, salt, iterations)[1], digest)
+
+    def verify(self, username, password):
+        """Проверка логина и пароля"""
+        return self.verify_async(username, password).result()
@@ -0,0 +1,64 @@
+"""Файлы данных: отметки версий, временные файлы и блокировка между процессами"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокируем только потоки своего процесса
+    fcntl = None
+
+
+def file_stamp(*paths):
+    """Отметка версии файлов: (время изменения, размер) каждого или None, если файла нет"""
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamp.append(None)
+        else:
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def temp_path(path):
+    """Имя временного файла рядом с path для записи с заменой через os.replace.
+
+    Имя свое у каждого процесса и вызова: одновременные записи одного файла
+    не затирают и не переименовывают чужой временный файл.
+    """
+    return f"{path}.{os.getpid()}.{os.urandom(4).hex()}.tmp"
+
+
+class FileLock:
+    """Блокировка для потоков процесса и для других процессов (fcntl.flock на файле path).
+
+    Повторный вход из того же потока разрешен, как у RLock: файл
+    блокируется при первом входе и освобождается при последнем выходе.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.depth = 0  # глубина входа потока, который держит блокировку
+        self.fd = None
+
+    def __enter__(self):
+        self.lock.acquire()
+        if self.depth == 0 and fcntl is not None:
+            try:
+                if self.fd is None:
+                    self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            except BaseException:
+                self.lock.release()
+                raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0 and self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
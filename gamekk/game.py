@@ -0,0 +1,359 @@
+"""Игровой цикл и общие для игр процесса хранилища"""
+
+import threading
+
+from gamekk.autosave import Autosave
+from gamekk.console import ConsoleIO
+from gamekk.player import Player
+from gamekk.storage import PlayerStore
+from gamekk.story import StoryGraph
+from gamekk.texts import CATALOG
+from gamekk.vault import ArtifactVault
+
+
+class SharedCache:
+    """Разобранные хранилища, общие для всех игр процесса.
+
+    Объект создается при первом запросе и дальше отдается повторно.
+    Если его файлы поменял кто-то снаружи (changed_outside), он
+    перечитывается на месте, так что ссылки в других играх остаются живыми.
+    """
+
+    def __init__(self):
+        self.items = {}  # (класс, аргументы) -> объект
+        self.lock = threading.Lock()
+
+    def get(self, factory, *args, **kwargs):
+        key = (factory, args, tuple(sorted(kwargs.items())))
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                item = self.items[key] = factory(*args, **kwargs)
+                return item
+        if getattr(item, "changed_outside", None) and item.changed_outside():
+            item.reload()
+        return item
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+SHARED = SharedCache()
+
+
+class Game:
+    """Одна игровая сессия.
+
+    Копилка, хранилища и граф сюжета создаются при первом обращении и берутся
+    из общего кэша процесса (SHARED), поэтому меню появляется до чтения
+    каких-либо файлов, а следующие игры в том же процессе ничего не перечитывают.
+    """
+
+    def __init__(self, io=None, vault=None, store=None, credentials=None, vault_class=ArtifactVault,
+                 autosave=None, autosave_window=1.0):
+        self.io = io or ConsoleIO()
+        self.vault_class = vault_class
+        self._vault = vault
+        self._store = store
+        self._credentials = credentials
+        self._autosave = autosave
+        self.autosave_window = autosave_window
+        self.current_player = None
+        self.players_file = "players.json"
+        self.credentials_file = "users.txt"
+        self.texts = CATALOG
+
+    @property
+    def vault(self):
+        if self._vault is not None:
+            return self._vault
+        return SHARED.get(self.vault_class)
+
+    @property
+    def store(self):
+        if self._store is not None:
+            return self._store
+        return SHARED.get(PlayerStore, legacy_filename=self.players_file)
+
+    @property
+    def credentials(self):
+        if self._credentials is not None:
+            return self._credentials
+        from gamekk.credentials import CredentialStore  # пул хеширования нужен только со входа
+        return SHARED.get(CredentialStore, legacy_filename=self.credentials_file)
+
+    @property
+    def autosave(self):
+        if self._autosave is not None:
+            return self._autosave
+        return SHARED.get(Autosave, window=self.autosave_window)
+
+    @property
+    def story(self):
+        return SHARED.get(StoryGraph)
+
+    def say(self, key, **fields):
+        """Вывести сообщение из каталога текстов"""
+        self.io.say(self.texts.render(key, **fields))
+
+    def ask(self, key, **fields):
+        """Задать вопрос из каталога текстов"""
+        return self.io.ask(self.texts.render(key, **fields))
+
+    def scholarship_text(self, kept):
+        return self.texts.render("scholarship.kept" if kept else "scholarship.lost")
+
+    def run_story(self, node):
+        """Пройти узел графа сюжета текущим игроком"""
+        self.story.run(self.story.names[node] if isinstance(node, int) else node,
+                       self.current_player, self.vault, ask=self.io.ask, say=self.io.say)
+
+    def save_credentials(self, username, password):
+        """Сохранение логина и хеша пароля; False, если логин успели занять"""
+        return self.credentials.add(username, password) is not False
+
+    def check_credentials(self, username, password):
+        """Проверка логина и пароля"""
+        return self.credentials.verify(username, password)
+
+    def save_game(self, player):
+        """Сохранение игры"""
+        self.vault.flush()
+        self.store.save_player(player)
+        self.autosave.saved(player)
+        self.say("save.done")
+
+    def load_game(self, username):
+        """Загрузка игры"""
+        return self.store.load_player(username)
+
+    def register(self):
+        """Регистрация нового пользователя"""
+        self.say("register.title")
+
+
+        while True:
+            username = self.ask("register.login").strip()
+            if not username:
+                self.say("register.empty")
+                continue
+
+            # Проверяем, не занят ли логин
+            if self.credentials.exists(username):
+                self.say("register.taken")
+                continue
+
+            password = self.ask("register.password").strip()
+            # Пока вводили пароль, логин мог занять другой игрок
+            if self.save_credentials(username, password):
+                break
+            self.say("register.taken")
+
+        self.current_player = Player(username)
+        self.say("register.done", username=username)
+        return self.current_player
+
+    def login(self):
+        """Вход в систему"""
+        self.say("login.title")
+
+        username = self.ask("login.login").strip()
+        password = self.ask("login.password").strip()
+
+        if self.check_credentials(username, password):
+            # Пробуем загрузить сохраненную игру и то, что успело автосохраниться после нее
+            player = self.load_game(username)
+            loaded = player is not None
+            if not loaded:
+                player = Player(username)
+            restored = self.autosave.restore(player)
+            self.current_player = player
+            if loaded:
+                self.say("login.loaded", reputation=player.reputation, exams=player.exams,
+                         artifacts=len(player.artifacts))
+            else:
+                self.say("login.new")
+            if restored:
+                self.say("login.restored")
+            return self.current_player
+        else:
+            self.say("login.failed")
+            return None
+
+    def intro(self):
+        """Вступление к игре"""
+        self.say("intro", lives=self.current_player.lives, reputation=self.current_player.reputation)
+
+    def exam_branch(self, exam):
+        """Ветка экзамена из графа сюжета"""
+        self.run_story(self.story.exam_nodes[exam])
+
+    def math_exam_branch(self):
+        """Ветка экзамена по матану"""
+        self.exam_branch("матан")
+
+    def cs_exam_branch(self):
+        """Ветка экзамена по информатике"""
+        self.exam_branch("информатика")
+
+    def retake_exam(self):
+        """Процедура пересдачи"""
+        self.say("retake.title")
+
+        if self.current_player.lives <= 0:
+            self.say("retake.no_lives")
+            return False
+
+        failed_exams = []
+        for exam, status in self.current_player.exams.items():
+            if status == "не сдан" and exam in self.story.retake_nodes:
+                failed_exams.append(exam)
+
+        if not failed_exams:
+            self.say("retake.nothing")
+            return True
+
+        self.say("retake.status", lives=self.current_player.lives, exams=", ".join(failed_exams))
+
+        if len(failed_exams) > 1:
+            choice = self.ask("retake.choose").lower()
+        else:
+            choice = failed_exams[0]
+
+        if choice in failed_exams:
+            # Шанс успеха задан в узле пересдачи
+            self.run_story(self.story.retake_nodes[choice])
+        else:
+            self.say("retake.unknown")
+
+        return True
+
+    def battle_class(self):
+        """Битва классов (дополнительная механика)"""
+        self.run_story("class")
+
+    def play(self):
+        """Игровой цикл текущего игрока под автосохранением"""
+        self.autosave.track(self.current_player, self.vault, self.store.lock)
+        try:
+            self.game_loop()
+        except BaseException:
+            # Обрыв сессии: несохраненное восстановится при следующем входе
+            self.autosave.release(self.current_player)
+            raise
+        # Игра закончилась как обычно: что игрок не сохранил, он не сохранил
+        self.autosave.forget(self.current_player)
+
+    def game_loop(self):
+        """Основной игровой цикл"""
+        self.intro()
+
+        # Битва классов в начале игры
+        if "Выбрал класс" not in self.current_player.story_progress:
+            self.battle_class()
+
+        # Проверяем, какие экзамены еще не сданы (экзамены без ветки в сюжете пропускаем)
+        exams_to_take = []
+        for exam, status in self.current_player.exams.items():
+            if status == "не сдан" and exam in self.story.exam_nodes:
+                exams_to_take.append(exam)
+
+        if not exams_to_take:
+            self.say("session.done")
+            return
+
+        # Выбор первого экзамена
+        self.say("session.start", exams=", ".join(exams_to_take))
+
+        if len(exams_to_take) > 1:
+            choice = self.ask("session.first").lower()
+            while choice not in exams_to_take:
+                self.say("session.wrong")
+                choice = self.ask("session.pick").lower()
+        else:
+            choice = exams_to_take[0]
+            self.say("session.last", exam=choice)
+
+        # Прохождение выбранной ветки
+        self.exam_branch(choice)
+
+        # Проверяем, нужно ли продолжать
+        self.current_player.check_scholarship()
+
+        # Показываем текущий статус
+        player = self.current_player
+        self.say("status", reputation=player.reputation, scholarship=self.scholarship_text(player.scholarship),
+                 exams=player.exams, artifacts=len(player.artifacts), lives=player.lives)
+
+        # Предложение сохраниться
+        save_choice = self.ask("save.ask").lower()
+        if save_choice == "да":
+            self.save_game(self.current_player)
+        else:
+            self.say("save.declined")
+            self.vault.return_artifacts(self.current_player)
+            self.autosave.forget(self.current_player)
+
+        # Проверка условий окончания игры
+        if not self.current_player.scholarship:
+            self.say("game_over")
+            return
+
+        # Проверка на пересдачу
+        if "не сдан" in self.current_player.exams.values() and self.current_player.lives > 0:
+            retake = self.ask("retake.ask").lower()
+            if retake == "да":
+                if self.retake_exam():
+                    # Показываем финальный статус
+                    kept = self.current_player.check_scholarship()
+                    self.say("final", reputation=self.current_player.reputation,
+                             scholarship=self.scholarship_text(kept), exams=self.current_player.exams)
+
+                    if self.current_player.scholarship:
+                        self.say("final.won")
+                    else:
+                        self.say("final.lost")
+            else:
+                self.say("retake.declined")
+        else:
+            # Показываем финальный статус
+            self.say("final.title")
+            if self.current_player.check_scholarship():
+                self.say("final.won")
+            else:
+                self.say("final.lost")
+
+    def main_menu(self):
+        """Главное меню"""
+        while True:
+            self.say("menu")
+
+            choice = self.ask("menu.choice")
+
+            if choice == "1":
+                player = self.register()
+                if player:
+                    self.play()
+
+                    # Предложение сыграть еще раз
+                    again = self.ask("menu.again").lower()
+                    if again != "да":
+                        break
+
+            elif choice == "2":
+                player = self.login()
+                if player:
+                    self.play()
+
+                    # Предложение сыграть еще раз
+                    again = self.ask("menu.again").lower()
+                    if again != "да":
+                        break
+
+            elif choice == "3":
+                self.say("menu.bye")
+                break
+
+            else:
+                self.say("menu.wrong")
@@ -0,0 +1,263 @@
+"""Замеры фаз хода и ввода-вывода"""
+
+import importlib
+import json
+import threading
+import time
+from collections import Counter
+
+
+class CountingFile:
+    """Обертка файла, которая считает прочитанные и записанные байты"""
+
+    def __init__(self, f, metrics):
+        self._f = f
+        self._metrics = metrics
+
+    @staticmethod
+    def _size(data):
+        return len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+
+    def read(self, *args):
+        data = self._f.read(*args)
+        self._metrics.count("bytes_read", self._size(data))
+        return data
+
+    def readline(self, *args):
+        data = self._f.readline(*args)
+        self._metrics.count("bytes_read", self._size(data))
+        return data
+
+    def __iter__(self):
+        for line in self._f:
+            self._metrics.count("bytes_read", self._size(line))
+            yield line
+
+    def write(self, data):
+        self._metrics.count("bytes_written", self._size(data))
+        return self._f.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._f.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class TimedJSON:
+    """Замена модуля json, которая замеряет кодирование и разбор"""
+
+    def __init__(self, module, metrics):
+        self._module = module
+        self._metrics = metrics
+
+    def _timed(self, metric, function, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self._metrics.count(metric, time.perf_counter() - started)
+
+    def dumps(self, *args, **kwargs):
+        return self._timed("json_encode_seconds", self._module.dumps, *args, **kwargs)
+
+    def dump(self, *args, **kwargs):
+        return self._timed("json_encode_seconds", self._module.dump, *args, **kwargs)
+
+    def loads(self, *args, **kwargs):
+        return self._timed("json_decode_seconds", self._module.loads, *args, **kwargs)
+
+    def load(self, *args, **kwargs):
+        return self._timed("json_decode_seconds", self._module.load, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+
+class Instrumentation:
+    """Замеры по фазам хода: гистограммы задержек, открытия файлов, байты, время JSON.
+
+    Пока не вызван enable(), код игры ничем не обернут и ничего не стоит.
+    enable() подменяет в модулях IO_MODULES open и json на считающие обертки,
+    instrument(game) оборачивает методы игры, копилки и хранилищ.
+    Счетчики ввода-вывода относятся к самой внутренней текущей фазе,
+    в том числе записи вывода игроку (output_writes, output_chars).
+    С keep_samples=True сохраняются и сами замеры (samples) для перцентилей.
+    """
+
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)  # секунды
+    COUNTERS = ("file_opens", "bytes_read", "bytes_written", "json_encode_seconds", "json_decode_seconds",
+                "output_writes", "output_chars")
+    GAME_PHASES = ("save_game", "load_game", "check_credentials", "register", "login", "game_loop",
+                   "battle_class", "exam_branch", "math_exam_branch", "cs_exam_branch", "retake_exam")
+    IO_MODULES = ("gamekk.storage", "gamekk.stats", "gamekk.stream", "gamekk.credentials", "gamekk.vault",
+                  "gamekk.autosave")  # модули, которые читают и пишут файлы
+    PART_PHASES = {
+        "vault": ("save_artifacts", "flush"),
+        "store": ("save_player", "load_player", "compact"),
+        "credentials": ("verify", "add"),
+        "autosave": ("flush",),
+    }
+
+    def __init__(self, keep_samples=False):
+        self.histograms = {}  # фаза -> [счетчики по корзинам + 1, сумма, количество]
+        self.samples = {} if keep_samples else None  # фаза -> [секунды]
+        self.counters = Counter()  # (метрика, фаза) -> значение
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.saved_globals = None
+        self.caches = {}  # имя -> кэш со счетчиками counters()
+
+    def phase(self):
+        stack = getattr(self.local, "phases", None)
+        return stack[-1] if stack else "other"
+
+    def count(self, metric, value=1):
+        with self.lock:
+            self.counters[(metric, self.phase())] += value
+
+    def observe(self, phase, seconds):
+        with self.lock:
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = [0] * (len(self.BUCKETS) + 1) + [0.0, 0]
+            position = len(self.BUCKETS)
+            for index, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    position = index
+                    break
+            histogram[position] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            if self.samples is not None:
+                self.samples.setdefault(phase, []).append(seconds)
+
+    def enable(self):
+        """Подменить open и json в модулях игры с файлами на считающие обертки"""
+        if self.saved_globals is not None:
+            return
+        self.saved_globals = {}
+        real_open = open
+
+        def counting_open(*args, **kwargs):
+            self.count("file_opens")
+            return CountingFile(real_open(*args, **kwargs), self)
+
+        for name in self.IO_MODULES:
+            module = vars(importlib.import_module(name))
+            self.saved_globals[name] = {key: module.get(key) for key in ("open", "json")}
+            module["open"] = counting_open
+            module["json"] = TimedJSON(json, self)
+
+    def disable(self):
+        """Вернуть open и json на место"""
+        if self.saved_globals is None:
+            return
+        for name, saved in self.saved_globals.items():
+            module = vars(importlib.import_module(name))
+            for key, value in saved.items():
+                if value is None:
+                    module.pop(key, None)
+                else:
+                    module[key] = value
+        self.saved_globals = None
+
+    def wrap(self, obj, name, phase=None):
+        """Обернуть метод объекта замером времени"""
+        method = getattr(obj, name)
+        if getattr(method, "instrumented", False):
+            return
+        phase = phase or name
+
+        def timed(*args, **kwargs):
+            stack = getattr(self.local, "phases", None)
+            if stack is None:
+                stack = self.local.phases = []
+            stack.append(phase)
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.observe(phase, time.perf_counter() - started)
+                stack.pop()
+
+        timed.instrumented = True
+        setattr(obj, name, timed)
+
+    def instrument(self, game):
+        """Обернуть фазы хода игры и ее хранилищ"""
+        for name in self.GAME_PHASES:
+            self.wrap(game, name)
+        for part, names in self.PART_PHASES.items():
+            obj = getattr(game, part)
+            for name in names:
+                if hasattr(obj, name):
+                    self.wrap(obj, name, f"{part}.{name}")
+        self.caches["players"] = game.store.cache
+        self._count_output(game.io)
+        return game
+
+    def _count_output(self, io):
+        write = io.write
+        if getattr(write, "instrumented", False):
+            return
+
+        def counted(text):
+            self.count("output_writes")
+            self.count("output_chars", len(text))
+            return write(text)
+
+        counted.instrumented = True
+        io.write = counted
+
+    def snapshot(self):
+        """Снимок всех метрик в виде словаря для JSON"""
+        with self.lock:
+            phases = {}
+            for phase, histogram in self.histograms.items():
+                phases[phase] = {
+                    "count": histogram[-1],
+                    "sum_seconds": histogram[-2],
+                    "buckets": dict(zip([str(bound) for bound in self.BUCKETS] + ["+Inf"], histogram[:-2])),
+                }
+            io = {}
+            for (metric, phase), value in self.counters.items():
+                io.setdefault(phase, {})[metric] = value
+        caches = {name: cache.counters() for name, cache in self.caches.items()}
+        return {"phases": phases, "io": io, "caches": caches}
+
+    def prometheus(self):
+        """Метрики в текстовом формате Prometheus"""
+        snapshot = self.snapshot()
+        lines = ["# TYPE game_phase_seconds histogram"]
+        for phase, data in sorted(snapshot["phases"].items()):
+            total = 0
+            for bound, count in data["buckets"].items():
+                total += count
+                lines.append(f'game_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {total}')
+            lines.append(f'game_phase_seconds_sum{{phase="{phase}"}} {data["sum_seconds"]}')
+            lines.append(f'game_phase_seconds_count{{phase="{phase}"}} {data["count"]}')
+        for metric in self.COUNTERS:
+            lines.append(f"# TYPE game_{metric}_total counter")
+            for phase, values in sorted(snapshot["io"].items()):
+                if metric in values:
+                    lines.append(f'game_{metric}_total{{phase="{phase}"}} {values[metric]}')
+        for name, values in sorted(snapshot["caches"].items()):
+            for metric, value in values.items():
+                kind = "gauge" if metric in ("entries", "bytes") else "counter"
+                suffix = "" if kind == "gauge" else "_total"
+                lines.append(f"# TYPE game_cache_{metric}{suffix} {kind}")
+                lines.append(f'game_cache_{metric}{suffix}{{cache="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Запись метрик в файл: .json - снимок, иначе формат Prometheus"""
+        if path.endswith(".json"):
+            text = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        else:
+            text = self.prometheus()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
@@ -0,0 +1,402 @@
+"""Нагрузочный прогон полных сессий в пуле процессов"""
+
+import json
+import os
+import random
+import struct
+import time
+from collections import Counter
+
+from gamekk.autosave import Autosave
+from gamekk.console import ScriptedIO
+from gamekk.credentials import CredentialStore
+from gamekk.game import Game, SHARED
+from gamekk.instrumentation import Instrumentation
+from gamekk.player import PlayerRecord, PlayerView
+from gamekk.storage import PlayerStore
+from gamekk.story import StoryGraph
+from gamekk.texts import CATALOG
+from gamekk.vault import ArtifactVault, SQLiteArtifactVault
+
+
+class SessionScript:
+    """Ответы сессии по вопросам игры: сценарий для нагрузочного прогона.
+
+    answers - {вопрос: ответ или список ответов}, где вопрос - ключ каталога
+    текстов (menu.choice, save.ask...) или имя узла сюжета (class, math, cs).
+    Ответы из списка отдаются по очереди, последний повторяется. Если игра
+    спросила то, чего нет в сценарии, или задала больше limit вопросов,
+    сессия обрывается EOFError, а не зацикливается.
+    """
+
+    def __init__(self, answers, prompts, limit=100):
+        self.answers = {key: list(value) if isinstance(value, list) else [value] for key, value in answers.items()}
+        self.prompts = prompts  # текст вопроса -> ключ, см. prompt_keys()
+        self.limit = limit
+        self.asked = Counter()  # ключ -> сколько раз спросили
+
+    @staticmethod
+    def prompt_keys(story):
+        """Текст вопроса -> ключ каталога или имя узла сюжета"""
+        prompts = {text: key for key, text in CATALOG.templates.items() if isinstance(text, str)}
+        for node, prompt in enumerate(story.prompt):
+            if prompt is not None:
+                prompts[prompt] = story.names[node]
+        return prompts
+
+    def __call__(self, prompt):
+        key = self.prompts.get(prompt, prompt)
+        self.asked[key] += 1
+        if sum(self.asked.values()) > self.limit:
+            raise EOFError("сценарий не закончил сессию")
+        answers = self.answers.get(key)
+        if not answers:
+            raise EOFError(f"в сценарии нет ответа на вопрос {key!r}")
+        return answers.pop(0) if len(answers) > 1 else answers[0]
+
+
+class VaultCounter:
+    """Примесь к копилке: сколько артефактов этот процесс взял, вернул и создал"""
+
+    def __init__(self, *args, **kwargs):
+        self.moved = Counter()
+        super().__init__(*args, **kwargs)
+
+    def _take(self):
+        artifact = super()._take()
+        if artifact is not None:
+            self.moved["taken"] += 1
+        return artifact
+
+    def _return(self, items):
+        super()._return(items)
+        self.moved["returned"] += len(items)
+
+    def _generate(self, items):
+        generated = super()._generate(items)
+        if generated:
+            self.moved["generated"] += len(items)
+        return generated
+
+
+class LoadGame(Game):
+    """Игра нагрузочного прогона: запоминает, что сохранила и что загрузила"""
+
+    def __init__(self, io, vault_class, kdf_iterations):
+        super().__init__(io, vault_class=vault_class)
+        self.kdf_iterations = kdf_iterations
+        self.saved = None  # запись игрока на момент последнего сохранения
+        self.loaded = False  # запись, загруженная при входе (None - сохранения не было)
+
+    @property
+    def credentials(self):
+        return SHARED.get(CredentialStore, legacy_filename=self.credentials_file, iterations=self.kdf_iterations)
+
+    def save_game(self, player):
+        super().save_game(player)
+        self.saved = player.to_dict()
+
+    def load_game(self, username):
+        player = super().load_game(username)
+        self.loaded = player.to_dict() if player is not None else None
+        return player
+
+
+class LoadGenerator:
+    """Нагрузочный прогон: полные сессии main_menu по сценариям в пуле процессов.
+
+    Все процессы работают с одной папкой данных, как несколько копий игры
+    на одном сервере. Каждый процесс регистрирует своих игроков и заходит
+    ими снова, помня, что сохранил: если вход загрузил не то, это
+    потерянное обновление. После прогона audit() заново читает файлы
+    и ищет испорченные записи, пропавших игроков и учетные записи, а для
+    копилки сверяет число артефактов с тем, сколько их взяли, вернули и создали.
+    """
+
+    LOGIN_SHARE = 0.5  # доля сессий, которые заходят уже зарегистрированным игроком
+    SAVE_SHARE = 0.9  # доля сессий, которые соглашаются сохраниться
+
+    def __init__(self, workdir, sessions=200, concurrency=4, vault_class=ArtifactVault,
+                 kdf_iterations=CredentialStore.ITERATIONS, seed=0):
+        self.workdir = os.path.abspath(workdir)
+        self.sessions = sessions
+        self.concurrency = concurrency
+        self.vault_class = vault_class
+        self.kdf_iterations = kdf_iterations
+        self.seed = seed
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def open_vault(self):
+        if issubclass(self.vault_class, SQLiteArtifactVault):
+            return self.vault_class(self.path("artifacts.db"), self.path("artifacts.json"),
+                                    self.path("artifacts.journal"))
+        return self.vault_class(self.path("artifacts.json"), self.path("artifacts.journal"))
+
+    @classmethod
+    def answers(cls, rng, menu, username, password):
+        """Случайный сценарий одной сессии: регистрация (menu "1") или вход (menu "2")"""
+        exams = list(StoryGraph.EXAMS)
+        rng.shuffle(exams)
+        prefix = "register" if menu == "1" else "login"
+        return {
+            "menu.choice": [menu, "3"],  # после неудачного входа - выход
+            prefix + ".login": username,
+            prefix + ".password": password,
+            "class": rng.choice("12"),
+            "session.first": exams[0],
+            "session.pick": exams,
+            "math": rng.choice("12"),
+            "cs": rng.choice("12"),
+            "save.ask": "да" if rng.random() < cls.SAVE_SHARE else "нет",
+            "retake.ask": rng.choice(("да", "нет")),
+            "retake.choose": exams[0],
+            "menu.again": "нет",
+        }
+
+    @classmethod
+    def run_worker(cls, workdir, vault_class, sessions, seed, prefix, kdf_iterations):
+        """Сессии одного процесса пула; возвращает замеры и то, что процесс сохранил"""
+        os.chdir(workdir)
+        rng = random.Random(seed)
+        random.seed(seed)
+        instrumentation = Instrumentation(keep_samples=True)
+        instrumentation.enable()
+        vault_class = type("Counted" + vault_class.__name__, (VaultCounter, vault_class), {})
+        prompts = SessionScript.prompt_keys(SHARED.get(StoryGraph))
+        saved = {}  # логин -> последняя сохраненная запись или None
+        names = []
+        errors = Counter()
+        stale = []  # логины, для которых вход загрузил не последнее сохранение
+        failed_logins = 0
+        started = time.time()
+        for number in range(sessions):
+            if names and rng.random() < cls.LOGIN_SHARE:
+                username, menu = rng.choice(names), "2"
+            else:
+                username, menu = f"{prefix}-{number}", "1"
+            script = SessionScript(cls.answers(rng, menu, username, "pw-" + username), prompts)
+            game = LoadGame(ScriptedIO(script), vault_class, kdf_iterations)
+            session_started = time.perf_counter()
+            try:
+                instrumentation.instrument(game)
+                game.main_menu()
+            except Exception as error:  # сессия оборвалась (в том числе на испорченных файлах)
+                errors[f"{type(error).__name__}: {error}"] += 1
+            instrumentation.observe("session", time.perf_counter() - session_started)
+
+            if menu == "1" and game.current_player is not None:
+                names.append(username)
+                saved[username] = None
+            elif menu == "2":
+                if game.current_player is None:
+                    failed_logins += 1
+                elif game.loaded != saved.get(username):
+                    stale.append(username)
+            if game.saved is not None:
+                saved[username] = game.saved
+        finished = time.time()
+
+        # Дописываем отложенное напрямую, без перечитывания испорченных файлов через свойства игры
+        moved = Counter()
+        for part in list(SHARED.items.values()):
+            try:
+                if isinstance(part, VaultCounter):
+                    part.flush()
+                    moved = part.moved
+                elif isinstance(part, CredentialStore):
+                    part.pool.shutdown(wait=True)
+                elif isinstance(part, PlayerStore):
+                    part.wait()
+                    part.flush_stats()
+                elif isinstance(part, Autosave):
+                    part.close()
+            except Exception as error:
+                errors[f"{type(error).__name__}: {error}"] += 1
+        instrumentation.disable()
+        SHARED.clear()  # следующая задача в этом процессе откроет хранилища заново
+        return {
+            "sessions": sessions,
+            "started": started,
+            "finished": finished,
+            "samples": instrumentation.samples,
+            "counters": instrumentation.counters,
+            "errors": errors,
+            "stale": stale,
+            "failed_logins": failed_logins,
+            "moved": moved,
+            "saved": saved,
+        }
+
+    def run(self):
+        """Прогон всех сессий и проверка файлов; отчет в виде словаря для JSON"""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        os.makedirs(self.workdir, exist_ok=True)
+        vault = self.open_vault()
+        initial = len(vault.artifacts)
+        vault.flush()
+        prefix = f"load{self.seed}-{os.urandom(3).hex()}"
+        shares = [self.sessions // self.concurrency + (worker < self.sessions % self.concurrency)
+                  for worker in range(self.concurrency)]
+        with ProcessPoolExecutor(self.concurrency, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(LoadGenerator.run_worker, self.workdir, self.vault_class, share,
+                                   self.seed * self.concurrency + worker, f"{prefix}-{worker}", self.kdf_iterations)
+                       for worker, share in enumerate(shares) if share]
+            results = [future.result() for future in futures]
+        return self.report(results, initial)
+
+    @staticmethod
+    def percentiles(samples):
+        samples = sorted(samples)
+        at = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 3)
+        return {"count": len(samples), "p50_ms": at(0.5), "p95_ms": at(0.95), "p99_ms": at(0.99),
+                "max_ms": round(samples[-1] * 1000, 3)}
+
+    def report(self, results, initial):
+        samples, counters, errors, moved, saved = {}, Counter(), Counter(), Counter(), {}
+        stale, failed_logins = [], 0
+        for result in results:
+            for phase, values in result["samples"].items():
+                samples.setdefault(phase, []).extend(values)
+            counters.update(result["counters"])
+            errors.update(result["errors"])
+            moved.update(result["moved"])
+            saved.update(result["saved"])
+            stale.extend(result["stale"])
+            failed_logins += result["failed_logins"]
+        seconds = max(result["finished"] for result in results) - min(result["started"] for result in results)
+        sessions = sum(result["sessions"] for result in results)
+        io = {}
+        for (metric, phase), value in sorted(counters.items()):
+            io.setdefault(phase, {})[metric] = value
+
+        problems = self.audit(saved, initial + moved["returned"] + moved["generated"] - moved["taken"])
+        if stale:
+            problems.append(f"вход загрузил не последнее сохранение: {len(stale)} раз, например {stale[0]}")
+        if failed_logins:
+            problems.append(f"не удалось войти зарегистрированным игроком: {failed_logins} раз")
+        return {
+            "sessions": sessions,
+            "concurrency": self.concurrency,
+            "vault": self.vault_class.__name__,
+            "kdf_iterations": self.kdf_iterations,
+            "seconds": round(seconds, 3),
+            "sessions_per_second": round(sessions / seconds, 2) if seconds else None,
+            "errors": dict(errors.most_common()),
+            "phases": {phase: self.percentiles(values) for phase, values in sorted(samples.items())},
+            "io": io,
+            "vault_moves": dict(moved),
+            "problems": problems,
+        }
+
+    def audit(self, saved, vault_expected):
+        """Проверка общих файлов после прогона; список найденных проблем"""
+        problems = []
+        problems.extend(self._audit_players(saved))
+        problems.extend(self._audit_credentials(saved))
+        try:
+            found = len(self.open_vault().artifacts)
+        except ValueError as error:
+            problems.append(f"копилка не читается ({type(error).__name__}: {error})")
+        else:
+            if found != vault_expected:
+                problems.append(f"копилка: ожидалось {vault_expected} артефактов, найдено {found}")
+        return problems
+
+    def _audit_players(self, saved):
+        problems = []
+        words = []
+        if os.path.exists(self.path("players.words")):
+            with open(self.path("players.words"), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        words.append(json.loads(line))
+                    except ValueError:
+                        problems.append(f"players.words: испорченная строка {len(words) + 1}")
+                        break
+
+        records = {}  # смещение -> (логин, длина) по сквозному чтению журнала
+        corrupt = []  # смещения записей, которые не разбираются
+        size = offset = generation = 0
+        if os.path.exists(self.path("players.dat")):
+            with open(self.path("players.dat"), 'rb') as f:
+                generation, offset = PlayerStore._read_header(f)
+                try:
+                    for username, data, delta in PlayerStore._records(f):
+                        try:
+                            if delta:
+                                PlayerRecord.decode_events(data, words)
+                            else:
+                                PlayerView(data).to_dict()
+                        except (IndexError, KeyError, ValueError, struct.error):
+                            corrupt.append(offset)
+                        records[offset] = (username, len(data))
+                        offset += len(data)
+                except (ValueError, struct.error) as error:
+                    problems.append(f"players.dat: запись по смещению {offset} не читается ({error})")
+                size = f.seek(0, os.SEEK_END)
+        if corrupt:
+            problems.append(f"players.dat: {len(corrupt)} испорченных записей, первая по смещению {corrupt[0]}")
+        if offset < size:
+            problems.append(f"players.dat: {size - offset} байт после последней целой записи")
+
+        mismatched = 0
+        if os.path.exists(self.path("players.idx")):
+            with open(self.path("players.idx"), 'r', encoding='utf-8') as f:
+                for number, line in enumerate(f, 1):
+                    try:
+                        entry = json.loads(line)
+                        if number == 1 and PlayerStore._index_generation(entry) is not None:
+                            if PlayerStore._index_generation(entry) != generation:
+                                problems.append(f"players.idx: поколение {entry[1]}, у журнала {generation}")
+                            continue
+                        username, offset, length, *_ = entry
+                    except ValueError:
+                        problems.append(f"players.idx: испорченная строка {number}")
+                        continue
+                    if records.get(offset) != (username, length):
+                        mismatched += 1
+        if mismatched:
+            problems.append(f"players.idx: {mismatched} строк не указывают на запись этого игрока")
+
+        lost = []
+        try:
+            store = PlayerStore(self.path("players.dat"), self.path("players.idx"), legacy_filename=None,
+                                legacy_log=None, stats_filename=None, words_filename=self.path("players.words"))
+        except (IndexError, KeyError, ValueError, struct.error) as error:
+            problems.append(f"хранилище игроков не открывается ({type(error).__name__}: {error})")
+            store = None
+        for username, record in saved.items():
+            try:
+                if record is not None and (store is None or store.load(username) != record):
+                    lost.append(username)
+            except (IndexError, KeyError, ValueError, struct.error):
+                lost.append(username)
+        if lost:
+            problems.append(f"игроки: {len(lost)} последних сохранений не читаются, например {lost[0]}")
+        return problems
+
+    def _audit_credentials(self, saved):
+        problems = []
+        seen = Counter()
+        if os.path.exists(self.path("users.db")):
+            with open(self.path("users.db"), 'r', encoding='utf-8') as f:
+                for number, line in enumerate(f, 1):
+                    try:
+                        username, salt = json.loads(line)[:2]
+                    except (ValueError, TypeError):
+                        problems.append(f"users.db: испорченная строка {number}")
+                        continue
+                    seen[username, salt is None] += 1  # бронь логина и его хеш считаем отдельно
+        duplicates = {username for (username, _), count in seen.items() if count > 1}
+        if duplicates:
+            problems.append(f"users.db: {len(duplicates)} логинов записаны несколько раз")
+        credentials = CredentialStore(self.path("users.db"), legacy_filename=None, workers=1)
+        missing = [username for username in saved if not credentials.exists(username)]
+        credentials.pool.shutdown()
+        if missing:
+            problems.append(f"учетные записи: {len(missing)} зарегистрированных игроков не читаются, "
+                            f"например {missing[0]}")
+        return problems
@@ -0,0 +1,539 @@
+"""Игрок: компактное представление в памяти и двоичная запись"""
+
+import struct
+from array import array
+from collections.abc import MutableMapping, MutableSequence
+
+
+class Registry:
+    """Интернирование строк: каждая строка получает небольшой постоянный номер"""
+
+    __slots__ = ("names", "ids")
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.id(name)
+
+    def id(self, name):
+        code = self.ids.get(name)
+        if code is None:
+            code = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def name(self, code):
+        return self.names[code]
+
+
+# Экзамены и оценки игры - единственная таблица; ее используют справочники
+# ниже, двоичная запись PlayerRecord и граф сюжета StoryGraph
+EXAM_NAMES = ("матан", "информатика")
+GRADE_NAMES = ("не сдан", "3", "4")
+
+# Общие справочники для всех игроков. Порядок оценок важен: код 0 - "не сдан".
+# Экзамены и оценки из данных в EXAMS и GRADES не добавляются: они хранятся
+# у самого игрока (Player.other_grades), иначе попали бы во всех игроков
+EXAMS = Registry(EXAM_NAMES)
+GRADES = Registry(GRADE_NAMES)
+ARTIFACTS = Registry(["Телефон", "Умные часы", "Шпаргалка"])
+PROGRESS = Registry(["Выбрал класс"])
+
+GRADE_BITS = 4  # бит на оценку одного экзамена в Player.grades
+GRADE_MASK = (1 << GRADE_BITS) - 1
+assert len(GRADES.names) <= GRADE_MASK + 1, "оценки не помещаются в GRADE_BITS"
+
+
+class ExamGrades(MutableMapping):
+    """Оценки игрока в виде словаря экзамен -> оценка поверх упакованного числа.
+
+    Экзамены из EXAMS с оценками из GRADES упакованы в player.grades,
+    остальные пары лежат в словаре player.other_grades.
+    """
+
+    __slots__ = ("player",)
+
+    def __init__(self, player):
+        self.player = player
+
+    def __getitem__(self, exam):
+        other = self.player.other_grades
+        if other and exam in other:
+            return other[exam]
+        shift = EXAMS.ids[exam] * GRADE_BITS
+        return GRADES.names[(self.player.grades >> shift) & GRADE_MASK]
+
+    def __setitem__(self, exam, grade):
+        code, grade_code = EXAMS.ids.get(exam), GRADES.ids.get(grade)
+        other = self.player.other_grades
+        if code is None or grade_code is None:
+            if other is None:
+                other = self.player.other_grades = {}
+            other[exam] = grade
+            return
+        if other and exam in other:
+            del other[exam]
+            if not other:
+                self.player.other_grades = None
+        shift = code * GRADE_BITS
+        self.player.grades = self.player.grades & ~(GRADE_MASK << shift) | (grade_code << shift)
+
+    def __delitem__(self, exam):
+        raise TypeError("экзамен нельзя удалить")
+
+    def __iter__(self):
+        other = self.player.other_grades or {}
+        return iter(EXAMS.names + [exam for exam in other if exam not in EXAMS.ids])
+
+    def __len__(self):
+        other = self.player.other_grades or {}
+        return len(EXAMS.names) + sum(exam not in EXAMS.ids for exam in other)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class InternedList(MutableSequence):
+    """Список строк поверх массива номеров из справочника"""
+
+    __slots__ = ("codes", "registry")
+
+    def __init__(self, codes, registry):
+        self.codes = codes
+        self.registry = registry
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.registry.names[code] for code in self.codes[index]]
+        return self.registry.names[self.codes[index]]
+
+    def __setitem__(self, index, name):
+        self.codes[index] = self.registry.id(name)
+
+    def __delitem__(self, index):
+        del self.codes[index]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def insert(self, index, name):
+        self.codes.insert(index, self.registry.id(name))
+
+    def clear(self):
+        del self.codes[:]
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class ProgressList(InternedList):
+    """Пройденные ветки: порядок в массиве, быстрая проверка по битовой маске"""
+
+    __slots__ = ("player",)
+
+    def __init__(self, player):
+        super().__init__(player.progress_ids, PROGRESS)
+        self.player = player
+
+    def __contains__(self, branch):
+        code = PROGRESS.ids.get(branch)
+        return code is not None and bool(self.player.progress_flags >> code & 1)
+
+    def insert(self, index, branch):
+        super().insert(index, branch)
+        self.player.progress_flags |= 1 << PROGRESS.ids[branch]
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self.player.progress_flags = 0
+        for code in self.codes:
+            self.player.progress_flags |= 1 << code
+
+    def clear(self):
+        super().clear()
+        self.player.progress_flags = 0
+
+
+class Player:
+    """Игрок в компактном виде.
+
+    Атрибуты в __slots__, оценки упакованы в одно число (по GRADE_BITS бит
+    на экзамен; экзамены и оценки не из справочников - в other_grades),
+    артефакты и ветки - массивы номеров из справочников.
+    exams, artifacts и story_progress выглядят как прежние dict и list.
+
+    Ход игры меняет игрока через record(): событие применяется и копится
+    в events до сохранения, event_seq - число уже сохраненных событий.
+    Событие - кортеж (код EVENT_*, текст или None, число или оценка).
+    """
+
+    __slots__ = ("username", "reputation", "scholarship", "lives",
+                 "grades", "other_grades", "artifact_ids", "progress_ids", "progress_flags", "events", "event_seq")
+
+    (EVENT_BRANCH, EVENT_CHOICE, EVENT_GRADE, EVENT_ARTIFACT, EVENT_LIVES,
+     EVENT_REPUTATION, EVENT_SCHOLARSHIP, EVENT_RETURN) = range(8)
+    EVENT_NAMES = ("branch", "choice", "grade", "artifact", "lives",
+                   "reputation", "scholarship_lost", "artifacts_returned")
+
+    def __init__(self, username):
+        self.username = username
+        self.reputation = 10  # начальная репутация
+        self.grades = 0  # все экзамены "не сдан"
+        self.other_grades = None  # экзамен -> оценка, которых нет в EXAMS и GRADES
+        self.artifact_ids = array('H', [ARTIFACTS.id("Телефон"), ARTIFACTS.id("Умные часы"),
+                                        ARTIFACTS.id("Шпаргалка")])  # артефакты игрока
+        self.progress_ids = array('H')  # пройденные ветки
+        self.progress_flags = 0  # битовая маска пройденных веток
+        self.scholarship = True  # стипендия сохранена
+        self.lives = 2  # количество попыток на пересдачу
+        self.events = None  # события после последнего сохранения
+        self.event_seq = 0  # число сохраненных событий
+
+    @property
+    def exams(self):
+        return ExamGrades(self)
+
+    @exams.setter
+    def exams(self, exams):
+        self.grades = 0
+        self.other_grades = None
+        grades = ExamGrades(self)
+        for exam, grade in exams.items():
+            grades[exam] = grade
+
+    @property
+    def artifacts(self):
+        return InternedList(self.artifact_ids, ARTIFACTS)
+
+    @artifacts.setter
+    def artifacts(self, artifacts):
+        self.artifact_ids = array('H', [ARTIFACTS.id(artifact) for artifact in artifacts])
+
+    @property
+    def story_progress(self):
+        return ProgressList(self)
+
+    @story_progress.setter
+    def story_progress(self, story_progress):
+        self.progress_ids = array('H')
+        self.progress_flags = 0
+        self.story_progress.extend(story_progress)
+
+    def add_artifact(self, artifact):
+        self.artifact_ids.append(ARTIFACTS.id(artifact))
+
+    def add_story_progress(self, branch):
+        code = PROGRESS.id(branch)
+        self.progress_ids.append(code)
+        self.progress_flags |= 1 << code
+
+    def record(self, code, text=None, value=0):
+        """Применить событие хода и запомнить его до сохранения"""
+        event = (code, text, value)
+        self.apply(event)
+        if self.events is None:
+            self.events = []
+        self.events.append(event)
+
+    def apply(self, event):
+        """Применить событие к состоянию, не записывая его"""
+        code, text, value = event
+        if code == self.EVENT_BRANCH:
+            self.add_story_progress(text)
+        elif code == self.EVENT_GRADE:
+            self.exams[text] = value
+        elif code == self.EVENT_ARTIFACT:
+            self.add_artifact(text)
+        elif code == self.EVENT_LIVES:
+            self.lives += value
+        elif code == self.EVENT_REPUTATION:
+            self.reputation += value
+        elif code == self.EVENT_SCHOLARSHIP:
+            self.scholarship = False
+        elif code == self.EVENT_RETURN:
+            del self.artifact_ids[:]
+        # EVENT_CHOICE только попадает в историю
+
+    def replay(self, events):
+        """Повтор сохраненных событий поверх контрольной точки"""
+        for event in events:
+            self.apply(event)
+        self.event_seq += len(events)
+
+    def events_saved(self):
+        """Накопленные события записаны"""
+        self.event_seq += len(self.events or ())
+        self.events = None
+
+    @staticmethod
+    def scholarship_lost(math, cs):
+        """Теряется ли стипендия при таких оценках"""
+        if math == "3" or cs == "3":
+            return True
+        elif math == "не сдан" and cs == "4":
+            return True
+        elif math == "4" and cs == "3":
+            return True
+        return False
+
+    def check_scholarship(self):
+        """Проверка сохранения стипендии"""
+        if self.scholarship and self.scholarship_lost(self.exams["матан"], self.exams["информатика"]):
+            self.record(self.EVENT_SCHOLARSHIP)
+        return self.scholarship
+
+    def to_dict(self):
+        """Конвертация в словарь для сохранения"""
+        return {
+            "username": self.username,
+            "reputation": self.reputation,
+            "exams": dict(self.exams),
+            "artifacts": list(self.artifacts),
+            "story_progress": list(self.story_progress),
+            "scholarship": self.scholarship,
+            "lives": self.lives,
+            "event_seq": self.event_seq + len(self.events or ())
+        }
+
+    def copy(self):
+        """Независимая копия игрока без несохраненных событий"""
+        player = Player.__new__(Player)
+        for name in self.__slots__:
+            setattr(player, name, getattr(self, name))
+        if self.other_grades is not None:
+            player.other_grades = dict(self.other_grades)
+        player.artifact_ids = array('H', self.artifact_ids)
+        player.progress_ids = array('H', self.progress_ids)
+        player.event_seq = self.event_seq + len(self.events or ())
+        player.events = None
+        return player
+
+    @classmethod
+    def from_dict(cls, data):
+        """Создание объекта из словаря"""
+        player = cls(data["username"])
+        player.reputation = data["reputation"]
+        player.exams = data["exams"]
+        player.artifacts = data["artifacts"]
+        player.story_progress = data["story_progress"]
+        player.scholarship = data["scholarship"]
+        player.lives = data["lives"]
+        player.event_seq = data.get("event_seq", 0)
+        return player
+
+
+class PlayerRecord:
+    """Двоичная запись игрока.
+
+    Заголовок фиксированной длины: длина записи, репутация, попытки,
+    стипендия, коды оценок по FORMAT_EXAMS и число строк в секциях.
+    Дальше строки с двухбайтовым префиксом длины: логин, артефакты,
+    пройденные ветки и пары экзамен/оценка, не попавшие в коды. С флагом
+    FLAG_EVENT_SEQ последние 4 байта - число событий, учтенных в записи.
+
+    Запись-дельта (старший бит длины DELTA) хранит события одного сохранения:
+    заголовок DELTA_HEADER, логин и события по EVENT.size байт, где строки
+    заменены номерами из общего словаря хранилища (Registry). Репутация,
+    попытки, стипендия и коды оценок после сохранения лежат в заголовке дельты
+    по тем же смещениям, что и в полной записи.
+    """
+
+    HEADER = struct.Struct("<IiiBBBBHHH")
+    LENGTH = struct.Struct("<I")
+    SEQ = struct.Struct("<I")
+    FLAG_EVENT_SEQ = 1  # байт 15: в конце записи лежит event_seq
+    DELTA = 1 << 31
+    # длина | DELTA, репутация, попытки, стипендия и коды оценок как в HEADER, номер первого события, число событий
+    DELTA_HEADER = struct.Struct("<IiiBBBIH")
+    EVENT = struct.Struct("<BIi")  # код, номер текста в словаре, число или номер оценки
+    NO_TEXT = 0xFFFFFFFF
+    TEXT_VALUES = (Player.EVENT_GRADE,)  # события, у которых значение - строка
+    REPUTATION = struct.Struct("<i")  # смещение 4
+    LIVES = struct.Struct("<i")  # смещение 8
+    STRING = struct.Struct("<H")
+    FORMAT_EXAMS = EXAM_NAMES  # байты 13 и 14
+    FORMAT_GRADES = GRADE_NAMES
+    OTHER = 0xFF  # оценка лежит в секции прочих оценок
+
+    @classmethod
+    def _codes(cls, exams):
+        """Коды оценок по FORMAT_EXAMS и пары экзамен/оценка, не попавшие в коды"""
+        codes, extra = [], []
+        for exam in cls.FORMAT_EXAMS:
+            grade = exams.get(exam, "не сдан")
+            if grade in cls.FORMAT_GRADES:
+                codes.append(cls.FORMAT_GRADES.index(grade))
+            else:
+                codes.append(cls.OTHER)
+                extra.append((exam, grade))
+        extra.extend((exam, grade) for exam, grade in exams.items() if exam not in cls.FORMAT_EXAMS)
+        return codes, extra
+
+    @classmethod
+    def encode(cls, record):
+        """Запись Player.to_dict() -> bytes"""
+        codes, extra = cls._codes(record["exams"])
+
+        body = bytearray()
+        for text in [record["username"], *record["artifacts"], *record["story_progress"],
+                     *(text for pair in extra for text in pair)]:
+            data = text.encode('utf-8')
+            body += cls.STRING.pack(len(data))
+            body += data
+        flags = 0
+        if record.get("event_seq"):
+            flags |= cls.FLAG_EVENT_SEQ
+            body += cls.SEQ.pack(record["event_seq"])
+        header = cls.HEADER.pack(cls.HEADER.size + len(body), record["reputation"], record["lives"],
+                                 record["scholarship"], *codes, flags, len(record["artifacts"]),
+                                 len(record["story_progress"]), len(extra))
+        return header + body
+
+    @classmethod
+    def is_delta(cls, data, offset=0):
+        return bool(cls.LENGTH.unpack_from(data, offset)[0] & cls.DELTA)
+
+    @classmethod
+    def encode_events(cls, username, first_seq, events, words, record):
+        """События одного сохранения и record после них -> запись-дельта; новые строки добавляются в words"""
+        packed = bytearray()
+        for code, text, value in events:
+            if code in cls.TEXT_VALUES:
+                value = words.id(value)
+            packed += cls.EVENT.pack(code, cls.NO_TEXT if text is None else words.id(text), value)
+        name = username.encode('utf-8')
+        length = cls.DELTA_HEADER.size + cls.STRING.size + len(name) + len(packed)
+        codes, _ = cls._codes(record["exams"])
+        return (cls.DELTA_HEADER.pack(length | cls.DELTA, record["reputation"], record["lives"],
+                                      record["scholarship"], *codes, first_seq, len(events))
+                + cls.STRING.pack(len(name)) + name + packed)
+
+    @classmethod
+    def decode_events(cls, data, words):
+        """Запись-дельта -> (логин, номер первого события, [событие]); words - список строк словаря"""
+        first_seq, count = cls.delta_seq(data)
+        username = cls.delta_username(data)
+        position = cls.DELTA_HEADER.size + cls.STRING.size + len(username.encode('utf-8'))
+        events = []
+        for code, text, value in cls.EVENT.iter_unpack(data[position:position + count * cls.EVENT.size]):
+            events.append((code, None if text == cls.NO_TEXT else words[text],
+                           words[value] if code in cls.TEXT_VALUES else value))
+        return username, first_seq, events
+
+    @classmethod
+    def delta_seq(cls, data, offset=0):
+        """Номер первого события дельты и их число"""
+        return cls.DELTA_HEADER.unpack_from(data, offset)[-2:]
+
+    @classmethod
+    def delta_username(cls, data):
+        position = cls.DELTA_HEADER.size
+        length = cls.STRING.unpack_from(data, position)[0]
+        return bytes(data[position + 2:position + 2 + length]).decode('utf-8')
+
+
+class PlayerView:
+    """Ленивое чтение записи PlayerRecord прямо из буфера (bytes или mmap).
+
+    Поля заголовка читаются без копирования, строки декодируются
+    только по запросу, полный Player собирается в to_player().
+    Представление может стоять и на дельте: тогда поля заголовка берутся
+    из нее, а за остальным load() собирает полную запись.
+    """
+
+    __slots__ = ("buffer", "offset", "load")
+
+    def __init__(self, buffer, offset=0, load=None):
+        self.buffer = buffer
+        self.offset = offset
+        self.load = load  # для дельты: функция, отдающая полную запись Player.to_dict()
+
+    def _resolve(self):
+        """Переход с дельты на полную запись (один раз)"""
+        if self.load is not None:
+            self.buffer, self.offset, self.load = PlayerRecord.encode(self.load()), 0, None
+
+    @property
+    def reputation(self):
+        return PlayerRecord.REPUTATION.unpack_from(self.buffer, self.offset + 4)[0]
+
+    @property
+    def lives(self):
+        return PlayerRecord.LIVES.unpack_from(self.buffer, self.offset + 8)[0]
+
+    @property
+    def scholarship(self):
+        return bool(self.buffer[self.offset + 12])
+
+    def grade(self, exam):
+        """Оценка одного экзамена"""
+        if exam in PlayerRecord.FORMAT_EXAMS:
+            code = self.buffer[self.offset + 13 + PlayerRecord.FORMAT_EXAMS.index(exam)]
+            if code != PlayerRecord.OTHER:
+                return PlayerRecord.FORMAT_GRADES[code]
+        return self._sections()[4].get(exam, "не сдан")
+
+    def passed(self, exam):
+        """Сдан ли экзамен"""
+        return self.grade(exam) != "не сдан"
+
+    @property
+    def event_seq(self):
+        """Число событий, учтенных в записи"""
+        if self.load is not None:
+            first_seq, count = PlayerRecord.delta_seq(self.buffer, self.offset)
+            return first_seq + count
+        if not self.buffer[self.offset + 15] & PlayerRecord.FLAG_EVENT_SEQ:
+            return 0
+        length = PlayerRecord.LENGTH.unpack_from(self.buffer, self.offset)[0]
+        return PlayerRecord.SEQ.unpack_from(self.buffer, self.offset + length - PlayerRecord.SEQ.size)[0]
+
+    @property
+    def username(self):
+        header = PlayerRecord.HEADER if self.load is None else PlayerRecord.DELTA_HEADER
+        position = self.offset + header.size
+        length = PlayerRecord.STRING.unpack_from(self.buffer, position)[0]
+        return self.buffer[position + 2:position + 2 + length].decode('utf-8')
+
+    def _sections(self):
+        """Разбор записи: заголовок, логин, артефакты, ветки, прочие оценки"""
+        self._resolve()
+        header = PlayerRecord.HEADER.unpack_from(self.buffer, self.offset)
+        artifacts_count, progress_count, extra_count = header[-3:]
+        # Одна копия переменной части, дальше разбор по срезам
+        body = self.buffer[self.offset + PlayerRecord.HEADER.size:self.offset + header[0]]
+        position = 0
+        strings = []
+        for _ in range(1 + artifacts_count + progress_count + 2 * extra_count):
+            end = position + 2 + (body[position] | body[position + 1] << 8)
+            strings.append(body[position + 2:end].decode('utf-8'))
+            position = end
+        progress_end = 1 + artifacts_count + progress_count
+        extra = strings[progress_end:]
+        return (header, strings[0], strings[1:1 + artifacts_count], strings[1 + artifacts_count:progress_end],
+                dict(zip(extra[::2], extra[1::2])))
+
+    def to_dict(self):
+        """Полная запись в формате Player.to_dict()"""
+        header, username, artifacts, story_progress, extra = self._sections()
+        event_seq = 0
+        if header[6] & PlayerRecord.FLAG_EVENT_SEQ:
+            event_seq = PlayerRecord.SEQ.unpack_from(self.buffer, self.offset + header[0] - PlayerRecord.SEQ.size)[0]
+        exams = {}
+        for exam, code in zip(PlayerRecord.FORMAT_EXAMS, header[4:6]):
+            exams[exam] = extra.pop(exam) if code == PlayerRecord.OTHER else PlayerRecord.FORMAT_GRADES[code]
+        exams.update(extra)
+        return {
+            "username": username,
+            "reputation": header[1],
+            "exams": exams,
+            "artifacts": artifacts,
+            "story_progress": story_progress,
+            "scholarship": bool(header[3]),
+            "lives": header[2],
+            "event_seq": event_seq
+        }
+
+    def to_player(self):
+        return Player.from_dict(self.to_dict())
@@ -0,0 +1,122 @@
+"""TCP-сервер на много игроков"""
+
+import threading
+
+from gamekk.console import BufferedIO
+from gamekk.credentials import CredentialStore
+from gamekk.game import Game
+from gamekk.storage import PlayerStore
+from gamekk.vault import ArtifactVault
+
+
+class SocketIO(BufferedIO):
+    """Ввод-вывод сессии через TCP-соединение.
+
+    Игра вызывает say/ask из своего потока, а запись и чтение
+    выполняются в цикле asyncio сервера.
+    """
+
+    def __init__(self, reader, writer, loop):
+        super().__init__()
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+
+    def write(self, text):
+        self.loop.call_soon_threadsafe(self.writer.write, text.encode('utf-8'))
+
+    def read_line(self):
+        import asyncio
+        line = asyncio.run_coroutine_threadsafe(self._read_line(), self.loop).result()
+        if not line:
+            raise EOFError("клиент отключился")
+        return line.decode('utf-8', errors='replace').rstrip("\r\n")
+
+    async def _read_line(self):
+        await self.writer.drain()
+        return await self.reader.readline()
+
+
+class GameServer:
+    """Асинхронный TCP-сервер: много игроков в одном процессе.
+
+    Соединения принимает цикл asyncio, каждая сессия - свой Game со своим
+    current_player в отдельном потоке с небольшим стеком. Ждущая ввода
+    сессия не занимает цикл. Копилка, хранилище игроков и учетные записи
+    общие, доступ к ним защищен их блокировками.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, stack_size=256 * 1024, vault=None, instrumentation=None,
+                 store=None, credentials=None, autosave=None):
+        self.host = host
+        self.port = port  # после start() - настоящий порт, в том числе для port=0
+        self.stack_size = stack_size  # стек потоков сессий
+        self.instrumentation = instrumentation
+        self.vault = vault or ArtifactVault()
+        self.store = store or PlayerStore()
+        self.credentials = credentials or CredentialStore()
+        self.autosave = autosave  # None - общее автосохранение процесса
+        self.server = None  # asyncio.Server после start()
+        self.sessions = 0  # активные соединения
+        self.spawn_lock = threading.Lock()
+
+    async def handle(self, reader, writer):
+        """Обслуживание одного соединения"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        game = Game(io=SocketIO(reader, writer, loop), vault=self.vault,
+                    store=self.store, credentials=self.credentials, autosave=self.autosave)
+        if self.instrumentation is not None:
+            self.instrumentation.instrument(game)
+        finished = loop.create_future()
+        session = threading.Thread(target=self._play, args=(game, loop, finished), daemon=True)
+        self.sessions += 1
+        try:
+            self._start(session)
+            await finished
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    def _start(self, session):
+        """Старт потока сессии с небольшим стеком.
+
+        threading.stack_size() общий для процесса, поэтому размер ставится
+        только на время старта потока сессии и сразу возвращается: пул
+        хеширования, автосохранение и уплотнение получают обычный стек.
+        """
+        with self.spawn_lock:
+            previous = threading.stack_size(self.stack_size)
+            try:
+                session.start()
+            finally:
+                threading.stack_size(previous)
+
+    @staticmethod
+    def _play(game, loop, finished):
+        try:
+            game.main_menu()
+        except (EOFError, ConnectionError):
+            pass  # клиент ушел посреди сессии
+        finally:
+            try:
+                game.io.flush()
+            except RuntimeError:
+                pass  # цикл сервера уже остановлен
+            loop.call_soon_threadsafe(finished.set_result, None)
+
+    async def start(self):
+        """Открыть сокет и начать принимать соединения; возвращает asyncio.Server"""
+        import asyncio
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve(self):
+        """Запуск сервера до остановки процесса"""
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
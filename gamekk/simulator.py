@@ -0,0 +1,172 @@
+"""Безголовый прогон сессий методом Монте-Карло"""
+
+import random
+from collections import Counter
+
+from gamekk.player import Player
+from gamekk.story import StoryGraph
+
+
+class Simulator:
+    """Безголовый прогон игровой сессии методом Монте-Карло.
+
+    Повторяет новую игру из game_loop: выбор класса, первый экзамен
+    и, если нужно, пересдачу. Ветки берутся из скомпилированного StoryGraph.
+    Игроки в одинаковом состоянии не разыгрываются по одному - на каждом
+    выборе вся группа делится одной пачкой случайных чисел
+    (мультиномиальное распределение).
+
+    Политика - словарь решение -> {вариант ответа: вес}. Решения - это узлы
+    сюжета ("class", "math", "cs") и выборы из game_loop в DECISIONS.
+    Если решение не задано, варианты выбираются равновероятно. Неизвестные
+    решения и варианты, отрицательные и нулевые в сумме веса - ValueError.
+    """
+
+    DECISIONS = {
+        "first_exam": StoryGraph.EXAMS,
+        "retake": ("да", "нет"),
+        "retake_exam": StoryGraph.EXAMS,
+    }
+
+    def __init__(self, policy=None, seed=None, story=None):
+        policy = policy or {}
+        self.story = story or StoryGraph()
+        decisions = dict(self.DECISIONS)
+        for node, name in enumerate(self.story.names):
+            if self.story.prompt[node] is not None:
+                decisions[name] = tuple(self.story.choices[node])
+        self.policy = {}
+        if not isinstance(policy, dict):
+            raise ValueError("политика должна быть словарем решение -> {вариант: вес}")
+        for decision in policy:
+            if decision not in decisions:
+                raise ValueError(f"неизвестное решение {decision!r}, есть: {', '.join(decisions)}")
+        for decision, options in decisions.items():
+            weights = policy.get(decision) or {option: 1 for option in options}
+            self._check_weights(decision, options, weights)
+            total = sum(weights.values())
+            self.policy[decision] = [(choice, weight / total) for choice, weight in weights.items()]
+        self.rng = random.Random(seed)
+        try:
+            import numpy as np
+        except ImportError:  # numpy нужен только для ускорения симуляции
+            np = None
+        self.np_rng = np.random.default_rng(seed) if np is not None else None
+
+    @staticmethod
+    def _check_weights(decision, options, weights):
+        if not isinstance(weights, dict):
+            raise ValueError(f"{decision}: веса должны быть словарем вариант -> вес")
+        for option, weight in weights.items():
+            if option not in options:
+                raise ValueError(f"{decision}: неизвестный вариант {option!r}, есть: {', '.join(options)}")
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not weight >= 0:
+                raise ValueError(f"{decision}: вес варианта {option!r} должен быть неотрицательным числом")
+        if not sum(weights.values()) > 0:
+            raise ValueError(f"{decision}: сумма весов должна быть больше нуля")
+
+    def _multinomial(self, n, probabilities):
+        """Разбить n игроков по вариантам с заданными вероятностями"""
+        if self.np_rng is not None:
+            return self.np_rng.multinomial(n, probabilities).tolist()
+        # Последовательные биномиальные выборки дают точное мультиномиальное распределение
+        result = []
+        rest, mass = n, 1.0
+        for p in probabilities[:-1]:
+            k = self._binomial(rest, min(1.0, p / mass)) if rest and mass > 0 else 0
+            result.append(k)
+            rest -= k
+            mass -= p
+        result.append(rest)
+        return result
+
+    def _binomial(self, n, p):
+        """Число успехов в n испытаниях без numpy"""
+        if p == 0.5:
+            return self.rng.getrandbits(n).bit_count()  # n честных монеток за один вызов
+        binomial = getattr(self.rng, "binomialvariate", None)  # есть с Python 3.12
+        if binomial is not None:
+            return binomial(n, p)
+        return self.rng.choices((0, 1), (1 - p, p), k=n).count(1)
+
+    def _split(self, states, decision):
+        """Разбить группы игроков по вариантам решения: (состояние, выбор) -> число"""
+        options = self.policy[decision]
+        probabilities = [p for _, p in options]
+        for state, count in states.items():
+            for (choice, _), n in zip(options, self._multinomial(count, probabilities)):
+                if n:
+                    yield state, choice, n
+
+    def _node(self, states, name):
+        """Провести группы игроков через узел сюжета"""
+        story = self.story
+        node = story.ids[name]
+        result = Counter()
+        if story.prompt[node] is None:
+            weights = story.weights[node]
+            probabilities = [weight / sum(weights) for weight in weights]
+            for state, count in states.items():
+                for edge, n in enumerate(self._multinomial(count, probabilities)):
+                    if n:
+                        result[story.advance(state, node, edge)] += n
+        else:
+            for state, choice, n in self._split(states, name):
+                result[story.advance(state, node, story.edge(node, choice))] += n
+        return result
+
+    def run(self, runs):
+        """Прогнать runs новых игр и вернуть распределения итогов"""
+        story = self.story
+        start = Player("")
+        not_passed = story.grade_codes["не сдан"]
+        # Сжатое состояние: (коды оценок..., репутация, попытки)
+        state = tuple(story.grade_codes[start.exams[exam]] for exam in story.EXAMS)
+        states = self._node(Counter({state + (start.reputation, start.lives): runs}), "class")
+
+        # Первый экзамен и его ветка
+        groups = {exam: Counter() for exam in story.EXAMS}
+        for state, exam, n in self._split(states, "first_exam"):
+            groups[exam][state] += n
+        after_exam = Counter()
+        for exam, group in groups.items():
+            after_exam.update(self._node(group, story.names[story.exam_nodes[exam]]))
+
+        # Проверка стипендии и предложение пересдачи.
+        # Потеря стипендии необратима, поэтому итог - потеря хотя бы раз
+        final, lost, retakers = Counter(), Counter(), Counter()
+        for state, n in after_exam.items():
+            if story.scholarship_lost(state):
+                lost[state] += n
+            elif not_passed in state[:len(story.EXAMS)] and state[-1] > 0:
+                retakers[state] += n
+            else:
+                final[state] += n
+
+        for state, choice, n in self._split(retakers, "retake"):
+            if choice != "да":
+                final[state] += n
+                continue
+            failed = [exam for code, exam in enumerate(story.EXAMS) if state[code] == not_passed]
+            if len(failed) > 1:
+                picks = self._split({state: n}, "retake_exam")
+            else:
+                picks = [(state, failed[0], n)]
+            for state, exam, n in picks:
+                if exam not in failed:
+                    final[state] += n
+                    continue
+                final.update(self._node({state: n}, story.names[story.retake_nodes[exam]]))
+
+        reputation, lives_left, scholarship = Counter(), Counter(), Counter()
+        for kept, states in ((True, final), (False, lost)):
+            for state, n in states.items():
+                reputation[state[-2]] += n
+                lives_left[state[-1]] += n
+                scholarship[kept and not story.scholarship_lost(state)] += n
+        return {
+            "runs": runs,
+            "reputation": dict(sorted(reputation.items())),
+            "lives": dict(sorted(lives_left.items())),
+            "scholarship": dict(sorted(scholarship.items())),
+        }
@@ -0,0 +1,256 @@
+"""Точная оптимальная стратегия по состояниям игры"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+
+from gamekk.files import temp_path
+from gamekk.player import Player
+from gamekk.story import StoryGraph
+
+
+class Solver:
+    """Точная оптимальная стратегия: динамическое программирование по состояниям игры.
+
+    Состояние - как у Simulator (коды оценок..., репутация, попытки) плюс
+    выбран ли класс и сохранена ли стипендия. Артефакты и копилка меняют
+    только подсказки, а не исход, поэтому в состояние не входят.
+    Этапы повторяют game_loop: выбор класса, первый экзамен, ветка экзамена,
+    проверка стипендии, пересдача и, если сессий больше одной, повторный заход
+    (игрок сохраняется и играет снова или останавливается). На каждом
+    решении перебираются все ответы, включая ответ не из списка (OTHER),
+    случайные узлы усредняются по весам. Лучший ответ - с большей
+    вероятностью сохранить стипендию, при равенстве - с большей ожидаемой
+    репутацией.
+
+    Итог этапа в состоянии запоминается в memo и дописывается в файл кэша
+    (JSON Lines), поэтому повторные запросы не перебирают ничего заново.
+    Первая строка кэша - отпечаток сюжета: после правки STORY кэш
+    считается заново.
+    """
+
+    VERSION = 1
+    OTHER = "*"  # любой ответ не из списка: переход по умолчанию
+    STAGE_DECISIONS = {"exams": "first_exam", "checked": "retake", "retake": "retake_exam", "end": "again"}
+
+    def __init__(self, story=None, cache_filename="solver.cache"):
+        self.story = story or StoryGraph()
+        self.cache_filename = cache_filename
+        self.fingerprint = self._fingerprint()
+        self.exams = len(self.story.EXAMS)
+        self.not_passed = self.story.grade_codes["не сдан"]
+        self.memo = {}  # (этап, сессий, состояние) -> (лучший ответ или None, {итоговое состояние: вероятность})
+        self.unsaved = []  # ключи memo, которых еще нет в файле
+        self.cached = False  # лежит ли в файле кэш этого же сюжета
+        self.open()
+
+    def _fingerprint(self):
+        story = self.story
+        tables = [self.VERSION, story.names, story.choices, story.default, story.weights, story.edges, story.lost]
+        return hashlib.sha256(json.dumps(tables, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+    def open(self):
+        """Чтение кэша, если он посчитан для этого же сюжета"""
+        self.memo, self.unsaved, self.cached = {}, [], False
+        if not self.cache_filename or not os.path.exists(self.cache_filename):
+            return
+        with open(self.cache_filename, 'r', encoding='utf-8') as f:
+            try:
+                if json.loads(f.readline()) != ["solver", self.fingerprint]:
+                    return
+            except ValueError:
+                return
+            self.cached = True
+            for line in f:
+                try:
+                    stage, sessions, state, choice, outcomes = json.loads(line)
+                except ValueError:
+                    break  # оборванная строка в конце кэша
+                self.memo[(stage, sessions, tuple(state))] = (choice, {tuple(end): p for end, p in outcomes})
+
+    def save(self):
+        """Дописать новые итоги в кэш; кэш другого сюжета переписывается"""
+        if not self.cache_filename or not self.unsaved:
+            return
+        if self.cached:
+            with open(self.cache_filename, 'a', encoding='utf-8') as f:
+                f.write("".join(self._line(key) for key in self.unsaved))
+        else:
+            tmp = temp_path(self.cache_filename)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(["solver", self.fingerprint]) + "\n")
+                f.write("".join(self._line(key) for key in self.memo))
+            os.replace(tmp, self.cache_filename)
+            self.cached = True
+        self.unsaved = []
+
+    def _line(self, key):
+        choice, outcomes = self.memo[key]
+        stage, sessions, state = key
+        return json.dumps([stage, sessions, state, choice, [[end, p] for end, p in outcomes.items()]],
+                          ensure_ascii=False) + "\n"
+
+    def state(self, player):
+        """Сжатое состояние игрока"""
+        story = self.story
+        grades = tuple(story.grade_codes[player.exams[exam]] for exam in story.EXAMS)
+        return grades + (player.reputation, player.lives, int("Выбрал класс" in player.story_progress),
+                         int(player.scholarship))
+
+    def describe(self, state):
+        """Состояние в читаемом виде для JSON"""
+        story = self.story
+        return {
+            "exams": {exam: story.GRADES[state[code]] for code, exam in enumerate(story.EXAMS)},
+            "reputation": state[self.exams],
+            "lives": state[self.exams + 1],
+            "class_chosen": bool(state[self.exams + 2]),
+            "scholarship": bool(state[self.exams + 3]),
+        }
+
+    def _check(self, state):
+        """check_scholarship: потеря стипендии необратима"""
+        kept = self.exams + 3
+        if state[kept] and self.story.scholarship_lost(state):
+            return state[:kept] + (0,)
+        return state
+
+    def _failed(self, state):
+        return [exam for code, exam in enumerate(self.story.EXAMS) if state[code] == self.not_passed]
+
+    def _node_moves(self, name, then, sessions, state):
+        """Переходы узла сюжета; после узла без продолжения идем на этап then"""
+        story = self.story
+        node = story.ids[name]
+
+        def branch(probability, edge):
+            following = story.edges[node][edge][2]
+            stage = f"{story.names[following]}>{then}" if following >= 0 else then
+            return probability, stage, sessions, story.advance(state, node, edge)
+
+        if story.prompt[node] is None:
+            total = sum(story.weights[node])
+            return {None: [branch(weight / total, edge) for edge, weight in enumerate(story.weights[node])]}
+        moves = {answer: [branch(1.0, edge)] for answer, edge in story.choices[node].items()}
+        moves[self.OTHER] = [branch(1.0, story.default[node])]
+        return moves
+
+    def moves(self, stage, sessions, state):
+        """Ходы из этапа: {ответ: [(вероятность, этап, сессий, состояние)]}.
+
+        Ответ None - решения нет (случайный узел или переход без вопроса),
+        пустой словарь - игра окончена в этом состоянии.
+        """
+        story = self.story
+        if ">" in stage:
+            name, then = stage.split(">")
+            return self._node_moves(name, then, sessions, state)
+        chosen, kept = self.exams + 2, self.exams + 3
+        if stage == "session":
+            if not state[chosen]:
+                return {None: [(1.0, "class>chosen", sessions, state)]}
+            return {None: [(1.0, "exams", sessions, state)]}
+        if stage == "chosen":
+            return {None: [(1.0, "exams", sessions, state[:chosen] + (1,) + state[kept:])]}
+        if stage == "exams":
+            failed = self._failed(state)
+            if not failed:
+                return {None: [(1.0, "end", sessions, state)]}
+            moves = {exam: [(1.0, f"{story.names[story.exam_nodes[exam]]}>checked", sessions, state)]
+                     for exam in failed}
+            return moves if len(moves) > 1 else {None: moves[failed[0]]}  # последний экзамен без вопроса
+        if stage == "checked":
+            state = self._check(state)
+            if not state[kept]:
+                return {None: [(1.0, "stop", sessions, state)]}
+            if self._failed(state) and state[self.exams + 1] > 0:
+                return {"нет": [(1.0, "end", sessions, state)], "да": [(1.0, "retake", sessions, state)]}
+            return {None: [(1.0, "end", sessions, state)]}
+        if stage == "retake":
+            failed = self._failed(state)
+            moves = {exam: [(1.0, f"{story.names[story.retake_nodes[exam]]}>final", sessions, state)]
+                     for exam in failed}
+            return moves if len(moves) > 1 else {None: moves[failed[0]]}
+        if stage == "final":
+            return {None: [(1.0, "end", sessions, self._check(state))]}
+        if stage == "end":
+            if sessions > 1 and state[kept]:
+                return {"нет": [(1.0, "stop", sessions, state)], "да": [(1.0, "session", sessions - 1, state)]}
+            return {}
+        if stage == "stop":
+            return {}
+        raise ValueError(f"Неизвестный этап: {stage}")
+
+    def score(self, outcomes):
+        """(вероятность сохранить стипендию, ожидаемая репутация)"""
+        kept, reputation = self.exams + 3, self.exams
+        return (sum(p for end, p in outcomes.items() if end[kept]),
+                sum(p * end[reputation] for end, p in outcomes.items()))
+
+    def best(self, stage, sessions, state):
+        """Лучший ответ на этапе и распределение итоговых состояний при нем"""
+        key = (stage, sessions, state)
+        entry = self.memo.get(key)
+        if entry is not None:
+            return entry
+        moves = self.moves(stage, sessions, state)
+        if not moves:
+            entry = (None, {state: 1.0})
+        else:
+            results = {}
+            for answer, branches in moves.items():
+                outcomes = Counter()
+                for probability, next_stage, next_sessions, next_state in branches:
+                    for end, p in self.best(next_stage, next_sessions, next_state)[1].items():
+                        outcomes[end] += probability * p
+                results[answer] = dict(outcomes)
+            if list(results) == [None]:
+                entry = (None, results[None])
+            else:
+                choice = max(results, key=lambda answer: self.score(results[answer]))  # при равенстве - первый
+                entry = (choice, results[choice])
+        self.memo[key] = entry
+        self.unsaved.append(key)
+        return entry
+
+    def plan(self, stage, sessions, state):
+        """Решения, до которых доходит оптимальная игра: с вероятностью дойти до каждого"""
+        decisions = {}  # (этап, сессий, состояние) -> решение, в порядке игры
+
+        def walk(key, probability):
+            choice, outcomes = self.best(*key)
+            if choice is not None:
+                decision = decisions.get(key)
+                if decision is None:
+                    decision = decisions[key] = {
+                        "decision": self.STAGE_DECISIONS.get(key[0], key[0].split(">")[0]),
+                        "session": sessions - key[1] + 1,
+                        "state": self.describe(key[2]),
+                        "probability": 0.0,
+                        "choice": choice,
+                        "scholarship": self.score(outcomes)[0],
+                    }
+                decision["probability"] += probability
+            for p, *following in self.moves(*key).get(choice, ()):
+                walk(tuple(following), probability * p)
+
+        walk((stage, sessions, state), 1.0)
+        return list(decisions.values())
+
+    def query(self, player=None, sessions=1):
+        """Оптимальная игра из состояния игрока (по умолчанию новый игрок) за sessions заходов"""
+        state = self.state(player or Player(""))
+        _, outcomes = self.best("session", sessions, state)
+        plan = self.plan("session", sessions, state)
+        self.save()
+        scholarship, reputation = self.score(outcomes)
+        return {
+            "start": self.describe(state),
+            "sessions": sessions,
+            "scholarship": scholarship,
+            "reputation": reputation,
+            "decisions": plan,
+            "outcomes": [dict(self.describe(end), probability=p)
+                         for end, p in sorted(outcomes.items(), key=lambda item: -item[1])],
+        }
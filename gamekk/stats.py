@@ -0,0 +1,157 @@
+"""Сводная статистика по игрокам и рейтинг"""
+
+import bisect
+import itertools
+import json
+import os
+from collections import Counter
+
+from gamekk.files import temp_path
+
+
+class PlayerStats:
+    """Сводная статистика по всем игрокам, которая обновляется при каждом сохранении.
+
+    Рейтинг - отсортированный список (-репутация, логин), поэтому top(k)
+    берет первые k элементов без просмотра всех игроков. Счетчики стипендий,
+    оценок по экзаменам и пройденных веток меняются на разницу между старой
+    и новой записью игрока. Снимок пишется в файл рядом с хранилищем
+    пачками; поля generation и size - поколение и размер журнала игроков
+    на момент снимка. Снимок, отставший от журнала того же поколения,
+    хранилище догоняет по хвосту журнала, иначе собирает статистику заново.
+    """
+
+    BULK = 64  # с какого размера пачки рейтинг пересортировать целиком
+
+    def __init__(self, filename="players.stats", snapshot_every=1024):
+        self.filename = filename
+        self.snapshot_every = snapshot_every  # сколько сохранений копить до записи снимка
+        self.generation = 0  # поколение журнала игроков, которому соответствует статистика
+        self.size = 0  # размер журнала игроков, которому соответствует статистика
+        self.changes = 0  # сохранения после последнего снимка
+        self.players = 0
+        self.scholarships = 0
+        self.reputation_sum = 0
+        self.grades = {}  # экзамен -> Counter(оценка)
+        self.branches = Counter()  # отметка story_progress -> число игроков
+        self.ranking = []  # [(-репутация, логин)] по возрастанию
+
+    def restore(self, size, generation=0):
+        """Загрузка снимка; False, если его нет или он от другого поколения журнала или новее его"""
+        if not self.filename or not os.path.exists(self.filename):
+            return False
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            return False
+        if data.get("generation", 0) != generation or data.get("size", size + 1) > size:
+            return False
+        self.generation = generation
+        self.size = data["size"]
+        self.players = data["players"]
+        self.scholarships = data["scholarships"]
+        self.reputation_sum = data["reputation_sum"]
+        self.grades = {exam: Counter(counts) for exam, counts in data["grades"].items()}
+        self.branches = Counter(data["branches"])
+        self.ranking = [(-reputation, username) for reputation, username in data["ranking"]]
+        return True
+
+    def save(self):
+        """Запись снимка статистики"""
+        self.changes = 0
+        if not self.filename:
+            return
+        data = {
+            "generation": self.generation,
+            "size": self.size,
+            "players": self.players,
+            "scholarships": self.scholarships,
+            "reputation_sum": self.reputation_sum,
+            "grades": self.grades,
+            "branches": self.branches,
+            "ranking": [[-key, username] for key, username in self.ranking],
+        }
+        tmp = temp_path(self.filename)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.filename)
+
+    def _count(self, record, sign):
+        self.players += sign
+        self.scholarships += sign if record["scholarship"] else 0
+        self.reputation_sum += sign * record["reputation"]
+        for exam, grade in record["exams"].items():
+            self.grades.setdefault(exam, Counter())[grade] += sign
+        for mark in set(record["story_progress"]):
+            self.branches[mark] += sign
+
+    def update(self, changes, size):
+        """Учесть сохранения: пары (старая запись или None, новая запись)"""
+        bulk = len(changes) >= self.BULK
+        removed, added = Counter(), []
+        for old, new in changes:
+            if old is not None:
+                self._count(old, -1)
+                key = (-old["reputation"], old["username"])
+                if bulk:
+                    removed[key] += 1
+                else:
+                    del self.ranking[bisect.bisect_left(self.ranking, key)]
+            self._count(new, 1)
+            key = (-new["reputation"], new["username"])
+            if bulk:
+                added.append(key)
+            else:
+                bisect.insort(self.ranking, key)
+
+        if bulk:
+            ranking = []
+            for key in itertools.chain(self.ranking, added):
+                if removed[key]:
+                    removed[key] -= 1
+                else:
+                    ranking.append(key)
+            ranking.sort()
+            self.ranking = ranking
+
+        self.size = size
+        self.changes += len(changes)
+        # Снимок содержит весь рейтинг, поэтому на больших базах пишется реже
+        if self.changes >= max(self.snapshot_every, self.players // 16):
+            self.save()
+
+    def extend(self, records, size):
+        """Учесть поток новых игроков (пересборка): рейтинг сортируется один раз"""
+        for record in records:
+            self._count(record, 1)
+            self.ranking.append((-record["reputation"], record["username"]))
+        self.ranking.sort()
+        self.size = size
+
+    def top(self, k=10):
+        """Первые k игроков по репутации: [(логин, репутация)]"""
+        return [(username, -key) for key, username in self.ranking[:k]]
+
+    def scholarship_share(self):
+        """Доля игроков, сохранивших стипендию"""
+        return self.scholarships / self.players if self.players else 0.0
+
+    def grade_histogram(self, exam):
+        """Сколько игроков получили каждую оценку по экзамену"""
+        return {grade: count for grade, count in self.grades.get(exam, {}).items() if count}
+
+    def branch_popularity(self):
+        """Сколько игроков прошли каждую отметку сюжета, по убыванию"""
+        return [(mark, count) for mark, count in self.branches.most_common() if count]
+
+    def summary(self, k=10):
+        """Все агрегаты одним словарем для JSON"""
+        return {
+            "players": self.players,
+            "scholarship_share": self.scholarship_share(),
+            "average_reputation": self.reputation_sum / self.players if self.players else 0.0,
+            "top": self.top(k),
+            "grades": {exam: self.grade_histogram(exam) for exam in sorted(self.grades)},
+            "branches": self.branch_popularity(),
+        }
@@ -0,0 +1,608 @@
+"""Хранилище игроков: журнал двоичных записей с индексом"""
+
+import atexit
+import json
+import mmap
+import os
+import struct
+import threading
+
+from gamekk.cache import PlayerCache
+from gamekk.files import FileLock, file_stamp, temp_path
+from gamekk.player import Player, PlayerRecord, PlayerView, Registry
+from gamekk.stats import PlayerStats
+from gamekk.stream import PlayerStream, batches
+
+
+class PlayerStore:
+    """Хранилище игроков: журнал двоичных записей на дозапись + индекс логин -> смещение.
+
+    Полные записи (контрольные точки) чередуются в журнале с дельтами событий;
+    журнал и индекс помечены поколением, которое растет при уплотнении.
+    """
+
+    def __init__(self, filename="players.dat", index_filename="players.idx",
+                 legacy_filename="players.json", legacy_log="players.log",
+                 compact_ratio=0.5, compact_min_bytes=64 * 1024, stats_filename="players.stats",
+                 checkpoint_every=8, words_filename="players.words", cache_entries=4096,
+                 cache_bytes=16 * 1024 * 1024):
+        self.filename = filename
+        self.index_filename = index_filename
+        self.legacy_filename = legacy_filename
+        self.legacy_log = legacy_log  # журнал JSON Lines прежней версии хранилища
+        self.compact_ratio = compact_ratio  # доля мертвых байт, после которой уплотняем
+        self.compact_min_bytes = compact_min_bytes  # маленькие журналы не уплотняем
+        self.stats_filename = stats_filename
+        self._stats = None  # PlayerStats, загружается при первом обращении
+        self.stamp = None  # file_stamp журнала и индекса после нашей последней записи
+        self.checkpoint_every = checkpoint_every  # сохранений-дельт до новой полной записи
+        self.index = {}  # логин -> (смещение, длина) контрольной точки
+        self.deltas = {}  # логин -> [(смещение, длина)] дельт после контрольной точки
+        self.words_filename = words_filename
+        self.words = Registry()  # словарь строк событий
+        self.words_saved = 0  # сколько строк словаря уже на диске
+        self.size = 0  # размер журнала в байтах
+        self.generation = 0  # поколение журнала, растет при каждом уплотнении
+        self.base = 0  # смещение первой записи: длина заголовка журнала
+        self.dead_bytes = 0  # байты устаревших записей
+        self.lock = FileLock(filename + ".lock")  # и между процессами с той же папкой данных
+        self.compactor = None
+        self.mapped = None  # mmap журнала для view()
+        self.cache = PlayerCache(cache_entries, cache_bytes)
+        self.open()
+        atexit.register(self.flush_stats)
+
+    MAGIC = b"GKKP"
+    HEADER = struct.Struct("<4sI")  # MAGIC, поколение; журналы прежней версии без заголовка
+    INDEX_HEADER = "generation"
+
+    def open(self):
+        """Чтение индекса и дочитывание хвоста журнала после сбоя"""
+        with self.lock:
+            self.index = {}
+            self.deltas = {}
+            self.dead_bytes = 0
+            self._load_words()
+            self.mapped = None
+            self._stats = None
+            self.cache.clear()
+            self.generation = self.base = 0
+            if not os.path.exists(self.filename):
+                self.size = 0
+                if os.path.exists(self.index_filename):
+                    os.remove(self.index_filename)
+                self.stamp = self._file_stamp()
+                if self.legacy_log and os.path.exists(self.legacy_log):
+                    self.import_jsonl(self.legacy_log)
+                elif self.legacy_filename and os.path.exists(self.legacy_filename):
+                    self.import_json(self.legacy_filename)
+                self.flush_stats()
+                self.stamp = self._file_stamp()
+                return
+
+            self.size = os.path.getsize(self.filename)
+            with open(self.filename, 'rb') as f:
+                self.generation, self.base = self._read_header(f)
+            covered = self.base
+            valid = False  # индекс того же поколения, что и журнал
+            if os.path.exists(self.index_filename):
+                with open(self.index_filename, 'r', encoding='utf-8') as f:
+                    for number, line in enumerate(f):
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break  # оборванная строка в конце индекса
+                        generation = self._index_generation(entry)
+                        if number == 0:
+                            valid = (generation or 0) == self.generation
+                            if not valid:
+                                break
+                            if generation is not None:
+                                continue
+                        username, offset, length, *delta = entry
+                        if offset < self.base or offset + length > self.size:
+                            break
+                        self._index_record(username, offset, length, bool(delta))
+                        covered = max(covered, offset + length)
+            if not valid:
+                # Индекса нет или он от другого журнала: строим заново
+                with open(self.index_filename, 'w', encoding='utf-8') as index_file:
+                    self._write_index_header(index_file, self.generation)
+
+            # Записи, попавшие в журнал, но не в индекс, индексируем заново
+            if covered < self.size:
+                with open(self.filename, 'rb') as f, self._open_index() as index_file:
+                    f.seek(covered)
+                    offset = covered
+                    for username, data, delta in self._records(f):
+                        self._index_record(username, offset, len(data), delta)
+                        self._append_index(index_file, username, offset, len(data), delta)
+                        offset += len(data)
+                if offset < self.size:
+                    with open(self.filename, 'r+b') as f:
+                        f.truncate(offset)  # недописанная запись
+                    self.size = offset
+            self.stamp = self._file_stamp()
+
+    @classmethod
+    def _read_header(cls, f):
+        """Поколение журнала и смещение первой записи; оставляет файл на этом смещении"""
+        f.seek(0)
+        head = f.read(cls.HEADER.size)
+        if len(head) == cls.HEADER.size and head[:len(cls.MAGIC)] == cls.MAGIC:
+            return cls.HEADER.unpack(head)[1], cls.HEADER.size
+        f.seek(0)
+        return 0, 0  # журнал прежней версии или пустой
+
+    @classmethod
+    def _index_generation(cls, entry):
+        """Поколение из строки-заголовка индекса или None для обычной строки"""
+        if len(entry) == 2 and entry[0] == cls.INDEX_HEADER:
+            return entry[1]
+        return None
+
+    @classmethod
+    def _write_index_header(cls, index_file, generation):
+        index_file.write(json.dumps([cls.INDEX_HEADER, generation]) + "\n")
+
+    def _open_log(self):
+        """Журнал на дозапись; в новый файл сначала пишется заголовок"""
+        f = open(self.filename, 'ab')
+        if f.tell() == 0:
+            f.write(self.HEADER.pack(self.MAGIC, self.generation))
+            self.base = self.HEADER.size
+        return f
+
+    def _open_index(self):
+        """Индекс на дозапись; в новый файл сначала пишется заголовок"""
+        index_file = open(self.index_filename, 'a', encoding='utf-8')
+        if index_file.tell() == 0:
+            self._write_index_header(index_file, self.generation)
+        return index_file
+
+    def _load_words(self):
+        self.words = Registry()
+        if os.path.exists(self.words_filename):
+            with open(self.words_filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.words.id(json.loads(line))
+                    except ValueError:
+                        break  # оборванная строка: дельт с этим словом еще нет
+        self.words_saved = len(self.words.names)
+
+    def _save_words(self):
+        """Дописать новые строки словаря до записи дельты, которая на них ссылается"""
+        if self.words_saved < len(self.words.names):
+            with open(self.words_filename, 'a', encoding='utf-8') as f:
+                for text in self.words.names[self.words_saved:]:
+                    f.write(json.dumps(text, ensure_ascii=False) + "\n")
+            self.words_saved = len(self.words.names)
+
+    def _file_stamp(self):
+        return file_stamp(self.filename, self.index_filename, self.words_filename)
+
+    def changed_outside(self):
+        """Изменили ли файлы хранилища в обход этого объекта (другой процесс)"""
+        return self._file_stamp() != self.stamp
+
+    def reload(self):
+        """Перечитать хранилище после изменений снаружи"""
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        """Подхватить то, что записали другие процессы; вызывается под self.lock.
+
+        Если журнал только дописали, индексируются новые записи и
+        обновляется статистика, иначе (уплотнение в другом процессе)
+        хранилище открывается заново.
+        """
+        stamp = self._file_stamp()
+        if stamp == self.stamp:
+            return
+        self.stamp = stamp
+        if stamp[0] is None or stamp[0][1] < self.size:
+            self.open()
+            return
+        with open(self.filename, 'rb') as f:
+            generation, _ = self._read_header(f)
+        if generation != self.generation or self.size == 0:
+            self.open()
+            return
+        self._load_words()
+        with open(self.filename, 'rb') as f:
+            f.seek(self.size)
+            tail = [(username, len(data), delta) for username, data, delta in self._records(f)]
+        touched = {username for username, _, _ in tail}
+        old = {username: self.load(username) for username in touched} if self._stats is not None else None
+        offset = self.size
+        for username, length, delta in tail:
+            self._index_record(username, offset, length, delta)
+            offset += length
+        if offset < stamp[0][1]:
+            with open(self.filename, 'r+b') as f:
+                f.truncate(offset)  # недописанная запись процесса, который упал
+            self.stamp = self._file_stamp()
+        self.size = offset
+        for username in touched:
+            self.cache.discard(username)
+        if old is not None:
+            self._stats.update([(old[username], self.load(username)) for username in touched], self.size)
+
+    @property
+    def stats(self):
+        """Сводная статистика; снимок читается при первом обращении"""
+        with self.lock:
+            self._sync()
+            if self._stats is None:
+                stats = PlayerStats(self.stats_filename)
+                if not stats.restore(self.size, self.generation):
+                    self.rebuild_stats()
+                elif stats.size < self.size:
+                    self._catch_up_stats(stats)
+                else:
+                    self._stats = stats
+            return self._stats
+
+    def _catch_up_stats(self, stats):
+        """Довести снимок до журнала: учесть игроков, сохраненных после stats.size.
+
+        Их состояние на момент снимка собирается по строкам индекса до
+        stats.size, так что работа зависит от длины хвоста, а не от числа игроков.
+        """
+        since = max(stats.size, self.base)  # снимок пустого хранилища сделан до заголовка журнала
+        with open(self.filename, 'rb') as f:
+            f.seek(since)
+            touched = {username for username, _, _ in self._records(f, self.size)}
+        before = {}  # логин -> (контрольная точка, [дельты]) на момент снимка
+        with open(self.index_filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if self._index_generation(entry) is not None or entry[0] not in touched:
+                    continue
+                username, offset, length, *delta = entry
+                if offset + length > since:
+                    continue
+                if not delta:
+                    before[username] = ((offset, length), [])
+                elif username in before:
+                    before[username][1].append((offset, length))
+        changes = [(self._replay(*self._read(*before[username])) if username in before else None,
+                    self.load(username)) for username in touched]
+        stats.update(changes, self.size)
+        stats.save()
+        self._stats = stats
+
+    def rebuild_stats(self):
+        """Собрать статистику заново одним проходом по журналу"""
+        with self.lock:
+            self._stats = PlayerStats(self.stats_filename)
+            self._stats.generation = self.generation
+            self._stats.extend(self._live_records(), self.size)
+            self._stats.save()
+
+    def _live_records(self):
+        """Текущие записи всех игроков потоком по журналу, по одной в памяти"""
+        if not self.index:
+            return
+        with open(self.filename, 'rb') as f:
+            offset = self._read_header(f)[1]
+            for username, data, delta in self._records(f, self.size):
+                if not delta and self.index.get(username, (None,))[0] == offset:
+                    yield self.load(username) if username in self.deltas else PlayerView(data).to_dict()
+                offset += len(data)
+
+    def flush_stats(self):
+        """Запись снимка статистики, если после прошлого были сохранения"""
+        with self.lock:
+            if self._stats is not None and self._stats.changes:
+                self._stats.save()
+
+    @staticmethod
+    def _records(f, end=None):
+        """Целые записи с текущей позиции файла до end: (логин, байты записи, дельта ли)"""
+        while end is None or f.tell() < end:
+            head = f.read(PlayerRecord.LENGTH.size)
+            if len(head) < PlayerRecord.LENGTH.size:
+                return
+            length = PlayerRecord.LENGTH.unpack(head)[0]
+            delta = bool(length & PlayerRecord.DELTA)
+            length &= ~PlayerRecord.DELTA
+            if length < (PlayerRecord.DELTA_HEADER.size if delta else PlayerRecord.HEADER.size):
+                return
+            rest = f.read(length - len(head))
+            if len(rest) < length - len(head):
+                return
+            data = head + rest
+            yield (PlayerRecord.delta_username(data) if delta else PlayerView(data).username), data, delta
+
+    def import_json(self, path):
+        """Импорт игроков из старого players.json: разбор потоком, запись пачками"""
+        self.import_records(PlayerStream.read_json(path))
+
+    def import_jsonl(self, path):
+        """Импорт записей из JSON Lines (по одной записи Player.to_dict() в строке)"""
+        self.import_records(PlayerStream.read_jsonl(path))
+
+    def import_records(self, records, batch_size=1024):
+        """Дозапись потока записей пачками по batch_size; возвращает их число"""
+        written = 0
+        for batch in batches(records, batch_size):
+            self.save_many(batch)
+            written += len(batch)
+        return written
+
+    def records(self):
+        """Все игроки по одной записи"""
+        for username in list(self.index):
+            yield self.load(username)
+
+    def export_json(self, path):
+        """Выгрузка всех игроков в формате старого players.json"""
+        PlayerStream.write_json(self.records(), path)
+
+    def export_jsonl(self, path):
+        """Выгрузка всех игроков в JSON Lines"""
+        PlayerStream.write_jsonl(self.records(), path)
+
+    def _set_index(self, username, offset, length):
+        old = self.index.get(username)
+        if old is not None:
+            self.dead_bytes += old[1]
+        self.index[username] = (offset, length)
+        self.deltas.pop(username, None)
+
+    def _index_record(self, username, offset, length, delta):
+        if delta:
+            self.deltas.setdefault(username, []).append((offset, length))
+        else:
+            self._set_index(username, offset, length)
+
+    @staticmethod
+    def _append_index(index_file, username, offset, length, delta=False):
+        entry = [username, offset, length, 1] if delta else [username, offset, length]
+        index_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def __contains__(self, username):
+        return username in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def save(self, record):
+        """Дозапись одной записи игрока"""
+        self.save_many([record])
+
+    def save_many(self, records):
+        """Дозапись нескольких записей за одно открытие файлов"""
+        with self.lock:
+            self._sync()
+            stats = self.stats
+            changes = []
+            written = {}  # логин -> запись, уже сохраненная в этой пачке
+            with self._open_log() as f, self._open_index() as index_file:
+                offset = f.tell()
+                for record in records:
+                    username = record["username"]
+                    old = written.get(username)
+                    if old is None and username in self.index:
+                        old = self.load(username)
+                    data = PlayerRecord.encode(record)
+                    f.write(data)
+                    self._append_index(index_file, username, offset, len(data))
+                    self._set_index(username, offset, len(data))
+                    offset += len(data)
+                    changes.append((old, record))
+                    written[username] = record
+                    self.cache.discard(username)
+            self.size = offset
+            stats.update(changes, self.size)
+            self.stamp = self._file_stamp()
+        self.maybe_compact()
+
+    def save_player(self, player):
+        """Сохранение игрока: новые события дельтой, при необходимости и контрольная точка"""
+        with self.lock:
+            self._sync()
+            username = player.username
+            record = player.to_dict()
+            old = self.load(username)
+            checkpoint = old is None or len(self.deltas.get(username, ())) + 1 >= self.checkpoint_every
+            if not checkpoint:
+                # Дельта годится, только если она переводит запись на диске ровно в
+                # это состояние: другая копия игрока могла сохраниться раньше, а
+                # состояние - меняться в обход record()
+                replayed = Player.from_dict(old)
+                replayed.replay(player.events or ())
+                checkpoint = old["event_seq"] != player.event_seq or replayed.to_dict() != record
+            parts = []  # (байты, дельта ли): сначала события, затем состояние после них
+            if player.events:
+                parts.append((PlayerRecord.encode_events(username, player.event_seq, player.events, self.words,
+                                                         record), True))
+            if checkpoint:
+                parts.append((PlayerRecord.encode(record), False))
+            if parts:
+                stats = self.stats
+                self._save_words()
+                with self._open_log() as f, self._open_index() as index_file:
+                    offset = f.tell()
+                    for data, delta in parts:
+                        f.write(data)
+                        self._append_index(index_file, username, offset, len(data), delta)
+                        self._index_record(username, offset, len(data), delta)
+                        offset += len(data)
+                self.size = offset
+                stats.update([(old, record)], self.size)
+                self.stamp = self._file_stamp()
+            player.events_saved()
+            # В кэш - то, что теперь вернет load(), а не живой объект игры
+            self.cache.put(Player.from_dict(record))
+        self.maybe_compact()
+
+    def load_player(self, username):
+        """Игрок из кэша или, при промахе, из журнала; всегда отдельная копия"""
+        with self.lock:
+            self._sync()
+            player = self.cache.get(username)
+            if player is not None:
+                return player
+            record = self.load(username)
+            if record is None:
+                return None
+            player = Player.from_dict(record)
+            self.cache.put(player)
+            return player
+
+    def load(self, username):
+        """Чтение контрольной точки по смещению из индекса и повтор дельт после нее"""
+        with self.lock:
+            self._sync()
+            entry = self.index.get(username)
+            if entry is None:
+                return None
+            data, tail = self._read(entry, self.deltas.get(username, ()))
+        return self._replay(data, tail)
+
+    def _read(self, entry, deltas):
+        """Байты контрольной точки entry и дельт deltas, заданных (смещением, длиной)"""
+        with open(self.filename, 'rb') as f:
+            f.seek(entry[0])
+            data = f.read(entry[1])
+            tail = []
+            for offset, length in deltas:
+                f.seek(offset)
+                tail.append(f.read(length))
+        return data, tail
+
+    def _replay(self, data, tail):
+        """Контрольная точка с повтором дельт tail, пока их события идут подряд"""
+        if not tail:
+            return PlayerView(data).to_dict()
+        player = PlayerView(data).to_player()
+        for delta in tail:
+            _, first_seq, events = PlayerRecord.decode_events(delta, self.words.names)
+            if first_seq != player.event_seq:
+                break  # дельта устаревшей копии игрока: ее события не продолжают запись
+            player.replay(events)
+        return player.to_dict()
+
+    def history(self, username=None):
+        """События из дельт журнала по порядку: (логин, номер события, событие)"""
+        with self.lock:
+            self._sync()
+            end = self.size
+        with open(self.filename, 'rb') as f:
+            self._read_header(f)
+            for name, data, delta in self._records(f, end):
+                if delta and (username is None or name == username):
+                    name, seq, events = PlayerRecord.decode_events(data, self.words.names)
+                    for event in events:
+                        yield name, seq, event
+                        seq += 1
+
+    def view(self, username):
+        """Ленивое представление записи поверх mmap журнала, без чтения файла целиком.
+
+        Если после контрольной точки есть дельты, представление стоит на
+        последней из тех, что повторит load(): поля заголовка читаются из нее,
+        а полная запись собирается только по запросу.
+        """
+        with self.lock:
+            self._sync()
+            entry = self.index.get(username)
+            if entry is None:
+                return None
+            deltas = list(self.deltas.get(username, ()))
+            end = max(offset + length for offset, length in [entry, *deltas])
+            if self.mapped is None or len(self.mapped) < end:
+                with open(self.filename, 'rb') as f:
+                    self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            mapped = self.mapped
+        view = PlayerView(mapped, entry[0])
+        seq = view.event_seq
+        for count, (offset, _) in enumerate(deltas, 1):
+            first_seq, events = PlayerRecord.delta_seq(mapped, offset)
+            if first_seq != seq:
+                break
+            seq += events
+            view = PlayerView(mapped, offset, lambda chain=deltas[:count]: self._replay_mapped(mapped, entry, chain))
+        return view
+
+    def _replay_mapped(self, mapped, entry, deltas):
+        return self._replay(mapped[entry[0]:entry[0] + entry[1]],
+                            [mapped[offset:offset + length] for offset, length in deltas])
+
+    def maybe_compact(self):
+        """Запуск фонового уплотнения, если мертвых записей слишком много"""
+        with self.lock:
+            if self.compactor is not None and self.compactor.is_alive():
+                return
+            if self.size < self.compact_min_bytes or self.dead_bytes < self.size * self.compact_ratio:
+                return
+            self.compactor = threading.Thread(target=self.compact, daemon=True)
+            self.compactor.start()
+
+    def wait(self):
+        """Дождаться окончания фонового уплотнения"""
+        compactor = self.compactor
+        if compactor is not None:
+            compactor.join()
+
+    def compact(self):
+        """Переписать журнал без устаревших полных записей; дельты (история) остаются"""
+        tmp_log = temp_path(self.filename)
+        tmp_index = temp_path(self.index_filename)
+
+        with self.lock:
+            self._sync()
+            live = {offset for offset, _ in self.index.values()}
+            end = self.size
+            generation = self.generation + 1
+
+        # Основную часть копируем без блокировки: старые записи не меняются
+        entries = []  # (логин, смещение, длина, дельта) в порядке нового журнала
+        with open(self.filename, 'rb') as src, open(tmp_log, 'wb') as dst:
+            dst.write(self.HEADER.pack(self.MAGIC, generation))
+            _, offset = self._read_header(src)
+            for username, data, delta in self._records(src, end):
+                if delta or offset in live:
+                    entries.append((username, dst.tell(), len(data), delta))
+                    dst.write(data)
+                offset += len(data)
+
+        with self.lock:
+            self._sync()
+            if self.generation + 1 != generation:
+                # Журнал тем временем уплотнил другой процесс: наша копия устарела
+                os.remove(tmp_log)
+                return
+            stats = self.stats
+            # Дописываем то, что было сохранено во время уплотнения
+            with open(self.filename, 'rb') as src, open(tmp_log, 'ab') as dst:
+                src.seek(end)
+                for username, data, delta in self._records(src):
+                    entries.append((username, dst.tell(), len(data), delta))
+                    dst.write(data)
+                size = dst.tell()
+            with open(tmp_index, 'w', encoding='utf-8') as index_file:
+                self._write_index_header(index_file, generation)
+                for entry in entries:
+                    self._append_index(index_file, *entry)
+            # Сбой между заменами оставит индекс старого поколения рядом с новым
+            # журналом; open() его не примет и переиндексирует журнал
+            os.replace(tmp_log, self.filename)
+            os.replace(tmp_index, self.index_filename)
+            self.generation, self.base = generation, self.HEADER.size
+            self.index, self.deltas = {}, {}
+            for entry in entries:
+                self._index_record(*entry)
+            self.size = size
+            self.dead_bytes = 0
+            self.stamp = self._file_stamp()
+            stats.generation, stats.size = generation, size  # содержимое не изменилось, только журнал
+            stats.save()
+            self.mapped = None  # старое отображение остается у выданных view
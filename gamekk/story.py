@@ -0,0 +1,267 @@
+"""Сюжет в виде данных и его скомпилированный граф"""
+
+import random
+
+from gamekk.player import EXAM_NAMES, GRADE_NAMES, Player
+
+
+# Сюжет в виде данных: узел - текст, вопрос и переходы по ответам.
+# Операции перехода: ("exam", экзамен, оценка), ("reputation", n), ("lives", n),
+# ("progress", ветка), ("artifact", название), ("take_artifact",).
+# Узел без вопроса разыгрывается случайно по весам "chance".
+STORY = {
+    "class": {
+        "text": [
+            "БИТВА КЛАССОВ: ТЕХНАРИ vs ГУМАНИТАРИИ",
+            "\nВыберите класс за который будете играть:",
+            "1. Технарь (силен в точных науках, +5 к сдаче матана)",
+            "2. Гуманитарий (умеет красиво говорить, +5 к репутации)",
+        ],
+        "prompt": "\nВаш выбор (1/2): ",
+        "edges": {
+            "1": {
+                "text": ["\n Вы выбрали класс Технарь!", "Вы получаете бонус +5 к сдаче экзамена по матану!"],
+                "effects": [("artifact", "Диплом технаря")],
+            },
+            "2": {
+                "text": ["\n Вы выбрали класс Гуманитарий!", "Вы получаете бонус +5 к репутации!"],
+                "effects": [("reputation", 5), ("artifact", "Диплом гуманитария")],
+            },
+        },
+        "default": {},
+        "after": [("progress", "Выбрал класс")],
+    },
+    "math": {
+        "exam": "матан",
+        "text": [
+            "ЭКЗАМЕН ПО МАТЕМАТИЧЕСКОМУ АНАЛИЗУ",
+            "\nТы не готов к экзамену, поэтому надо списать.",
+            "Ты тянешь билет и идешь на максимально дальний ряд.",
+        ],
+        "enter": [("progress", "Начало матана")],
+        "hints": [("Шпаргалка по информатике", "\nУ тебя есть шпаргалка, но она по другому предмету...")],
+        "prompt": "\nСписать с заготовленных билетов от одногруппников (1) или использовать Deepseek (2)? ",
+        "edges": {
+            "1": {
+                "text": [
+                    "РЕЗУЛЬТАТ:",
+                    "\nМолодец! Одногруппники честно отнеслись к подготовке,",
+                    "в отличие от тебя, поэтому ты сдал экзамен и сохранил стипендию!!",
+                ],
+                "effects": [("take_artifact",), ("exam", "матан", "4"), ("reputation", 3),
+                            ("progress", "Списал у одногруппников")],
+            },
+            "2": {
+                "text": [
+                    "РЕЗУЛЬТАТ:",
+                    "\nДипсик подвел тебя. Преподаватель спрашивает откуда ты это взял,",
+                    "пришлось соврать. Отправлен на пересдачу!",
+                ],
+                "effects": [("exam", "матан", "не сдан"), ("reputation", -5), ("lives", -1),
+                            ("progress", "Использовал Deepseek")],
+            },
+        },
+        "default": {
+            "text": ["\nТы так долго думал, что время вышло! Экзамен не сдан."],
+            "effects": [("exam", "матан", "не сдан"), ("lives", -1)],
+        },
+    },
+    "cs": {
+        "exam": "информатика",
+        "text": [
+            "ЭКЗАМЕН ПО ИНФОРМАТИКЕ",
+            "\nНа трясущихся ногах заходишь в кабинет, где тянешь билет.",
+            "Билет средней сложности, но ты не силен в программировании, надо выкрутиться.",
+            "К Светлане Сергеевне идут ученики, претендующие на пять. Нужна 4.",
+        ],
+        "enter": [("progress", "Начало информатики")],
+        "hints": [("Конспект по матану", "\nУ тебя есть конспект, но это не совсем то...")],
+        "after_hints": [
+            "\nГотовишься к билету и подходишь к Алексею Владимировичу.",
+            "О нет, Алексей смотрит подозрительно.",
+            "Ответ идет неплохо, но вдруг он вспоминает про не сданные практические задания.",
+        ],
+        "prompt": "\nЧто делать: сказать правду (1) или соврать (2)? ",
+        "edges": {
+            "1": {
+                "text": [
+                    "РЕЗУЛЬТАТ:",
+                    "\nАлексею Владимировичу понравилась твоя честность,",
+                    "четверка в кармане и плюс 5 к репутации!!",
+                ],
+                "effects": [("take_artifact",), ("exam", "информатика", "4"), ("reputation", 5),
+                            ("progress", "Сказал правду")],
+            },
+            "2": {
+                "text": [
+                    "РЕЗУЛЬТАТ:",
+                    "\nАлексею Владимировичу не показалось правдоподобным твоя речь,",
+                    "поэтому он ставит три. Минус 5 к репутации и ты лишился стипендии(",
+                ],
+                "effects": [("exam", "информатика", "3"), ("reputation", -5), ("progress", "Соврал")],
+            },
+        },
+        "default": {
+            "text": ["\nТы начал мямлить и не смог ответить. Получаешь 3."],
+            "effects": [("exam", "информатика", "3"), ("reputation", -3)],
+        },
+    },
+    "retake_math": {
+        "retake": "матан",
+        "text": ["\nПересдача матан..."],
+        "chance": [
+            (0.5, {"text": ["Ура! Пересдача сдана на 4!"], "effects": [("exam", "матан", "4"), ("reputation", 2)]}),
+            (0.5, {"text": ["Увы... Пересдача не сдана."], "effects": [("lives", -1)]}),
+        ],
+    },
+    "retake_cs": {
+        "retake": "информатика",
+        "text": ["\nПересдача информатика..."],
+        "chance": [
+            (0.5, {"text": ["Ура! Пересдача сдана на 4!"], "effects": [("exam", "информатика", "4"), ("reputation", 2)]}),
+            (0.5, {"text": ["Увы... Пересдача не сдана."], "effects": [("lives", -1)]}),
+        ],
+    },
+}
+
+
+class StoryGraph:
+    """Скомпилированный сюжет: узлы и переходы в таблицах с целочисленными индексами.
+
+    Оценки хранятся кодами из GRADES, операции - кортежами с кодом из OP_*.
+    run() проводит игрока по графу в интерактивном режиме, advance() применяет
+    переход к сжатому состоянию (оценки, репутация, попытки) для пакетных прогонов.
+    """
+
+    EXAMS = EXAM_NAMES
+    GRADES = GRADE_NAMES
+    OP_EXAM, OP_REPUTATION, OP_LIVES, OP_PROGRESS, OP_ARTIFACT, OP_TAKE_ARTIFACT = range(6)
+    OPS = {"exam": OP_EXAM, "reputation": OP_REPUTATION, "lives": OP_LIVES,
+           "progress": OP_PROGRESS, "artifact": OP_ARTIFACT, "take_artifact": OP_TAKE_ARTIFACT}
+
+    def __init__(self, story=STORY):
+        self.names = list(story)
+        self.ids = {name: node for node, name in enumerate(self.names)}
+        self.exam_nodes = {}  # экзамен -> узел его ветки
+        self.retake_nodes = {}  # экзамен -> узел пересдачи
+        self.text, self.enter, self.hints, self.after_hints = [], [], [], []
+        self.prompt = []  # узел -> вопрос или None для случайного узла
+        self.choices = []  # узел -> {ответ: номер перехода}
+        self.default = []  # узел -> номер перехода для прочих ответов
+        self.weights = []  # узел -> веса переходов случайного узла
+        self.edges = []  # узел -> [(текст, операции, следующий узел или -1)]
+        self.exam_codes = {exam: code for code, exam in enumerate(self.EXAMS)}
+        self.grade_codes = {grade: code for code, grade in enumerate(self.GRADES)}
+        # Таблица потери стипендии по кодам оценок
+        self.lost = [[Player.scholarship_lost(math, cs) for cs in self.GRADES] for math in self.GRADES]
+        for name in self.names:
+            self._compile(name, story[name])
+
+    def _compile_ops(self, effects):
+        ops = []
+        for effect in effects:
+            code = self.OPS[effect[0]]
+            if code == self.OP_EXAM:
+                ops.append((code, self.exam_codes[effect[1]], self.grade_codes[effect[2]]))
+            else:
+                ops.append((code,) + tuple(effect[1:]))
+        return tuple(ops)
+
+    def _compile_edge(self, edge, after):
+        next_node = self.ids[edge["next"]] if edge.get("next") else -1
+        return self._join(edge.get("text", ())), self._compile_ops(edge.get("effects", ())) + after, next_node
+
+    @staticmethod
+    def _join(lines):
+        return "\n".join(lines) if lines else None
+
+    def _compile(self, name, node):
+        node_id = self.ids[name]
+        if "exam" in node:
+            self.exam_nodes[node["exam"]] = node_id
+        if "retake" in node:
+            self.retake_nodes[node["retake"]] = node_id
+        self.text.append(self._join(node.get("text", ())))
+        self.enter.append(self._compile_ops(node.get("enter", ())))
+        self.hints.append(tuple(node.get("hints", ())))
+        self.after_hints.append(self._join(node.get("after_hints", ())))
+        after = self._compile_ops(node.get("after", ()))
+
+        edges, choices = [], {}
+        if "chance" in node:
+            self.prompt.append(None)
+            self.weights.append([weight for weight, _ in node["chance"]])
+            edges = [self._compile_edge(edge, after) for _, edge in node["chance"]]
+        else:
+            self.prompt.append(node["prompt"])
+            self.weights.append(None)
+            for answer, edge in node["edges"].items():
+                choices[answer] = len(edges)
+                edges.append(self._compile_edge(edge, after))
+            edges.append(self._compile_edge(node.get("default", {}), after))
+        self.choices.append(choices)
+        self.default.append(len(edges) - 1)
+        self.edges.append(edges)
+
+    def edge(self, node, answer):
+        """Номер перехода для ответа игрока"""
+        return self.choices[node].get(answer, self.default[node])
+
+    def run(self, name, player, vault, ask=None, say=None, rng=random):
+        """Провести игрока по графу, начиная с узла name"""
+        ask = ask or input
+        say = say or print
+        node = self.ids[name]
+        while node >= 0:
+            if self.text[node]:
+                say(self.text[node])
+            self._apply(self.enter[node], player, vault, say)
+            for artifact, line in self.hints[node]:
+                if artifact in player.artifacts:
+                    say(line)
+            if self.after_hints[node]:
+                say(self.after_hints[node])
+            if self.prompt[node] is None:
+                edge = rng.choices(range(len(self.weights[node])), self.weights[node])[0]
+            else:
+                edge = self.edge(node, ask(self.prompt[node]))
+            player.record(Player.EVENT_CHOICE, self.names[node], edge)
+            text, ops, node = self.edges[node][edge]
+            if text:
+                say(text)
+            self._apply(ops, player, vault, say)
+
+    def _apply(self, ops, player, vault, say):
+        for op in ops:
+            code = op[0]
+            if code == self.OP_EXAM:
+                player.record(Player.EVENT_GRADE, self.EXAMS[op[1]], self.GRADES[op[2]])
+            elif code == self.OP_REPUTATION:
+                player.record(Player.EVENT_REPUTATION, None, op[1])
+            elif code == self.OP_LIVES:
+                player.record(Player.EVENT_LIVES, None, op[1])
+            elif code == self.OP_PROGRESS:
+                player.record(Player.EVENT_BRANCH, op[1])
+            elif code == self.OP_ARTIFACT:
+                player.record(Player.EVENT_ARTIFACT, op[1])
+            elif code == self.OP_TAKE_ARTIFACT:
+                if vault.take_artifact(player, say):
+                    vault.generate_new_artifacts(say)
+
+    def advance(self, state, node, edge):
+        """Переход для сжатого состояния (оценки кодами..., репутация, попытки)"""
+        state = list(state)
+        rep, lives = len(self.EXAMS), len(self.EXAMS) + 1
+        for op in self.edges[node][edge][1]:
+            code = op[0]
+            if code == self.OP_EXAM:
+                state[op[1]] = op[2]
+            elif code == self.OP_REPUTATION:
+                state[rep] += op[1]
+            elif code == self.OP_LIVES:
+                state[lives] += op[1]
+        return tuple(state)
+
+    def scholarship_lost(self, state):
+        """Потеря стипендии для сжатого состояния"""
+        return self.lost[state[0]][state[1]]
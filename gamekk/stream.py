@@ -0,0 +1,212 @@
+"""Потоковые чтение, проверка и запись игроков и паролей"""
+
+import itertools
+import json
+import os
+
+from gamekk.files import temp_path
+from gamekk.player import Player
+
+
+def batches(items, size):
+    """Пачки по size элементов из любого итератора"""
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_json_object(f, chunk_size=1 << 16):
+    """Пары (ключ, значение) JSON-объекта верхнего уровня, разобранные по кускам файла.
+
+    В памяти только текущий кусок и одно значение, поэтому размер файла не
+    важен. Значение принимается, только если за ним в буфере есть символ,
+    которым оно не может продолжаться: число на границе куска ("12." из
+    "12.5") иначе прочиталось бы не до конца.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+
+    def more():
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def skip():
+        """Пропустить пробелы; следующий символ или "" в конце файла"""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position:position + 1]
+            more()
+
+    def decode():
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                partial = type(value) in (int, float) and end < len(buffer) and buffer[end] in "0123456789.eE+-"
+                if eof or (end < len(buffer) and not partial):
+                    position = end
+                    return value
+            more()
+
+    if skip() != "{":
+        raise ValueError("ожидался JSON-объект")
+    position += 1
+    if skip() == "}":
+        return
+    while True:
+        key = decode()
+        if not isinstance(key, str) or skip() != ":":
+            raise ValueError(f"ожидалась пара \"ключ\": значение после {key!r}")
+        position += 1
+        skip()
+        yield key, decode()
+        separator = skip()
+        position += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError(f"ожидалась ',' или '}}' после значения {key!r}")
+        skip()
+
+
+class PlayerStream:
+    """Потоковые чтение, проверка и запись игроков: записи идут по одной через генераторы.
+
+    Формат файла - по расширению: .json - старый players.json (разбирается
+    кусками через iter_json_object), .jsonl - запись в строке, .dat -
+    PlayerStore. Проверка (validate) идет по записи, запись на диск - пачками
+    по batch_size, поэтому память конвейера не зависит от размера файла.
+    """
+
+    BATCH = 1024  # записей в пачке
+    INTEGERS = ("reputation", "lives", "event_seq")
+    STRING_LISTS = ("artifacts", "story_progress")
+
+    @staticmethod
+    def store(path):
+        """PlayerStore с индексом, словарем и статистикой рядом с path"""
+        from gamekk.storage import PlayerStore  # хранилище само читает и пишет через этот модуль
+        base = os.path.splitext(path)[0]
+        return PlayerStore(path, base + ".idx", legacy_filename=None, legacy_log=None,
+                           stats_filename=base + ".stats", words_filename=base + ".words")
+
+    @staticmethod
+    def read_json(path):
+        """Записи из players.json; логин берется из ключа, если его нет в записи"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for username, record in iter_json_object(f):
+                if isinstance(record, dict):
+                    record.setdefault("username", username)
+                yield record
+
+    @staticmethod
+    def read_jsonl(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def read_users(path):
+        """Пары (логин, пароль) из старого users.txt"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    username, password = line.strip().split(':', 1)
+                    yield username, password
+
+    @classmethod
+    def read(cls, path):
+        """Записи игроков из файла любого формата по одной"""
+        extension = os.path.splitext(path)[1]
+        if extension == ".dat":
+            return cls.store(path).records()
+        if extension == ".jsonl":
+            return cls.read_jsonl(path)
+        return cls.read_json(path)
+
+    @classmethod
+    def convert(cls, record):
+        """Запись в виде Player.to_dict(): пропущенные поля как у нового игрока; ValueError с причиной"""
+        if not isinstance(record, dict):
+            raise ValueError("запись не объект")
+        username = record.get("username")
+        if not isinstance(username, str) or not username.strip():
+            raise ValueError("нет логина")
+        converted = Player(username).to_dict()
+        converted.update((key, record[key]) for key in converted if key in record)
+        for key in cls.INTEGERS:
+            if type(converted[key]) is not int:
+                raise ValueError(f"{key} не целое число")
+        if not isinstance(converted["scholarship"], bool):
+            raise ValueError("scholarship не да/нет")
+        exams = converted["exams"]
+        if not isinstance(exams, dict) or not all(isinstance(text, str) for pair in exams.items() for text in pair):
+            raise ValueError("exams не словарь строк")
+        for key in cls.STRING_LISTS:
+            if not isinstance(converted[key], list) or not all(isinstance(text, str) for text in converted[key]):
+                raise ValueError(f"{key} не список строк")
+        return converted
+
+    @classmethod
+    def validate(cls, records, rejected):
+        """Годные записи после convert(); причины отказов считаются в rejected (Counter)"""
+        for record in records:
+            try:
+                yield cls.convert(record)
+            except ValueError as error:
+                rejected[str(error)] += 1
+
+    @staticmethod
+    def write_jsonl(records, path, batch_size=BATCH):
+        written = 0
+        tmp = temp_path(path)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for batch in batches(records, batch_size):
+                f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+                written += len(batch)
+        os.replace(tmp, path)
+        return written
+
+    @staticmethod
+    def write_json(records, path, batch_size=BATCH):
+        """Запись в формате players.json: объект логин -> запись, по записи в строке"""
+        written = 0
+        tmp = temp_path(path)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write("{")
+            for batch in batches(records, batch_size):
+                f.write("".join(("," if written or number else "") + "\n  "
+                                + json.dumps(record["username"], ensure_ascii=False) + ": "
+                                + json.dumps(record, ensure_ascii=False) for number, record in enumerate(batch)))
+                written += len(batch)
+            f.write("\n}\n")
+        os.replace(tmp, path)
+        return written
+
+    @classmethod
+    def write(cls, records, path, batch_size=BATCH):
+        """Запись игроков в файл по расширению; возвращает число записанных"""
+        extension = os.path.splitext(path)[1]
+        if extension == ".dat":
+            store = cls.store(path)
+            written = store.import_records(records, batch_size)
+            store.wait()
+            store.flush_stats()
+            return written
+        if extension == ".jsonl":
+            return cls.write_jsonl(records, path, batch_size)
+        return cls.write_json(records, path, batch_size)
@@ -0,0 +1,78 @@
+"""Тексты игры и их каталог"""
+
+import string
+
+
+# Тексты игры по идентификаторам сообщений. Сюжетные тексты лежат в STORY
+TEXTS = {
+    "menu": "ГЛАВНОЕ МЕНЮ\n1. Новая игра\n2. Загрузить игру\n3. Выход",
+    "menu.choice": "\nВыберите действие: ",
+    "menu.wrong": "Неверный выбор. Попробуйте еще раз.",
+    "menu.again": "\nХотите сыграть еще раз? (да/нет): ",
+    "menu.bye": "\nСпасибо за игру! До свидания!",
+    "register.title": "РЕГИСТРАЦИЯ НОВОГО ИГРОКА",
+    "register.login": "Придумайте логин: ",
+    "register.empty": "Логин не может быть пустым!",
+    "register.taken": "Этот логин уже занят!",
+    "register.password": "Придумайте пароль: ",
+    "register.done": "\n Регистрация прошла успешно! Добро пожаловать, {username}!",
+    "login.title": "ВХОД В ИГРУ",
+    "login.login": "Логин: ",
+    "login.password": "Пароль: ",
+    "login.loaded": "\n Успешный вход! Загружена сохраненная игра.\n Репутация: {reputation}\n"
+                    " Экзамены: {exams}\n Артефакты: {artifacts} шт.",
+    "login.new": "\n Успешный вход! Создан новый персонаж.",
+    "login.failed": "\n Неверный логин или пароль!",
+    "login.restored": "\n Восстановлен несохраненный прогресс прошлой сессии.",
+    "intro": "ДОБРО ПОЖАЛОВАТЬ В ИГРУ 'СТИПЕНДИЯ В ОПАСНОСТИ!'\n"
+             "\nВнимание! Ваша главная цель - сохранить стипендию.\n"
+             "От ваших решений зависит, получите ли вы деньги на жизнь!\n"
+             "\nУ вас есть: {lives} попытки на пересдачу\n"
+             "Текущая репутация: {reputation}",
+    "session.done": "\nВсе экзамены уже сданы!",
+    "session.start": "СЕССИЯ НАЧИНАЕТСЯ!\n\nКакие экзамены осталось сдать: {exams}",
+    "session.first": "\nКакой экзамен будет первый? (матан/информатика): ",
+    "session.wrong": "Этот экзамен уже сдан или такого нет!",
+    "session.pick": "Выберите экзамен из списка: ",
+    "session.last": "\nОстался только один экзамен: {exam}",
+    "status": "ТЕКУЩИЙ СТАТУС\nРепутация: {reputation}\nСтипендия: {scholarship}\nЭкзамены: {exams}\n"
+              "Артефакты: {artifacts} шт.\nПопыток на пересдачу: {lives}",
+    "scholarship.kept": "сохранена",
+    "scholarship.lost": "потеряна",
+    "save.ask": "\n Хотите сохранить игру? (да/нет): ",
+    "save.done": "\n Игра сохранена!",
+    "save.declined": "\n Прогресс не сохранен! Артефакты возвращаются в копилку.",
+    "game_over": "ИГРА ОКОНЧЕНА\n\n Вы потеряли стипендию!\n"
+                 "Попробуйте еще раз, возможно в следующий раз повезет больше.",
+    "retake.ask": "\nХотите попробовать пересдать? (да/нет): ",
+    "retake.declined": "\nВы решили не пересдавать. Игра завершена.",
+    "retake.title": "ПЕРЕСДАЧА!",
+    "retake.no_lives": "У тебя закончились попытки! Игра окончена.",
+    "retake.nothing": "У тебя нет несданных экзаменов для пересдачи.",
+    "retake.status": "У тебя осталось {lives} попыток\nЭкзамены для пересдачи: {exams}",
+    "retake.choose": "\nКакой экзамен пересдаем? (матан/информатика): ",
+    "retake.unknown": "Такого экзамена нет в списке несданных.",
+    "final": "ФИНАЛЬНЫЙ РЕЗУЛЬТАТ\nРепутация: {reputation}\nСтипендия: {scholarship}\nЭкзамены: {exams}",
+    "final.title": "ФИНАЛЬНЫЙ РЕЗУЛЬТАТ",
+    "final.won": "\n ПОЗДРАВЛЯЕМ! ВЫ СОХРАНИЛИ СТИПЕНДИЮ! ",
+    "final.lost": "\n Вы не смогли сохранить стипендию. Попробуйте еще раз!",
+    "vault.taken": "\n Вы получили артефакт: {artifact}\n Ваши артефакты: {artifacts}",
+    "vault.generated": "\n В копилке сгенерированы новые артефакты!",
+}
+
+
+class Catalog:
+    """Каталог текстов: шаблоны разобраны один раз, без полей хранятся готовой строкой"""
+
+    def __init__(self, texts=TEXTS):
+        self.templates = {}
+        for key, text in texts.items():
+            has_fields = any(field is not None for _, field, _, _ in string.Formatter().parse(text))
+            self.templates[key] = text.format if has_fields else text
+
+    def render(self, key, **fields):
+        template = self.templates[key]
+        return template if isinstance(template, str) else template(**fields)
+
+
+CATALOG = Catalog()
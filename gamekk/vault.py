@@ -0,0 +1,304 @@
+"""Общая копилка артефактов: JSON с журналом и SQLite"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from gamekk.files import file_stamp, temp_path
+from gamekk.player import Player
+from gamekk.texts import CATALOG
+
+
+class ArtifactVault:
+    """Копилка артефактов.
+
+    Состояние - снимок artifacts.json плюс журнал операций artifacts.journal.
+    Операции копятся в памяти и дописываются в журнал пачками,
+    время от времени журнал сворачивается в новый снимок.
+
+    У снимка есть номер (epoch), журнал начинается строкой {"epoch": N}
+    того снимка, к которому он относится. Если снимок заменили, а журнал
+    очистить не успели, номера не совпадут и журнал не повторится дважды.
+    Снимок прежней версии - просто список, его номер 0.
+    """
+
+    # Начальный набор артефактов
+    DEFAULT_ARTIFACTS = [
+        "Зачетка",
+        "Конспект по матану",
+        "Шпаргалка по информатике",
+        "Счастливый билет",
+    ]
+    # Артефакты, которые появляются, когда все забраны
+    NEW_ARTIFACTS = [
+        "Новый зачетный лист",
+        "Экзаменационные билеты",
+        "Справка о болезни",
+        "Пересдача",
+    ]
+
+    def __init__(self, filename="artifacts.json", journal_filename="artifacts.journal",
+                 batch_size=8, snapshot_every=256):
+        self.filename = filename
+        self.journal_filename = journal_filename
+        self.batch_size = batch_size  # сколько операций копить до записи в журнал
+        self.snapshot_every = snapshot_every  # сколько записей журнала до нового снимка
+        self.pending = []  # операции, еще не записанные в журнал
+        self.journal_length = 0
+        self.epoch = 0  # номер текущего снимка
+        self.lock = threading.RLock()
+        self.stamp = None  # file_stamp снимка и журнала после нашей последней записи
+        self.artifacts = self.load_artifacts()
+        atexit.register(self.flush)
+
+    def load_artifacts(self):
+        """Загрузка снимка и повтор журнала после сбоя"""
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        else:
+            self.save_artifacts(self.DEFAULT_ARTIFACTS)
+            return deque(self.DEFAULT_ARTIFACTS)
+        if isinstance(snapshot, list):
+            snapshot = {"epoch": 0, "artifacts": snapshot}
+        self.epoch = snapshot["epoch"]
+        artifacts = deque(snapshot["artifacts"])
+
+        self.journal_length = 0
+        stale = False  # журнал уже свернут в снимок
+        if os.path.exists(self.journal_filename):
+            with open(self.journal_filename, 'r', encoding='utf-8') as f:
+                for number, line in enumerate(f):
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # оборванная запись в конце журнала
+                    if "op" not in op:
+                        stale = op["epoch"] != self.epoch
+                    elif number == 0:
+                        stale = self.epoch != 0  # журнал без заголовка - к снимку-списку
+                    if stale:
+                        break
+                    if "op" in op:
+                        self._apply(artifacts, op)
+                        self.journal_length += 1
+        if stale:
+            self._reset_journal()
+        self.stamp = file_stamp(self.filename, self.journal_filename)
+        return artifacts
+
+    def changed_outside(self):
+        """Изменили ли файлы копилки в обход этого объекта (другой процесс)"""
+        return file_stamp(self.filename, self.journal_filename) != self.stamp
+
+    def reload(self):
+        """Перечитать копилку после изменений снаружи"""
+        with self.lock:
+            self.flush()
+            self.artifacts = self.load_artifacts()
+
+    @staticmethod
+    def _apply(artifacts, op):
+        if op["op"] == "take":
+            if artifacts:
+                artifacts.popleft()
+        elif op["op"] == "return":
+            artifacts.extend(op["items"])
+        elif op["op"] == "generate":
+            artifacts.clear()
+            artifacts.extend(op["items"])
+
+    def save_artifacts(self, artifacts_list):
+        """Сохранение снимка артефактов в файл и очистка журнала"""
+        epoch = self.epoch + 1
+        tmp = temp_path(self.filename)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"epoch": epoch, "artifacts": list(artifacts_list)}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.filename)
+        self.epoch = epoch
+        self._reset_journal()
+        self.stamp = file_stamp(self.filename, self.journal_filename)
+
+    def _reset_journal(self):
+        """Пустой журнал текущего снимка"""
+        with open(self.journal_filename, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"epoch": self.epoch}) + "\n")
+        self.journal_length = 0
+
+    def _record(self, op):
+        self.pending.append(op)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Запись накопленных операций в журнал"""
+        with self.lock:
+            if not self.pending:
+                return
+            with open(self.journal_filename, 'a', encoding='utf-8') as f:
+                if f.tell() == 0:
+                    f.write(json.dumps({"epoch": self.epoch}) + "\n")
+                for op in self.pending:
+                    f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            self.stamp = file_stamp(self.filename, self.journal_filename)
+            self.journal_length += len(self.pending)
+            self.pending.clear()
+            if self.journal_length >= self.snapshot_every:
+                self.save_artifacts(self.artifacts)
+
+    def _take(self):
+        """Достать первый артефакт или None"""
+        with self.lock:
+            if not self.artifacts:
+                return None
+            artifact = self.artifacts.popleft()
+            self._record({"op": "take", "item": artifact})
+            return artifact
+
+    def _return(self, items):
+        """Положить артефакты в конец очереди"""
+        with self.lock:
+            self.artifacts.extend(items)
+            self._record({"op": "return", "items": items})
+
+    def _generate(self, items):
+        """Заполнить пустую копилку; False, если она не пуста"""
+        with self.lock:
+            if self.artifacts:
+                return False
+            self.artifacts.extend(items)
+            self._record({"op": "generate", "items": items})
+            return True
+
+    def take_artifact(self, player, say=print):
+        """Взять артефакт из копилки"""
+        artifact = self._take()
+        if artifact is None:
+            return False
+        player.record(Player.EVENT_ARTIFACT, artifact)
+        say(CATALOG.render("vault.taken", artifact=artifact,
+                           artifacts=", ".join(player.artifacts) if player.artifacts else "нет"))
+        return True
+
+    def return_artifacts(self, player):
+        """Вернуть артефакты в копилку"""
+        if player.artifacts:
+            self._return(list(player.artifacts))
+            player.record(Player.EVENT_RETURN)
+
+    def generate_new_artifacts(self, say=print):
+        """Генерация новых артефактов если все забраны"""
+        if self._generate(list(self.NEW_ARTIFACTS)):
+            say(CATALOG.render("vault.generated"))
+
+
+class SQLiteArtifactVault(ArtifactVault):
+    """Копилка артефактов в SQLite (режим WAL), общая для нескольких процессов.
+
+    Каждая операция - отдельная транзакция BEGIN IMMEDIATE, поэтому два
+    процесса не могут выдать один и тот же артефакт. Ожидание чужой
+    транзакции считается в metrics.
+    """
+
+    def __init__(self, filename="artifacts.db", legacy_filename="artifacts.json",
+                 legacy_journal="artifacts.journal", busy_timeout=0.05):
+        self.filename = filename
+        self.legacy_filename = legacy_filename
+        self.legacy_journal = legacy_journal
+        self.busy_timeout = busy_timeout  # ожидание блокировки до повторной попытки, сек.
+        self.local = threading.local()  # у каждого потока свое соединение
+        self.lock = threading.Lock()
+        self.metrics = {"transactions": 0, "busy_retries": 0, "wait_seconds": 0.0}
+        with self._transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS artifacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if db.execute("SELECT 1 FROM meta WHERE key = 'seeded'").fetchone() is None:
+                self._insert(db, self._initial_artifacts())
+                db.execute("INSERT INTO meta VALUES ('seeded', '1')")
+
+    def _initial_artifacts(self):
+        """Начальное содержимое: старая копилка (снимок и журнал) или набор по умолчанию"""
+        if self.legacy_filename and os.path.exists(self.legacy_filename):
+            return list(ArtifactVault(self.legacy_filename, self.legacy_journal).artifacts)
+        return list(self.DEFAULT_ARTIFACTS)
+
+    def _connection(self):
+        import sqlite3
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.filename, timeout=self.busy_timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция с захватом блокировки на запись и учетом ожидания"""
+        import sqlite3
+        db = self._connection()
+        started = time.perf_counter()
+        retries = 0
+        while True:
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                break
+            except sqlite3.OperationalError as error:
+                if "locked" not in str(error) and "busy" not in str(error):
+                    raise
+                retries += 1
+        waited = time.perf_counter() - started
+        try:
+            yield db
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            with self.lock:
+                self.metrics["transactions"] += 1
+                self.metrics["busy_retries"] += retries
+                self.metrics["wait_seconds"] += waited
+
+    @staticmethod
+    def _insert(db, items):
+        db.executemany("INSERT INTO artifacts (name) VALUES (?)", [(item,) for item in items])
+
+    @property
+    def artifacts(self):
+        """Текущее содержимое копилки"""
+        rows = self._connection().execute("SELECT name FROM artifacts ORDER BY id")
+        return deque(name for name, in rows)
+
+    def flush(self):
+        """Каждая операция уже зафиксирована своей транзакцией"""
+
+    def changed_outside(self):
+        """Состояние всегда читается из базы, перечитывать нечего"""
+        return False
+
+    def reload(self):
+        pass
+
+    def _take(self):
+        with self._transaction() as db:
+            row = db.execute("SELECT id, name FROM artifacts ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("DELETE FROM artifacts WHERE id = ?", (row[0],))
+            return row[1]
+
+    def _return(self, items):
+        with self._transaction() as db:
+            self._insert(db, items)
+
+    def _generate(self, items):
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM artifacts LIMIT 1").fetchone() is not None:
+                return False
+            self._insert(db, items)
+            return True
@@ -0,0 +1,68 @@
+"""Тесты фонового автосохранения Autosave"""
+
+import threading
+
+from gamekk.autosave import Autosave
+from gamekk.player import Player
+
+
+def make_autosave(tmp_path):
+    # Поток сброса не нужен: тесты вызывают flush() сами
+    return Autosave(str(tmp_path / "players.autosave"), window=3600, fsync=False)
+
+
+def test_crashed_session_is_restored(tmp_path):
+    autosave = make_autosave(tmp_path)
+    player = Player("аня")
+    autosave.track(player)
+    player.record(Player.EVENT_REPUTATION, value=5)
+    autosave.release(player)
+    autosave.flush()
+
+    fresh = Player("аня")
+    assert make_autosave(tmp_path).restore(fresh)
+    assert fresh.reputation == 15
+
+
+def test_clean_exit_discards_unsaved_events(tmp_path):
+    autosave = make_autosave(tmp_path)
+    player = Player("аня")
+    autosave.track(player)
+    player.record(Player.EVENT_REPUTATION, value=5)
+    autosave.flush()  # события успели попасть в журнал
+    autosave.forget(player)
+    autosave.flush()
+
+    fresh = Player("аня")
+    assert not make_autosave(tmp_path).restore(fresh)
+    assert fresh.reputation == 10
+
+
+def test_saved_player_is_dropped(tmp_path):
+    autosave = make_autosave(tmp_path)
+    player = Player("аня")
+    autosave.track(player)
+    player.record(Player.EVENT_REPUTATION, value=5)
+    autosave.flush()
+    player.events_saved()
+    autosave.saved(player)
+    autosave.release(player)
+    autosave.flush()
+    assert not make_autosave(tmp_path).restore(Player("аня"))
+
+
+def test_flush_reads_player_under_save_lock(tmp_path):
+    autosave = make_autosave(tmp_path)
+    lock = threading.RLock()
+    player = Player("аня")
+    autosave.track(player, lock=lock)
+    player.record(Player.EVENT_REPUTATION, value=5)
+    with lock:
+        flusher = threading.Thread(target=autosave.flush)
+        flusher.start()
+        flusher.join(0.2)
+        assert flusher.is_alive()  # ждет, пока сохранение не закончится
+        player.events_saved()
+    flusher.join()
+    # Сохраненные события не попали в журнал как несохраненные
+    assert "аня" not in autosave.pending
@@ -0,0 +1,68 @@
+"""Тесты буферизованного вывода и каталога текстов"""
+
+import ast
+import inspect
+import random
+import string
+
+import gamekk.game
+import gamekk.vault
+from gamekk.autosave import Autosave
+from gamekk.console import ScriptedIO
+from gamekk.credentials import CredentialStore
+from gamekk.game import Game
+from gamekk.load import LoadGenerator, SessionScript
+from gamekk.story import StoryGraph
+from gamekk.texts import CATALOG, TEXTS
+from gamekk.vault import ArtifactVault
+
+from test_storage import make_store
+
+
+def catalog_calls(*modules):
+    """Ключ каталога -> имена полей, с которыми модули его выводят"""
+    calls = {}
+    for module in modules:
+        for node in ast.walk(ast.parse(inspect.getsource(module))):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ("say", "ask", "render") and node.args):
+                continue
+            first = node.args[0]
+            keys = [first.body, first.orelse] if isinstance(first, ast.IfExp) else [first]
+            for key in keys:
+                if isinstance(key, ast.Constant) and key.value in TEXTS:
+                    calls.setdefault(key.value, set()).update(
+                        keyword.arg for keyword in node.keywords if keyword.arg)
+    return calls
+
+
+def test_session_writes_once_per_prompt(tmp_path):
+    answers = LoadGenerator.answers(random.Random(3), "1", "аня", "секрет")
+    answers["save.ask"] = "да"
+    answers["menu.again"] = "да"  # затем выход из меню с прощанием
+    script = SessionScript(answers, SessionScript.prompt_keys(StoryGraph()))
+    io = ScriptedIO(script, keep_output=True)
+    game = Game(io=io, vault=ArtifactVault(str(tmp_path / "artifacts.json"), str(tmp_path / "artifacts.journal")),
+                store=make_store(tmp_path),
+                credentials=CredentialStore(str(tmp_path / "users.db"), legacy_filename=None, iterations=10),
+                autosave=Autosave(str(tmp_path / "players.autosave")))
+    game.main_menu()
+    transcript = io.transcript()
+
+    prompts = sum(script.asked.values())
+    assert prompts > 5
+    assert io.writes == prompts + 1  # по записи на вопрос и последняя с прощанием
+    assert len(io.output) == io.writes
+    assert io.chars_written == len(transcript)
+    assert transcript.endswith(CATALOG.render("menu.bye") + "\n")
+
+
+def test_every_text_renders_with_game_fields():
+    calls = catalog_calls(gamekk.game, gamekk.vault)
+    assert set(calls) == set(TEXTS)
+    for key, fields in calls.items():
+        needed = {field for _, field, _, _ in string.Formatter().parse(TEXTS[key]) if field is not None}
+        assert needed <= fields, key
+        text = CATALOG.render(key, **{field: f"<{field}>" for field in fields})
+        assert "{" not in text, key
+        assert all(f"<{field}>" in text for field in needed), key
@@ -0,0 +1,60 @@
+"""Тесты потокового переноса игроков и паролей между форматами"""
+
+import json
+import os
+import random
+from collections import Counter
+
+from gamekk.credentials import CredentialStore
+from gamekk.stream import PlayerStream
+
+from test_player import random_record
+
+
+def test_formats_round_trip(tmp_path):
+    rng = random.Random(2)
+    records = [random_record(rng, f"игрок{number}") for number in range(500)]
+    path = str(tmp_path / "players.json")
+    PlayerStream.write_json(records, path, batch_size=64)
+    for target in ("players.jsonl", "players.dat", "copy.json"):
+        rejected = Counter()
+        written = PlayerStream.write(PlayerStream.validate(PlayerStream.read(path), rejected),
+                                     str(tmp_path / target), batch_size=64)
+        assert (written, rejected) == (len(records), Counter())
+        path = str(tmp_path / target)
+    assert sorted(PlayerStream.read(path), key=lambda record: record["username"]) == \
+        sorted(records, key=lambda record: record["username"])
+
+
+def test_legacy_json_without_new_fields(tmp_path):
+    with open(tmp_path / "players.json", 'w', encoding='utf-8') as f:
+        json.dump({"аня": {"reputation": 12, "exams": {"матан": "4"}, "artifacts": [],
+                           "story_progress": [], "scholarship": True, "lives": 1},
+                   "боря": "не запись"}, f, ensure_ascii=False)
+    rejected = Counter()
+    records = list(PlayerStream.validate(PlayerStream.read(str(tmp_path / "players.json")), rejected))
+    assert [record["username"] for record in records] == ["аня"]
+    assert (records[0]["reputation"], records[0]["event_seq"]) == (12, 0)
+    assert sum(rejected.values()) == 1
+
+
+def test_users_txt_is_kept_as_backup(tmp_path):
+    source = tmp_path / "users.txt"
+    source.write_text("аня:секрет\nборя:пароль:с двоеточием\n", encoding='utf-8')
+    credentials = CredentialStore(str(tmp_path / "users.db"), legacy_filename=None, iterations=10)
+    assert credentials.import_plaintext(str(source)) == 2
+    assert credentials.verify("боря", "пароль:с двоеточием")
+    assert not source.exists()
+    assert (tmp_path / "users.txt.bak").read_text(encoding='utf-8').startswith("аня:секрет")
+    credentials.pool.shutdown()
+
+
+def test_users_txt_delete_source(tmp_path):
+    source = tmp_path / "users.txt"
+    source.write_text("аня:секрет\n", encoding='utf-8')
+    credentials = CredentialStore(str(tmp_path / "users.db"), legacy_filename=None, iterations=10)
+    credentials.import_plaintext(str(source), delete_source=True)
+    assert os.listdir(tmp_path).count("users.txt.bak") == 0
+    assert not source.exists()
+    assert credentials.verify("аня", "секрет")
+    credentials.pool.shutdown()
@@ -0,0 +1,183 @@
+"""Тесты учетных записей CredentialStore и регистрации"""
+
+import os
+import threading
+
+from gamekk.console import ScriptedIO
+from gamekk.credentials import CredentialStore
+from gamekk.game import Game
+
+
+def make_credentials(tmp_path):
+    return CredentialStore(str(tmp_path / "users.db"), legacy_filename=None, iterations=10)
+
+
+def test_add_and_verify(tmp_path):
+    credentials = make_credentials(tmp_path)
+    credentials.add("аня", "секрет").result()
+    assert credentials.verify("аня", "секрет")
+    assert not credentials.verify("аня", "другой")
+    credentials.pool.shutdown()
+    reopened = make_credentials(tmp_path)
+    assert reopened.verify("аня", "секрет")
+
+
+def test_concurrent_add_takes_login_once(tmp_path):
+    credentials = make_credentials(tmp_path)
+    start = threading.Barrier(8)
+    results = []
+
+    def register(password):
+        start.wait()
+        results.append(credentials.add("dup", password))
+
+    threads = [threading.Thread(target=register, args=(f"пароль{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    winners = [result for result in results if result is not False]
+    assert len(winners) == 1
+    winners[0].result()
+    credentials.pool.shutdown()
+    with open(credentials.filename, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2  # бронь и хеш
+
+
+def register_in_process(directory, password, count, start, results):
+    credentials = make_credentials(directory)
+    start.wait()
+    won = [username for username in (f"игрок{number}" for number in range(count))
+           if credentials.add(username, password) is not False]
+    credentials.pool.shutdown()
+    results.put((password, won))
+
+
+def test_processes_take_login_once(tmp_path):
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Barrier(2), context.Queue()
+    processes = [context.Process(target=register_in_process, args=(tmp_path, password, 300, start, results))
+                 for password in ("первый", "второй")]
+    for process in processes:
+        process.start()
+    won = dict(results.get(timeout=60) for _ in processes)
+    for process in processes:
+        process.join()
+    assert sorted(won["первый"] + won["второй"]) == sorted(f"игрок{number}" for number in range(300))
+    credentials = make_credentials(tmp_path)
+    for password, usernames in won.items():
+        for username in usernames:
+            assert credentials.verify(username, password)
+    credentials.pool.shutdown()
+
+
+def test_first_record_of_login_counts(tmp_path):
+    first, second = make_credentials(tmp_path), make_credentials(tmp_path)
+    first.add("x", "первый").result()
+    # Запись в обход брони, как из процесса, не видевшего журнал
+    second._store("x", second.pool.submit(second._hash, "второй"))
+    for credentials in (first, second):
+        credentials.pool.shutdown()
+    reopened = make_credentials(tmp_path)
+    assert reopened.verify("x", "первый")
+    assert not reopened.verify("x", "второй")
+    reopened.pool.shutdown()
+
+
+def test_register_asks_again_if_login_taken_meanwhile(tmp_path):
+    credentials = make_credentials(tmp_path)
+    answers = iter(["dup", "пароль", "dup2", "пароль2"])
+
+    def answer(prompt):
+        if prompt == "Придумайте пароль: " and not credentials.exists("dup"):
+            credentials.add("dup", "чужой")  # другой клиент успел раньше
+        return next(answers)
+
+    io = ScriptedIO(answer, keep_output=True)
+    player = Game(io=io, credentials=credentials).register()
+    assert player.username == "dup2"
+    assert "Этот логин уже занят!" in "".join(io.output)
+    assert credentials.verify("dup", "чужой")
+    assert credentials.verify("dup2", "пароль2")
+
+
+def test_verify_while_hash_is_pending(tmp_path):
+    credentials = make_credentials(tmp_path)
+    future = credentials.add("аня", "секрет")
+    # Логин занят сразу, проверка дождется хеша в пуле
+    assert credentials.exists("аня")
+    assert credentials.verify("аня", "секрет")
+    future.result()
+    assert not credentials.verify("боря", "секрет")
+    credentials.pool.shutdown()
+
+
+def test_reload_keeps_pending_registrations(tmp_path):
+    credentials = make_credentials(tmp_path)
+    credentials.add("аня", "секрет").result()
+    other = make_credentials(tmp_path)
+    other.add("боря", "пароль").result()
+    other.pool.shutdown()
+    assert credentials.changed_outside()
+    credentials.reload()
+    assert credentials.verify("боря", "пароль")
+    assert credentials.verify("аня", "секрет")
+    credentials.pool.shutdown()
+
+
+def test_legacy_users_txt_is_imported_in_background(tmp_path, monkeypatch):
+    (tmp_path / "users.txt").write_text("аня:секрет\nборя:пароль\n", encoding='utf-8')
+    release = threading.Event()
+    hash_password = CredentialStore._hash
+
+    def slow_import(self, password, salt=None, iterations=None):
+        if threading.current_thread().name.startswith("kdf-import"):
+            release.wait()
+        return hash_password(self, password, salt, iterations)
+    monkeypatch.setattr(CredentialStore, "_hash", slow_import)
+
+    credentials = CredentialStore(str(tmp_path / "users.db"), str(tmp_path / "users.txt"), iterations=10)
+    # Перенос еще стоит, а вход и проверка логина уже идут по users.txt
+    assert credentials.verify("аня", "секрет")
+    assert not credentials.verify("аня", "не тот")
+    assert credentials.exists("боря")
+    assert credentials.add("боря", "чужой") is False
+    credentials.add("вера", "пароль").result()
+    release.set()
+    credentials.importer.join()
+    assert credentials.legacy is None
+    assert credentials.verify("боря", "пароль")
+    credentials.pool.shutdown()
+    # Открытые пароли не остаются на диске ни в каком виде
+    assert sorted(os.listdir(tmp_path)) == ["users.db", "users.db.lock"]
+    reopened = CredentialStore(str(tmp_path / "users.db"), str(tmp_path / "users.txt"), iterations=10)
+    assert reopened.importer is None
+    assert reopened.verify("аня", "секрет")
+    assert reopened.verify("вера", "пароль")
+    assert not reopened.verify("аня", "не тот")
+    reopened.pool.shutdown()
+
+
+def test_interrupted_import_resumes(tmp_path):
+    (tmp_path / "users.txt").write_text("аня:секрет\nборя:пароль\n", encoding='utf-8')
+    credentials = make_credentials(tmp_path)
+    credentials.add("аня", "секрет").result()  # будто первая пачка уже перенесена
+    credentials.pool.shutdown()
+    resumed = CredentialStore(str(tmp_path / "users.db"), str(tmp_path / "users.txt"), iterations=10)
+    resumed.importer.join()
+    assert resumed.verify("аня", "секрет")
+    assert resumed.verify("боря", "пароль")
+    resumed.pool.shutdown()
+    with open(resumed.filename, encoding='utf-8') as f:
+        assert len(f.readlines()) == 3  # бронь и хеш ани, хеш бори
+
+
+def test_convert_keeps_backup(tmp_path):
+    (tmp_path / "users.txt").write_text("аня:секрет\nборя:пароль\n", encoding='utf-8')
+    credentials = make_credentials(tmp_path)
+    assert credentials.import_plaintext(str(tmp_path / "users.txt")) == 2
+    credentials.pool.shutdown()
+    assert (tmp_path / "users.txt.bak").exists()
+    assert not (tmp_path / "users.txt").exists()
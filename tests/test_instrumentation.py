@@ -0,0 +1,112 @@
+"""Тесты замеров Instrumentation на сценарной сессии"""
+
+import importlib
+import json
+import random
+import re
+
+import gamekk.storage
+from gamekk.autosave import Autosave
+from gamekk.console import ScriptedIO
+from gamekk.credentials import CredentialStore
+from gamekk.game import Game
+from gamekk.instrumentation import Instrumentation
+from gamekk.load import LoadGenerator, SessionScript
+from gamekk.story import StoryGraph
+from gamekk.vault import ArtifactVault
+
+from test_storage import make_store
+
+SAMPLE = re.compile(r'^([a-z_]+)\{((?:[a-z]+="[^"]*",?)+)\} (\S+)$')
+TYPE = re.compile(r'^# TYPE ([a-z_]+) (counter|gauge|histogram)$')
+
+
+def make_game(tmp_path):
+    answers = LoadGenerator.answers(random.Random(1), "1", "аня", "секрет")
+    answers["save.ask"] = "да"
+    script = SessionScript(answers, SessionScript.prompt_keys(StoryGraph()))
+    return Game(io=ScriptedIO(script),
+                vault=ArtifactVault(str(tmp_path / "artifacts.json"), str(tmp_path / "artifacts.journal")),
+                store=make_store(tmp_path),
+                credentials=CredentialStore(str(tmp_path / "users.db"), legacy_filename=None, iterations=10),
+                autosave=Autosave(str(tmp_path / "players.autosave")))
+
+
+def play(tmp_path):
+    """Сценарная сессия с регистрацией и сохранением под замерами"""
+    instrumentation = Instrumentation()
+    instrumentation.enable()
+    try:
+        game = instrumentation.instrument(make_game(tmp_path))
+        game.main_menu()
+        game.store.wait()
+        game.vault.flush()
+        game.autosave.close()
+    finally:
+        instrumentation.disable()
+    return instrumentation
+
+
+def totals(instrumentation):
+    result = {}
+    for (metric, _), value in instrumentation.counters.items():
+        result[metric] = result.get(metric, 0) + value
+    return result
+
+
+def parse_prometheus(text):
+    """Разбор текстового формата: {(метрика, метки): значение}, тип каждой метрики"""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        match = TYPE.match(line)
+        if match:
+            assert match.group(1) not in types, line
+            types[match.group(1)] = match.group(2)
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        family = re.sub(r"_(bucket|sum|count)$", "", name) if name not in types else name
+        assert family in types, line
+        labels = tuple(sorted(re.findall(r'([a-z]+)="([^"]*)"', labels)))
+        assert (name, labels) not in samples, line
+        samples[(name, labels)] = float(value)
+    return samples, types
+
+
+def test_session_records_io_and_phases(tmp_path):
+    instrumentation = play(tmp_path)
+    counters = totals(instrumentation)
+    assert counters["file_opens"] > 0
+    assert counters["bytes_written"] > 0
+    assert counters["output_writes"] > 0
+    assert instrumentation.counters[("file_opens", "store.save_player")] > 0
+    assert instrumentation.counters[("bytes_written", "credentials.add")] > 0
+    for phase in ("register", "game_loop", "save_game", "store.save_player", "credentials.add"):
+        histogram = instrumentation.histograms[phase]
+        assert histogram[-1] >= 1
+        assert sum(histogram[:-2]) == histogram[-1]
+
+
+def test_disable_restores_module_globals(tmp_path):
+    play(tmp_path)
+    assert "open" not in vars(gamekk.storage)
+    assert gamekk.storage.json is json
+    for name in Instrumentation.IO_MODULES:
+        module = importlib.import_module(name)
+        assert "open" not in vars(module)
+        assert getattr(module, "json", json) is json
+
+
+def test_prometheus_output_parses(tmp_path):
+    instrumentation = play(tmp_path)
+    samples, types = parse_prometheus(instrumentation.prometheus())
+    assert types["game_phase_seconds"] == "histogram"
+    assert types["game_file_opens_total"] == "counter"
+    assert types["game_cache_entries"] == "gauge"
+    for phase, histogram in instrumentation.histograms.items():
+        buckets = [samples[("game_phase_seconds_bucket", (("le", bound), ("phase", phase)))]
+                   for bound in [str(bound) for bound in Instrumentation.BUCKETS] + ["+Inf"]]
+        assert buckets == sorted(buckets)
+        assert buckets[-1] == samples[("game_phase_seconds_count", (("phase", phase),))] == histogram[-1]
+    assert samples[("game_bytes_written_total", (("phase", "store.save_player"),))] > 0
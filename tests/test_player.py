@@ -0,0 +1,59 @@
+"""Тесты игрока Player и его двоичной записи PlayerRecord"""
+
+import random
+
+from gamekk.player import EXAMS, GRADES, Player, PlayerRecord, PlayerView
+
+
+def random_record(rng, username):
+    exams = {"матан": rng.choice(GRADES.names), "информатика": rng.choice(GRADES.names)}
+    if rng.random() < 0.3:
+        exams[rng.choice(["физика", "матан"])] = rng.choice(["5", "зачет", "3"])
+    return {
+        "username": username,
+        "reputation": rng.randint(-20, 40),
+        "exams": exams,
+        "artifacts": rng.sample(["Телефон", "Умные часы", "Шпаргалка", "Конспект"], rng.randint(0, 4)),
+        "story_progress": rng.sample(["Выбрал класс", "Матан: сдал", "Информатика: завалил"], rng.randint(0, 3)),
+        "scholarship": rng.random() < 0.5,
+        "lives": rng.randint(0, 3),
+        "event_seq": rng.randint(0, 100),
+    }
+
+
+def test_record_round_trip():
+    rng = random.Random(1)
+    for number in range(300):
+        record = random_record(rng, f"игрок{number}")
+        assert Player.from_dict(record).to_dict() == record
+        assert PlayerView(PlayerRecord.encode(record)).to_dict() == record
+
+
+def test_unknown_exam_stays_with_its_player():
+    loaded = Player.from_dict(dict(Player("аня").to_dict(), exams={"матан": "4", "информатика": "3",
+                                                                  "физика": "5"}))
+    assert loaded.exams["физика"] == "5"
+    assert "физика" not in Player("боря").exams
+    assert list(EXAMS.names) == ["матан", "информатика"]
+    assert "5" not in GRADES.ids
+
+
+def test_many_unknown_grades_do_not_overflow():
+    player = Player("аня")
+    for number in range(40):
+        player.exams["матан"] = f"оценка {number}"
+        assert player.exams["матан"] == f"оценка {number}"
+        assert player.exams["информатика"] == "не сдан"
+    player.exams["матан"] = "4"
+    assert dict(player.exams) == {"матан": "4", "информатика": "не сдан"}
+    assert player.other_grades is None
+
+
+def test_copy_is_independent():
+    player = Player("аня")
+    player.exams["физика"] = "5"
+    copy = player.copy()
+    copy.exams["физика"] = "3"
+    copy.add_artifact("Конспект")
+    assert player.exams["физика"] == "5"
+    assert "Конспект" not in player.artifacts
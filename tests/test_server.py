@@ -0,0 +1,103 @@
+"""Тесты TCP-сервера GameServer с локальным клиентом"""
+
+import asyncio
+import random
+import threading
+
+from gamekk.autosave import Autosave
+from gamekk.credentials import CredentialStore
+from gamekk.load import LoadGenerator, SessionScript
+from gamekk.server import GameServer
+from gamekk.story import StoryGraph
+from gamekk.vault import ArtifactVault
+
+from test_storage import make_store
+
+
+def make_server(tmp_path):
+    vault = ArtifactVault(str(tmp_path / "artifacts.json"), str(tmp_path / "artifacts.journal"))
+    return GameServer(port=0, vault=vault, store=make_store(tmp_path),
+                      credentials=CredentialStore(str(tmp_path / "users.db"), legacy_filename=None, iterations=10),
+                      autosave=Autosave(str(tmp_path / "players.autosave")))
+
+
+async def play(port, answers, stop_at=None):
+    """Клиент: отвечает на вопросы по сценарию; stop_at - на каком вопросе отключиться"""
+    prompts = SessionScript.prompt_keys(StoryGraph())
+    script = SessionScript(answers, prompts)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    transcript, pending = [], ""
+    while True:
+        chunk = await asyncio.wait_for(reader.read(1 << 16), 10)
+        if not chunk:
+            break
+        pending += chunk.decode('utf-8')
+        prompt = max((text for text in prompts if pending.endswith(text)), key=len, default=None)
+        if prompt is None:
+            continue
+        transcript.append(pending)
+        pending = ""
+        if prompts[prompt] == stop_at:
+            break
+        writer.write((script(prompt) + "\n").encode('utf-8'))
+    transcript.append(pending)
+    writer.close()
+    return "".join(transcript)
+
+
+async def wait_idle(server):
+    for _ in range(500):
+        if server.sessions == 0:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("сессия не закончилась")
+
+
+def test_scripted_session_over_tcp(tmp_path):
+    server = make_server(tmp_path)
+    answers = LoadGenerator.answers(random.Random(1), "1", "аня", "секрет")
+    answers["save.ask"] = "да"
+
+    async def main():
+        async with await server.start():
+            assert server.port != 0
+            transcript = await play(server.port, answers)
+            await wait_idle(server)
+            return transcript
+    transcript = asyncio.run(main())
+    assert "аня" in transcript
+    assert "Игра сохранена!" in transcript
+    assert server.store.load("аня") is not None
+    assert server.credentials.verify("аня", "секрет")
+
+
+def test_client_disconnects_mid_session(tmp_path):
+    server = make_server(tmp_path)
+
+    async def main():
+        async with await server.start():
+            answers = LoadGenerator.answers(random.Random(2), "1", "боря", "пароль")
+            await play(server.port, answers, stop_at="session.first")
+            await wait_idle(server)
+            # Сервер продолжает обслуживать других игроков
+            answers = LoadGenerator.answers(random.Random(3), "1", "вера", "пароль")
+            return await play(server.port, answers)
+    transcript = asyncio.run(main())
+    assert "вера" in transcript
+    assert server.credentials.exists("боря")
+    assert server.sessions == 0
+
+
+def test_small_stack_only_for_sessions(tmp_path):
+    server = make_server(tmp_path)
+    sizes = []
+
+    class Probe(threading.Thread):
+        def start(self):
+            sizes.append(threading.stack_size())
+            super().start()
+
+    before = threading.stack_size()
+    server._start(Probe(target=lambda: None))
+    assert sizes == [server.stack_size]
+    assert threading.stack_size() == before
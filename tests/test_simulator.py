@@ -0,0 +1,71 @@
+"""Тесты пакетной симуляции Simulator"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from gamekk.autosave import Autosave
+from gamekk.console import ScriptedIO
+from gamekk.game import Game
+from gamekk.load import SessionScript
+from gamekk.player import Player
+from gamekk.simulator import Simulator
+from gamekk.story import StoryGraph
+from gamekk.vault import ArtifactVault
+
+
+def test_run_counts_every_game():
+    result = Simulator(seed=1).run(2000)
+    assert result["runs"] == 2000
+    assert sum(result["scholarship"].values()) == 2000
+
+
+def test_same_seed_same_result():
+    policy = {"first_exam": {"матан": 1, "информатика": 0}}
+    assert Simulator(policy, seed=5).run(500) == Simulator(policy, seed=5).run(500)
+
+
+@pytest.mark.parametrize("policy, message", [
+    ({"first_exam": {"физика": 1}}, "неизвестный вариант"),
+    ({"math": {"1": 0, "2": 0}}, "сумма весов"),
+    ({"math": {"1": -1, "2": 2}}, "неотрицательным"),
+    ({"экзамен": {"да": 1}}, "неизвестное решение"),
+    ({"retake": ["да"]}, "словарем"),
+    (["retake"], "словарем"),
+])
+def test_bad_policy_is_rejected(policy, message):
+    with pytest.raises(ValueError, match=message):
+        Simulator(policy)
+
+
+def total_variation(counts, other):
+    """Расстояние по вариации между двумя распределениями, заданными счетчиками"""
+    total, other_total = sum(counts.values()), sum(other.values())
+    return sum(abs(counts.get(key, 0) / total - other.get(key, 0) / other_total)
+               for key in set(counts) | set(other)) / 2
+
+
+def test_matches_scripted_game_loop(tmp_path):
+    # Те же игры через настоящий game_loop с равновероятными ответами
+    story = StoryGraph()
+    prompts = SessionScript.prompt_keys(story)
+    options = {name: list(story.choices[story.ids[name]]) for name in ("class", "math", "cs")}
+    options.update({"session.first": list(story.EXAMS), "retake.choose": list(story.EXAMS),
+                    "retake.ask": ["да", "нет"], "save.ask": ["нет"]})
+    rng = random.Random(1)
+    random.seed(1)
+    game = Game(io=ScriptedIO(lambda prompt: rng.choice(options[prompts[prompt]])),
+                vault=ArtifactVault(str(tmp_path / "artifacts.json"), str(tmp_path / "artifacts.journal")),
+                autosave=Autosave(str(tmp_path / "players.autosave")))
+    reputation, scholarship = Counter(), Counter()
+    for _ in range(10_000):
+        game.current_player = Player("игрок")
+        game.game_loop()
+        reputation[game.current_player.reputation] += 1
+        scholarship[game.current_player.scholarship] += 1
+
+    result = Simulator(seed=1).run(200_000)
+    assert set(reputation) <= set(result["reputation"])
+    assert total_variation(reputation, result["reputation"]) < 0.03
+    assert total_variation(scholarship, result["scholarship"]) < 0.03
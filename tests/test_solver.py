@@ -0,0 +1,26 @@
+"""Тесты точного решателя Solver"""
+
+from gamekk.player import Player
+from gamekk.solver import Solver
+
+
+def test_new_game_is_won_for_sure(tmp_path):
+    result = Solver(cache_filename=str(tmp_path / "solver.cache")).query()
+    assert result["scholarship"] == 1.0
+    assert result["reputation"] == 19.0
+    assert abs(sum(outcome["probability"] for outcome in result["outcomes"]) - 1.0) < 1e-9
+
+
+def test_cache_gives_same_answer(tmp_path):
+    filename = str(tmp_path / "solver.cache")
+    first = Solver(cache_filename=filename).query(sessions=2)
+    solver = Solver(cache_filename=filename)
+    assert solver.cached
+    assert solver.query(sessions=2) == first
+
+
+def test_query_starts_from_player(tmp_path):
+    player = Player("")
+    player.reputation = 3
+    result = Solver(cache_filename=str(tmp_path / "solver.cache")).query(player)
+    assert result["start"]["reputation"] == 3
@@ -0,0 +1,384 @@
+"""Тесты хранилища игроков PlayerStore"""
+
+import json
+import mmap
+import os
+import random
+import threading
+from collections import Counter
+
+import pytest
+
+from gamekk.player import Player, PlayerRecord, PlayerView
+from gamekk.stats import PlayerStats
+from gamekk.storage import PlayerStore
+
+
+def make_store(tmp_path, **options):
+    options.setdefault("compact_min_bytes", 1 << 30)  # уплотняем только вручную
+    return PlayerStore(str(tmp_path / "players.dat"), str(tmp_path / "players.idx"),
+                       legacy_filename=None, legacy_log=None,
+                       stats_filename=str(tmp_path / "players.stats"),
+                       words_filename=str(tmp_path / "players.words"), **options)
+
+
+def save(store, username, reputation):
+    player = Player(username)
+    player.reputation = reputation
+    store.save(player.to_dict())
+
+
+def test_reopen_reads_saved_records(tmp_path):
+    store = make_store(tmp_path)
+    save(store, "аня", 5)
+    save(store, "боря", 7)
+    save(store, "аня", 9)
+    store = make_store(tmp_path)
+    assert store.load("аня")["reputation"] == 9
+    assert store.load("боря")["reputation"] == 7
+
+
+def test_compaction_bumps_generation(tmp_path):
+    store = make_store(tmp_path)
+    for reputation in range(5):
+        save(store, "аня", reputation)
+    save(store, "боря", 7)
+    store.compact()
+    assert store.generation == 1
+    store = make_store(tmp_path)
+    assert store.generation == 1
+    assert store.load("аня")["reputation"] == 4
+    assert store.load("боря")["reputation"] == 7
+
+
+def test_crash_between_log_and_index_replace(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    for reputation in range(5):
+        save(store, "аня", reputation)
+    save(store, "боря", 7)
+
+    # Сбой после замены журнала, но до замены индекса
+    real_replace = os.replace
+
+    def crash(src, dst):
+        if dst == store.index_filename:
+            raise KeyboardInterrupt
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", crash)
+    try:
+        store.compact()
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.setattr(os, "replace", real_replace)
+
+    store = make_store(tmp_path)
+    assert store.generation == 1
+    assert store.load("аня")["reputation"] == 4
+    assert store.load("боря")["reputation"] == 7
+    # Индекс построен заново и при следующем открытии принимается
+    store = make_store(tmp_path)
+    assert store.load("аня")["reputation"] == 4
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    store = make_store(tmp_path)
+    save(store, "аня", 5)
+    size = store.size
+    save(store, "боря", 7)
+    with open(store.filename, 'r+b') as f:
+        f.truncate(store.size - 3)
+    os.remove(store.index_filename)
+    store = make_store(tmp_path)
+    assert store.size == size
+    assert store.load("аня")["reputation"] == 5
+    assert "боря" not in store
+
+
+def test_legacy_log_without_header(tmp_path):
+    store = make_store(tmp_path)
+    save(store, "аня", 5)
+    save(store, "аня", 6)
+    # Журнал и индекс прежней версии: без заголовков, смещения с нуля
+    with open(store.filename, 'rb') as f:
+        data = f.read()[PlayerStore.HEADER.size:]
+    with open(store.filename, 'wb') as f:
+        f.write(data)
+    os.remove(store.index_filename)
+    store = make_store(tmp_path)
+    assert (store.generation, store.base) == (0, 0)
+    assert store.load("аня")["reputation"] == 6
+    store.compact()
+    store = make_store(tmp_path)
+    assert store.generation == 1
+    assert store.load("аня")["reputation"] == 6
+
+
+def test_deltas_replay_after_checkpoint(tmp_path):
+    store = make_store(tmp_path)
+    player = Player("аня")
+    store.save_player(player)
+    player.record(Player.EVENT_REPUTATION, value=5)
+    store.save_player(player)
+    player.record(Player.EVENT_ARTIFACT, "Конспект")
+    store.save_player(player)
+    assert len(store.deltas["аня"]) == 2
+    record = make_store(tmp_path).load("аня")
+    assert record == player.to_dict()
+    assert record["event_seq"] == 2
+
+
+def test_stale_copy_forces_checkpoint(tmp_path):
+    store = make_store(tmp_path)
+    store.save_player(Player("аня"))
+    first = store.load_player("аня")
+    second = store.load_player("аня")
+    first.record(Player.EVENT_REPUTATION, value=5)
+    store.save_player(first)
+    second.record(Player.EVENT_REPUTATION, value=-3)
+    store.save_player(second)
+    # Последнее сохранение целиком, без сложения с чужой дельтой
+    assert store.load("аня") == second.to_dict()
+    assert make_store(tmp_path).load("аня")["reputation"] == 7
+
+
+def test_stale_delta_is_not_replayed(tmp_path):
+    store = make_store(tmp_path)
+    store.save_player(Player("аня"))
+    player = store.load_player("аня")
+    player.record(Player.EVENT_REPUTATION, value=5)
+    store.save_player(player)
+    # Дельта с номером, который не продолжает запись (сбой до контрольной точки)
+    stale = Player("аня")
+    stale.record(Player.EVENT_REPUTATION, value=-3)
+    data = PlayerRecord.encode_events("аня", 0, stale.events, store.words, stale.to_dict())
+    with store._open_log() as f, store._open_index() as index_file:
+        store._append_index(index_file, "аня", f.tell(), len(data), True)
+        f.write(data)
+    store = make_store(tmp_path)
+    record = store.load("аня")
+    assert (record["reputation"], record["event_seq"]) == (15, 1)
+    assert store.view("аня").reputation == 15
+
+
+def test_view_reads_latest_delta_from_mmap(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    player = Player("аня")
+    store.save_player(player)
+    player.record(Player.EVENT_REPUTATION, value=5)
+    player.record(Player.EVENT_GRADE, "матан", "4")
+    player.record(Player.EVENT_LIVES, value=-1)
+    store.save_player(player)
+    view = store.view("аня")
+    assert isinstance(view.buffer, mmap.mmap)
+    decoded = []
+    monkeypatch.setattr(PlayerView, "to_dict", lambda self: decoded.append(self) or {})
+    assert (view.reputation, view.lives, view.scholarship) == (15, 1, True)
+    assert view.passed("матан") and not view.passed("информатика")
+    assert (view.username, view.event_seq) == ("аня", 3)
+    assert not decoded
+    monkeypatch.undo()
+    assert view.to_dict() == player.to_dict()
+    assert view.to_player().to_dict() == player.to_dict()
+
+
+def test_view_of_unknown_grade_falls_back_to_full_record(tmp_path):
+    store = make_store(tmp_path)
+    player = Player("аня")
+    store.save_player(player)
+    player.record(Player.EVENT_GRADE, "физика", "5")
+    store.save_player(player)
+    assert store.view("аня").grade("физика") == "5"
+
+
+def test_changes_without_events_are_saved(tmp_path):
+    store = make_store(tmp_path)
+    store.save_player(Player("аня"))
+    player = store.load_player("аня")
+    player.add_artifact("Конспект")
+    player.exams = {"матан": "4", "информатика": "3"}
+    store.save_player(player)
+    record = make_store(tmp_path).load("аня")
+    assert record["artifacts"][-1] == "Конспект"
+    assert record["exams"] == {"матан": "4", "информатика": "3"}
+
+
+def brute_force_stats(records):
+    """Статистика, посчитанная напрямую по всем записям"""
+    grades = {}
+    for record in records:
+        for exam, grade in record["exams"].items():
+            grades.setdefault(exam, Counter())[grade] += 1
+    return {
+        "players": len(records),
+        "scholarships": sum(record["scholarship"] for record in records),
+        "reputation_sum": sum(record["reputation"] for record in records),
+        "grades": {exam: +counts for exam, counts in grades.items()},
+        "branches": +Counter(mark for record in records for mark in set(record["story_progress"])),
+        "ranking": sorted((-record["reputation"], record["username"]) for record in records),
+    }
+
+
+def store_stats(stats):
+    return {
+        "players": stats.players,
+        "scholarships": stats.scholarships,
+        "reputation_sum": stats.reputation_sum,
+        "grades": {exam: +counts for exam, counts in stats.grades.items() if +counts},
+        "branches": +stats.branches,
+        "ranking": stats.ranking,
+    }
+
+
+def test_stats_match_brute_force(tmp_path):
+    rng = random.Random(7)
+    store = make_store(tmp_path)
+    for step in range(400):
+        player = store.load_player(f"игрок{rng.randrange(40)}") or Player(f"игрок{rng.randrange(40)}")
+        player.record(Player.EVENT_REPUTATION, value=rng.randint(-5, 5))
+        if rng.random() < 0.3:
+            player.record(Player.EVENT_GRADE, rng.choice(["матан", "информатика"]), rng.choice(["3", "4"]))
+        if rng.random() < 0.2:
+            player.record(Player.EVENT_BRANCH, rng.choice(["Выбрал класс", "Матан: сдал"]))
+        if rng.random() < 0.05:
+            player.record(Player.EVENT_SCHOLARSHIP)
+        if rng.random() < 0.1:
+            store.save_many([player.to_dict()])
+        else:
+            store.save_player(player)
+        if step % 100 == 99:
+            store.compact()
+    expected = brute_force_stats(list(store.records()))
+    assert store_stats(store.stats) == expected
+    store.flush_stats()
+    assert store_stats(make_store(tmp_path).stats) == expected
+    os.remove(store.stats_filename)
+    assert store_stats(make_store(tmp_path).stats) == expected
+
+
+def test_stale_snapshot_catches_up_on_tail(tmp_path, monkeypatch):
+    rng = random.Random(11)
+    store = make_store(tmp_path, checkpoint_every=3)
+
+    def play(steps):
+        for _ in range(steps):
+            username = f"игрок{rng.randrange(30)}"
+            player = store.load_player(username) or Player(username)
+            player.record(Player.EVENT_REPUTATION, value=rng.randint(-5, 5))
+            if rng.random() < 0.3:
+                player.record(Player.EVENT_GRADE, rng.choice(["матан", "информатика"]), rng.choice(["3", "5"]))
+            store.save_player(player)
+    play(200)
+    store.flush_stats()
+    play(100)  # эти сохранения в снимок не попали
+    monkeypatch.setattr(PlayerStore, "rebuild_stats", lambda self: pytest.fail("статистика собрана заново"))
+    fresh = make_store(tmp_path)
+    assert store_stats(fresh.stats) == brute_force_stats(list(fresh.records()))
+    with open(fresh.stats_filename, encoding='utf-8') as f:
+        assert json.load(f)["size"] == fresh.size  # следующему процессу догонять нечего
+
+
+def test_snapshot_of_other_generation_is_rebuilt(tmp_path):
+    store = make_store(tmp_path)
+    for number in range(20):
+        save(store, f"игрок{number}", number)
+    store.flush_stats()
+    store.compact()
+    with open(store.stats_filename, encoding='utf-8') as f:
+        assert json.load(f)["generation"] == 1
+    stats = PlayerStats(store.stats_filename)
+    assert not stats.restore(store.size, generation=0)
+    save(store, "игрок0", 100)
+    store.rebuild_stats()
+    assert store_stats(store.stats) == brute_force_stats(list(store.records()))
+
+
+def test_concurrent_stats_snapshots(tmp_path):
+    errors = []
+
+    def save_snapshots():
+        stats = PlayerStats(str(tmp_path / "players.stats"))
+        try:
+            for _ in range(50):
+                stats.save()
+        except OSError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=save_snapshots) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert PlayerStats(str(tmp_path / "players.stats")).restore(0)
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_two_stores_share_files(tmp_path):
+    # Два объекта над одними файлами ведут себя как два процесса
+    first, second = make_store(tmp_path), make_store(tmp_path)
+    anna = Player("аня")
+    first.save_player(anna)
+    boris = Player("боря")
+    second.save_player(boris)
+    for number in range(10):
+        anna.record(Player.EVENT_BRANCH, f"аня {number}")
+        first.save_player(anna)
+        boris.record(Player.EVENT_BRANCH, f"боря {number}")
+        second.save_player(boris)
+    assert second.load("аня") == anna.to_dict()
+    assert first.load("боря") == boris.to_dict()
+    first.compact()
+    boris.record(Player.EVENT_REPUTATION, value=3)
+    second.save_player(boris)
+    assert make_store(tmp_path).load("боря") == boris.to_dict()
+    assert store_stats(second.stats) == brute_force_stats(list(make_store(tmp_path).records()))
+
+
+def save_in_process(directory, prefix, count):
+    store = make_store(directory)
+    players = [Player(f"{prefix}-{number}") for number in range(4)]
+    for step in range(count):
+        player = players[step % len(players)]
+        player.record(Player.EVENT_BRANCH, f"ветка {step % 7}")
+        player.record(Player.EVENT_REPUTATION, value=1)
+        store.save_player(player)
+        if step % 50 == 49:
+            store.compact()
+    return {player.username: player.to_dict() for player in players}
+
+
+def test_processes_share_store(tmp_path):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(save_in_process, tmp_path, f"p{worker}", 120) for worker in range(4)]
+        expected = {}
+        for future in futures:
+            expected.update(future.result())
+    store = make_store(tmp_path)
+    assert {username: store.load(username) for username in expected} == expected
+    assert store_stats(store.stats) == brute_force_stats(list(store.records()))
+
+
+def test_cache_matches_disk(tmp_path):
+    rng = random.Random(3)
+    store = make_store(tmp_path, checkpoint_every=4)
+    copies = {}
+    for step in range(300):
+        username = f"игрок{rng.randrange(5)}"
+        # Иногда играем старой копией игрока, иногда меняем его без событий
+        player = copies.get(username) if rng.random() < 0.3 else None
+        player = player or store.load_player(username) or Player(username)
+        copies[username] = player
+        player.record(Player.EVENT_REPUTATION, value=rng.randint(-3, 3))
+        if rng.random() < 0.2:
+            player.add_artifact(f"Артефакт {step}")
+        store.save_player(player)
+        assert store.load_player(username).to_dict() == store.load(username)
+        assert make_store(tmp_path).load(username) == store.load(username)
+        view, record = store.view(username), store.load(username)
+        assert (view.reputation, view.lives, view.event_seq) == (record["reputation"], record["lives"],
+                                                                 record["event_seq"])
+        assert view.to_dict() == record
@@ -0,0 +1,43 @@
+"""Тесты графа сюжета StoryGraph"""
+
+import random
+
+import pytest
+
+from gamekk.player import Player
+from gamekk.story import StoryGraph
+from gamekk.vault import ArtifactVault
+
+
+def compressed(story, player):
+    """Оценки кодами, репутация и попытки - как в StoryGraph.advance"""
+    grades = tuple(story.grade_codes[player.exams[exam]] for exam in story.EXAMS)
+    return grades + (player.reputation, player.lives)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("name", StoryGraph().names)
+def test_advance_agrees_with_run(tmp_path, name, seed):
+    story = StoryGraph()
+    vault = ArtifactVault(str(tmp_path / "artifacts.json"), str(tmp_path / "artifacts.journal"))
+    rng = random.Random(seed)
+    player = Player("аня")
+    state = compressed(story, player)
+
+    def ask(prompt):
+        node = story.prompt.index(prompt)
+        return rng.choice(list(story.choices[node]) + ["что-то другое"])
+    story.run(name, player, vault, ask=ask, say=lambda text: None, rng=rng)
+
+    for code, node, edge in player.events:
+        if code == Player.EVENT_CHOICE:
+            state = story.advance(state, story.ids[node], edge)
+    assert state == compressed(story, player)
+
+
+def test_unknown_answer_takes_default_edge():
+    story = StoryGraph()
+    node = story.ids["class"]
+    assert story.edge(node, "что-то другое") == story.default[node]
+    for answer, edge in story.choices[node].items():
+        assert story.edge(node, answer) == edge
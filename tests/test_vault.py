@@ -0,0 +1,80 @@
+"""Тесты копилки артефактов: снимок с журналом и SQLite"""
+
+import json
+
+import pytest
+
+from gamekk.player import Player
+from gamekk.vault import ArtifactVault
+
+
+def make_vault(tmp_path, **options):
+    return ArtifactVault(str(tmp_path / "artifacts.json"), str(tmp_path / "artifacts.journal"), **options)
+
+
+def play(vault, steps):
+    """Несколько ходов: игроки берут и возвращают артефакты"""
+    player = Player("аня")
+    for step in range(steps):
+        if step % 3 == 2:
+            vault.return_artifacts(player)
+        elif not vault.take_artifact(player, say=lambda text: None):
+            vault.generate_new_artifacts(say=lambda text: None)
+
+
+def test_journal_replays_after_restart(tmp_path):
+    vault = make_vault(tmp_path, batch_size=1)
+    play(vault, 20)
+    assert make_vault(tmp_path).artifacts == vault.artifacts
+
+
+def test_crash_between_snapshot_and_journal_reset(tmp_path, monkeypatch):
+    vault = make_vault(tmp_path, batch_size=1)
+    play(vault, 10)
+    expected = list(vault.artifacts)
+
+    # Снимок уже заменен, а журнал еще не очищен
+    def crash():
+        raise KeyboardInterrupt
+    monkeypatch.setattr(vault, "_reset_journal", crash)
+    with pytest.raises(KeyboardInterrupt):
+        vault.save_artifacts(vault.artifacts)
+
+    restarted = make_vault(tmp_path, batch_size=1)
+    assert list(restarted.artifacts) == expected
+    # Устаревший журнал заменен пустым: новые операции не теряются
+    play(restarted, 5)
+    assert make_vault(tmp_path).artifacts == restarted.artifacts
+
+
+def test_legacy_snapshot_and_journal(tmp_path):
+    with open(tmp_path / "artifacts.json", 'w', encoding='utf-8') as f:
+        json.dump(["Зачетка", "Конспект"], f)
+    with open(tmp_path / "artifacts.journal", 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"op": "take", "item": "Зачетка"}) + "\n")
+        f.write(json.dumps({"op": "return", "items": ["Шпаргалка"]}) + "\n")
+    vault = make_vault(tmp_path)
+    assert list(vault.artifacts) == ["Конспект", "Шпаргалка"]
+    vault.save_artifacts(vault.artifacts)
+    assert list(make_vault(tmp_path).artifacts) == ["Конспект", "Шпаргалка"]
+
+
+def test_take_on_empty_vault_replays(tmp_path):
+    with open(tmp_path / "artifacts.json", 'w', encoding='utf-8') as f:
+        json.dump([], f)
+    with open(tmp_path / "artifacts.journal", 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"op": "take", "item": "Зачетка"}) + "\n")
+        f.write(json.dumps({"op": "return", "items": ["Шпаргалка"]}) + "\n")
+    assert list(make_vault(tmp_path).artifacts) == ["Шпаргалка"]
+
+
+def test_sqlite_seeds_from_snapshot_and_journal(tmp_path):
+    pytest.importorskip("sqlite3")
+    from gamekk.vault import SQLiteArtifactVault
+
+    vault = make_vault(tmp_path, batch_size=1)
+    play(vault, 10)
+    vault.flush()
+    sqlite_vault = SQLiteArtifactVault(str(tmp_path / "artifacts.db"), str(tmp_path / "artifacts.json"),
+                                       str(tmp_path / "artifacts.journal"))
+    assert sqlite_vault.artifacts == vault.artifacts